@@ -0,0 +1,331 @@
+// Long-lived Java compile/run daemon used by java_runner.JavaDaemonPool.
+//
+// The daemon is started once per pool slot (``java CompileServer.java <request
+// fd> <reply fd>``) and serves requests on those two inherited pipes; fd 0/1
+// are /dev/null, so a program writing to FileDescriptor.out or reading
+// FileDescriptor.in cannot touch the protocol. Each request compiles the editor source in
+// memory with javax.tools and runs its main method in a fresh class loader, so
+// the JVM, the JIT and javac itself stay warm between runs. Compiled classes
+// are cached by source hash in the daemon's memory only: every program run
+// shares the server's user, so classes on disk could be swapped by any of them.
+// JVM-wide defaults a program may change (system properties, default locale
+// and time zone) are put back after every run.
+//
+// Request:  six length-prefixed UTF-8 fields
+//           (hash, class name, source, stdin path, stdout path, stderr path)
+// Response: int exit code, boolean cached, boolean clean, int heap MB
+
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+import java.io.BufferedInputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.io.StringWriter;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.net.URI;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+import java.util.Properties;
+import java.util.TimeZone;
+
+public class CompileServer {
+    static final int MEMORY_CACHE_ENTRIES = 64;
+
+    static final Map<String, Map<String, byte[]>> memoryCache =
+        new LinkedHashMap<String, Map<String, byte[]>>(16, 0.75f, true) {
+            @Override
+            protected boolean removeEldestEntry(Map.Entry<String, Map<String, byte[]>> eldest) {
+                return size() > MEMORY_CACHE_ENTRIES;
+            }
+        };
+
+    static JavaCompiler compiler;
+    static StandardJavaFileManager standardFileManager;
+
+    // Source held in memory; getName() keeps diagnostics as "Main.java:3: error"
+    static class SourceFile extends SimpleJavaFileObject {
+        final String fileName;
+        final String code;
+
+        SourceFile(String className, String code) {
+            super(URI.create("string:///" + className + Kind.SOURCE.extension), Kind.SOURCE);
+            this.fileName = className + Kind.SOURCE.extension;
+            this.code = code;
+        }
+
+        @Override
+        public String getName() {
+            return fileName;
+        }
+
+        @Override
+        public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+            return code;
+        }
+    }
+
+    static class ClassFile extends SimpleJavaFileObject {
+        final ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+
+        ClassFile(String binaryName) {
+            super(URI.create("bytes:///" + binaryName.replace('.', '/') + Kind.CLASS.extension), Kind.CLASS);
+        }
+
+        @Override
+        public OutputStream openOutputStream() {
+            return bytes;
+        }
+    }
+
+    static class MemoryFileManager extends ForwardingJavaFileManager<StandardJavaFileManager> {
+        final Map<String, ClassFile> classes = new LinkedHashMap<>();
+
+        MemoryFileManager(StandardJavaFileManager fileManager) {
+            super(fileManager);
+        }
+
+        @Override
+        public JavaFileObject getJavaFileForOutput(Location location, String className,
+                                                   JavaFileObject.Kind kind, FileObject sibling) {
+            ClassFile file = new ClassFile(className);
+            classes.put(className, file);
+            return file;
+        }
+    }
+
+    static class MemoryClassLoader extends ClassLoader {
+        final Map<String, byte[]> classes;
+
+        MemoryClassLoader(Map<String, byte[]> classes) {
+            super(ClassLoader.getSystemClassLoader());
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            byte[] bytes = classes.get(name);
+            if (bytes == null) {
+                throw new ClassNotFoundException(name);
+            }
+            return defineClass(name, bytes, 0, bytes.length);
+        }
+    }
+
+    // Compile in memory; diagnostics are written to err in javac's own format
+    static Map<String, byte[]> compile(String className, String source, PrintStream err) {
+        MemoryFileManager fileManager = new MemoryFileManager(standardFileManager);
+        StringWriter diagnostics = new StringWriter();
+        List<String> options = Arrays.asList("-proc:none", "-Xlint:none");
+        boolean ok = compiler.getTask(diagnostics, fileManager, null, options, null,
+            Collections.singletonList(new SourceFile(className, source))).call();
+        err.print(diagnostics);
+        if (!ok) {
+            return null;
+        }
+        Map<String, byte[]> classes = new HashMap<>();
+        for (Map.Entry<String, ClassFile> entry : fileManager.classes.entrySet()) {
+            classes.put(entry.getKey(), entry.getValue().bytes.toByteArray());
+        }
+        return classes;
+    }
+
+    // Drop daemon and reflection frames so traces look like a plain `java Main`
+    static void trimStackTrace(Throwable t) {
+        while (t != null) {
+            StackTraceElement[] frames = t.getStackTrace();
+            int keep = frames.length;
+            for (int i = 0; i < frames.length; i++) {
+                String cls = frames[i].getClassName();
+                if (cls.startsWith("jdk.internal.reflect.") || cls.startsWith("java.lang.reflect.")
+                        || cls.startsWith(CompileServer.class.getName())) {
+                    keep = i;
+                    break;
+                }
+            }
+            t.setStackTrace(Arrays.copyOf(frames, keep));
+            t = t.getCause() == t ? null : t.getCause();
+        }
+    }
+
+    // Run main() in its own thread group and wait like the JVM does for every
+    // non-daemon thread; returns the exit code, clean[0] tells if the group
+    // still has live threads afterwards
+    static int runMain(Map<String, byte[]> classes, String className, PrintStream err, boolean[] clean) {
+        Method main;
+        try {
+            Class<?> cls = Class.forName(className, true, new MemoryClassLoader(classes));
+            main = cls.getMethod("main", String[].class);
+            if (!Modifier.isStatic(main.getModifiers())) {
+                throw new NoSuchMethodException();
+            }
+        } catch (ClassNotFoundException e) {
+            err.println("Error: Could not find or load main class " + className);
+            err.println("Caused by: java.lang.ClassNotFoundException: " + className);
+            return 1;
+        } catch (NoSuchMethodException e) {
+            err.println("Error: Main method not found in class " + className + ", please define the main method as:");
+            err.println("   public static void main(String[] args)");
+            return 1;
+        } catch (ExceptionInInitializerError e) {
+            trimStackTrace(e);
+            err.print("Exception in thread \"main\" ");
+            e.printStackTrace(err);
+            return 1;
+        }
+
+        ThreadGroup group = new ThreadGroup("run");
+        Throwable[] failure = new Throwable[1];
+        Thread mainThread = new Thread(group, () -> {
+            try {
+                main.invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                failure[0] = e.getCause();
+            } catch (Throwable e) {
+                failure[0] = e;
+            }
+        }, "main");
+        mainThread.start();
+        try {
+            mainThread.join();
+            boolean waiting = true;
+            while (waiting) {
+                waiting = false;
+                Thread[] threads = new Thread[group.activeCount() + 1];
+                int count = group.enumerate(threads);
+                for (int i = 0; i < count; i++) {
+                    if (!threads[i].isDaemon() && threads[i].isAlive()) {
+                        threads[i].join();
+                        waiting = true;
+                    }
+                }
+            }
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+        }
+        clean[0] = group.activeCount() == 0;
+
+        if (failure[0] != null) {
+            trimStackTrace(failure[0]);
+            err.print("Exception in thread \"main\" ");
+            failure[0].printStackTrace(err);
+            return 1;
+        }
+        return 0;
+    }
+
+    // The JVM-wide defaults at startup, put back by restore() after each run
+    static class GlobalDefaults {
+        final Properties properties = new Properties();
+        final Locale locale = Locale.getDefault();
+        final Locale displayLocale = Locale.getDefault(Locale.Category.DISPLAY);
+        final Locale formatLocale = Locale.getDefault(Locale.Category.FORMAT);
+        final TimeZone timeZone = TimeZone.getDefault();
+
+        GlobalDefaults() {
+            properties.putAll(System.getProperties());
+        }
+
+        void restore() {
+            Properties copy = new Properties();
+            copy.putAll(properties);
+            System.setProperties(copy);
+            Locale.setDefault(locale);
+            Locale.setDefault(Locale.Category.DISPLAY, displayLocale);
+            Locale.setDefault(Locale.Category.FORMAT, formatLocale);
+            TimeZone.setDefault(timeZone);
+        }
+    }
+
+    static String readField(DataInputStream in) throws IOException {
+        byte[] bytes = new byte[in.readInt()];
+        in.readFully(bytes);
+        return new String(bytes, StandardCharsets.UTF_8);
+    }
+
+    public static void main(String[] args) throws Exception {
+        compiler = ToolProvider.getSystemJavaCompiler();
+        standardFileManager = compiler.getStandardFileManager(null, null, StandardCharsets.UTF_8);
+
+        // Open the protocol pipes by number and give user code harmless defaults
+        DataInputStream in = new DataInputStream(new BufferedInputStream(
+            new FileInputStream("/proc/self/fd/" + args[0])));
+        DataOutputStream out = new DataOutputStream(new FileOutputStream("/proc/self/fd/" + args[1]));
+        PrintStream idle = new PrintStream(OutputStream.nullOutputStream());
+        System.setIn(new ByteArrayInputStream(new byte[0]));
+        System.setOut(idle);
+        System.setErr(idle);
+
+        // Warm up javac so the first real request does not pay for it
+        compile("Warmup", "class Warmup { public static void main(String[] a) {} }", idle);
+        GlobalDefaults defaults = new GlobalDefaults();
+
+        while (true) {
+            String hash;
+            try {
+                hash = readField(in);
+            } catch (EOFException e) {
+                break;
+            }
+            String className = readField(in);
+            String source = readField(in);
+            String stdinPath = readField(in);
+            String stdoutPath = readField(in);
+            String stderrPath = readField(in);
+
+            int exitCode;
+            boolean cached = true;
+            boolean[] clean = {true};
+            try (FileInputStream stdin = new FileInputStream(stdinPath);
+                 PrintStream stdout = new PrintStream(new FileOutputStream(stdoutPath), true, "UTF-8");
+                 PrintStream stderr = new PrintStream(new FileOutputStream(stderrPath), true, "UTF-8")) {
+                System.setIn(stdin);
+                System.setOut(stdout);
+                System.setErr(stderr);
+                Map<String, byte[]> classes = memoryCache.get(hash);
+                if (classes == null) {
+                    cached = false;
+                    classes = compile(className, source, stderr);
+                    if (classes != null) {
+                        memoryCache.put(hash, classes);
+                    }
+                }
+                exitCode = classes == null ? 1 : runMain(classes, className, stderr, clean);
+                stdout.flush();
+                stderr.flush();
+            } finally {
+                System.setIn(new ByteArrayInputStream(new byte[0]));
+                System.setOut(idle);
+                System.setErr(idle);
+                defaults.restore();
+            }
+
+            Runtime runtime = Runtime.getRuntime();
+            out.writeInt(exitCode);
+            out.writeBoolean(cached);
+            out.writeBoolean(clean[0]);
+            out.writeInt((int) ((runtime.totalMemory() - runtime.freeMemory()) / (1024 * 1024)));
+            out.flush();
+        }
+    }
+}
@@ -0,0 +1,293 @@
+# Static page assets: precomputed HTML/CSS and Lottie animations.
+#
+# The stylesheet, title, footer and donation button never change, so they are
+# built once per process instead of on every Streamlit rerun; the logo is read
+# and base64-encoded on first use only.
+#
+# Lottie animations are looked up in an in-process cache, then in JSON files
+# bundled with the app (see `python assets.py --bundle`), then in an on-disk
+# cache. On a miss the page renders without the animation while a pooled HTTP
+# session fetches it in the background with strict timeouts; the next rerun
+# picks it up. prefetch_lottie() warms every known animation at startup.
+import base64
+import functools
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "abcde2.png")
+
+# Custom CSS for styling
+APP_CSS = """
+    <style>
+    .generated-content {
+        background-color: #1e1e1e;
+        padding: 15px;
+        border-radius: 5px;
+        margin: 10px 0;
+        color: #61dafb;
+        font-family: "Courier New", Courier, monospace;
+        overflow-x: auto;
+        max-height: 400px;
+        box-shadow: 0 0 10px rgba(0, 0, 0, 0.2);
+        transition: transform 0.2s ease-in-out;
+    }
+    .generated-content:hover {
+        transform: scale(1.02);
+    }
+    .error-content {
+        background-color: #1e1e1e;
+        padding: 15px;
+        border-radius: 5px;
+        margin: 10px 0;
+        color: #ff0000;
+        font-family: "Courier New", Courier, monospace;
+        overflow-x: auto;
+        max-height: 400px;
+        box-shadow: 0 0 10px rgba(255, 0, 0, 0.2);
+        transition: transform 0.2s ease-in-out;
+    }
+    .error-content:hover {
+        transform: scale(1.02);
+    }
+    .program-output {
+        margin: 0;
+        padding: 0;
+        background: none;
+        color: inherit;
+        font-family: inherit;
+        white-space: pre-wrap;
+        word-break: break-word;
+    }
+    .title-container {
+        display: flex;
+        align-items: center;
+    }
+    .title-container img {
+        margin-right: 10px;
+    }
+    .footer {
+        text-align: center;
+        margin-top: 30px;
+        padding: 10px 0;
+        background-color: #f1f1f1;
+    }
+    .footer a {
+        margin: 0 15px;
+        text-decoration: none;
+        color: #4e73df;
+    }
+    .footer img {
+        width: 24px;
+        height: 24px;
+        vertical-align: middle;
+    }
+    </style>
+    """
+
+# Add the footer with social links and donation button
+FOOTER_HTML = """
+    <div class="footer">
+        <a href="https://instagram.com/sandeep_kasturi_" target="_blank">
+            <img src="https://img.icons8.com/fluency/48/000000/instagram-new.png" alt="Instagram">
+        </a>
+        <a href="https://github.com/sandeepkasturi" target="_blank">
+            <img src="https://img.icons8.com/ios-glyphs/48/000000/github.png" alt="GitHub">
+        </a>
+        <a href="https://skavtech.wegic.app" target="_blank">
+            <img src="https://img.icons8.com/ios-glyphs/48/000000/domain.png" alt="Website">
+        </a>
+        <a href="https://pages.razorpay.com/becomeinsider" target="_blank">
+            <img src="https://img.icons8.com/ios-glyphs/48/000000/money.png" alt="Donate">
+        </a>
+        <br>
+        <form>
+            <script src="https://checkout.razorpay.com/v1/payment-button.js" data-payment_button_id="pl_Oe7PyEQO3xI82m" async> </script>
+        </form>
+    </div>
+    """
+
+# Razorpay donation button
+RAZORPAY_BUTTON_HTML = """
+        <form>
+            <script src="https://checkout.razorpay.com/v1/payment-button.js" data-payment_button_id="pl_Oe7PyEQO3xI82m" async> </script>
+        </form>
+        """
+
+
+# Functions to read and encode the logo once per process
+@functools.lru_cache(maxsize=None)
+def logo_bytes():
+    with open(LOGO_PATH, "rb") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def logo_data_uri():
+    return "data:image/png;base64," + base64.b64encode(logo_bytes()).decode()
+
+
+# Title of the application with logo
+@functools.lru_cache(maxsize=None)
+def title_html():
+    return """
+    <div class="title-container">
+        <img src="{}" width="60" height="60">
+        <h1>ABCDE & CO</h1>
+    </div>
+    """.format(logo_data_uri())
+
+
+# Every animation used by the app, so they can be prefetched and bundled
+LOTTIE_ANIMATIONS = {
+    "ask_ai": "https://lottie.host/9ea2d5e2-feac-4b64-b36b-8dfad9d46e6e/fUbiNI1HFw.json",
+    "about": "https://assets5.lottiefiles.com/packages/lf20_YXD37qLQnb.json",
+    "our_company": "https://assets5.lottiefiles.com/packages/lf20_zZ2Y27.json",
+    "support": "https://assets5.lottiefiles.com/packages/lf20_QSo3N6.json",
+    "become_insider": "https://assets5.lottiefiles.com/packages/lf20_UJNc2t.json",
+}
+
+BUNDLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bundled_assets", "lottie")
+CACHE_DIR = os.environ.get(
+    "ABCDE_ASSET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "abcde-assets")
+)
+CONNECT_TIMEOUT = float(os.environ.get("ABCDE_ASSET_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.environ.get("ABCDE_ASSET_READ_TIMEOUT", "5"))
+# Seconds to wait before retrying a URL that failed
+FAILURE_BACKOFF = float(os.environ.get("ABCDE_ASSET_FAILURE_BACKOFF", "300"))
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+_memory = {}
+_failures = {}
+_pending = {}
+_lock = threading.Lock()
+_fetcher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lottie-fetch")
+_prefetch_started = False
+
+
+def _file_name(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json"
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(directory, url, data):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _file_name(url))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+# Function to download an animation with a pooled session and strict timeouts
+def _fetch(url):
+    try:
+        with metrics.timer("abcde_lottie_fetch_seconds"):
+            response = _session.get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            if response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code}")
+            data = response.json()
+    except (requests.RequestException, ValueError):
+        with _lock:
+            _failures[url] = time.monotonic()
+            _pending.pop(url, None)
+        return None
+    try:
+        _write_json(CACHE_DIR, url, data)
+    except OSError:
+        pass
+    with _lock:
+        _memory[url] = data
+        _failures.pop(url, None)
+        _pending.pop(url, None)
+    return data
+
+
+def _from_local(url):
+    for directory in (BUNDLE_DIR, CACHE_DIR):
+        data = _read_json(os.path.join(directory, _file_name(url)))
+        if data is not None:
+            with _lock:
+                _memory[url] = data
+            return data
+    return None
+
+
+# Lottie animation loader; returns None instead of waiting for the network
+# unless wait=True, in which case at most the request timeouts are spent
+def load_lottie_url(url: str, wait=False):
+    with _lock:
+        if url in _memory:
+            metrics.inc("abcde_lottie_lookups_total", source="memory")
+            return _memory[url]
+    data = _from_local(url)
+    if data is not None:
+        metrics.inc("abcde_lottie_lookups_total", source="local")
+        return data
+
+    with _lock:
+        failed_at = _failures.get(url)
+        if failed_at is not None and time.monotonic() - failed_at < FAILURE_BACKOFF:
+            metrics.inc("abcde_lottie_lookups_total", source="backoff")
+            return None
+        future = _pending.get(url)
+        if future is None:
+            future = _fetcher.submit(_fetch, url)
+            _pending[url] = future
+    metrics.inc("abcde_lottie_lookups_total", source="network")
+    if wait:
+        return future.result()
+    return None
+
+
+# Function to warm every known animation in the background, once per process
+def prefetch_lottie(urls=None):
+    global _prefetch_started
+    with _lock:
+        if _prefetch_started:
+            return
+        _prefetch_started = True
+    for url in urls or LOTTIE_ANIMATIONS.values():
+        load_lottie_url(url)
+
+
+# Function to download every known animation into BUNDLE_DIR at build time
+def bundle_lottie(urls=None):
+    missing = []
+    for url in urls or LOTTIE_ANIMATIONS.values():
+        data = _fetch(url)
+        if data is None:
+            missing.append(url)
+        else:
+            _write_json(BUNDLE_DIR, url, data)
+    return missing
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--bundle"]:
+        failed = bundle_lottie()
+        for url in failed:
+            print(f"Could not bundle {url}", file=sys.stderr)
+        sys.exit(1 if failed else 0)
+    print("usage: python assets.py --bundle", file=sys.stderr)
+    sys.exit(2)
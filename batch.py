@@ -0,0 +1,231 @@
+# Headless batch runner, e.g. for grading many submissions at once.
+#
+# Runs every submission through pipeline.run_code, the same path as the
+# Compile and Run button (same analysis, sandbox, limits and 20 second
+# timeout), but never falls back to the AI: a timeout or a missing JDK is a
+# failed case. Submissions are spread over a pool of processes, each with its
+# own warm worker and one execution slot, and every finished case is written
+# straight away as one JSON line.
+#
+# Submissions come from a directory (every .py and .java file below it, named
+# by relative path) or a JSONL file with one object per line:
+#   {"id": "alice", "language": "Python", "code": "...", "filename": "main.py",
+#    "cases": [{"name": "1", "stdin": "2 3\n", "expected": "5\n"}]}
+# where "path" may replace "code", and everything but "code"/"path" is
+# optional. --cases gives the cases for submissions without their own: a
+# directory of NAME.in files with optional NAME.out files, or a JSONL file of
+# {"name", "stdin", "expected"} objects. Without cases every submission runs
+# once with empty input and passes when it runs without errors.
+#
+#   python batch.py submissions/ --cases tests/ --jobs 4 --output results.jsonl
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import output_capture
+
+LANGUAGES = {".py": "Python", ".java": "Java"}
+
+
+class BatchError(Exception):
+    pass
+
+
+def _read(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+# Function to load submissions from a directory or a JSONL file; returns dicts
+# with id, language, code, filename and (possibly None) cases
+def load_submissions(path):
+    submissions = []
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                language = LANGUAGES.get(os.path.splitext(name)[1])
+                if language is None:
+                    continue
+                full = os.path.join(root, name)
+                submissions.append({"id": os.path.relpath(full, path), "language": language,
+                                    "code": _read(full), "filename": name, "cases": None})
+        return submissions
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                raise BatchError(f"{path}:{number}: invalid JSON: {e}")
+            source = entry.get("path")
+            if "code" not in entry and source is None:
+                raise BatchError(f"{path}:{number}: needs \"code\" or \"path\"")
+            if source is not None:
+                source = os.path.join(base, source)
+            filename = entry.get("filename") or (os.path.basename(source) if source else None)
+            language = entry.get("language") or LANGUAGES.get(os.path.splitext(filename or "")[1], "Python")
+            submissions.append({
+                "id": str(entry.get("id", number)),
+                "language": language,
+                "code": entry["code"] if "code" in entry else _read(source),
+                "filename": filename or ("main.py" if language == "Python" else "Main.java"),
+                "cases": entry.get("cases"),
+            })
+    return submissions
+
+
+# Function to load test cases from a directory of NAME.in / NAME.out files or
+# a JSONL file; returns dicts with name, stdin and expected (None = any output)
+def load_cases(path):
+    cases = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            if ext != ".in":
+                continue
+            expected = os.path.join(path, stem + ".out")
+            cases.append({"name": stem, "stdin": _read(os.path.join(path, name)),
+                          "expected": _read(expected) if os.path.exists(expected) else None})
+        return cases
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                entry = json.loads(line)
+                cases.append({"name": str(entry.get("name", number)), "stdin": entry.get("stdin", ""),
+                              "expected": entry.get("expected")})
+    return cases
+
+
+# Function to compare outputs the way graders usually do: trailing spaces on
+# each line and trailing blank lines do not count
+def _normalize(text):
+    return "\n".join(line.rstrip() for line in text.rstrip().splitlines())
+
+
+def _init_process():
+    # One slot and one warm worker per process; the pool of processes is the
+    # parallelism. Must run before the pipeline is imported.
+    os.environ.setdefault("ABCDE_EXEC_SLOTS", "1")
+    os.environ.setdefault("ABCDE_POOL_SIZE", "1")
+
+
+# Function to list the cases a submission runs; a single default case without
+# input when there are none
+def _cases_to_run(cases):
+    return cases or [{"name": "default", "stdin": "", "expected": None}]
+
+
+# Function to build the result record of one case; stats is what run_code
+# reported through on_stats, empty when the case never ran
+def _record(submission, case, status, stdout, stderr, seconds, stats):
+    return {
+        "id": submission["id"],
+        "language": submission["language"],
+        "case": case["name"],
+        "status": status,
+        "passed": status == "passed",
+        "stdout": stdout,
+        "stderr": stderr,
+        "expected": case.get("expected"),
+        "seconds": seconds,
+        "cpu_seconds": stats.get("cpu_seconds"),
+        "peak_rss_mb": stats.get("peak_rss_mb"),
+        "exit_reason": stats.get("exit_reason"),
+        "cached": bool(stats.get("cached")),
+    }
+
+
+# Function to run one submission against its cases; runs in a pool process
+def run_submission(submission, cases):
+    from pipeline import run_code
+
+    results = []
+    for case in _cases_to_run(cases):
+        stats = {}
+        started = time.perf_counter()
+        stdout, stderr = run_code(submission["language"], submission["code"], submission["filename"],
+                                  stdin=case.get("stdin") or "", on_stats=stats.update,
+                                  session=f"batch-{submission['id']}", ai_fallback=False)
+        wall = time.perf_counter() - started
+        expected = case.get("expected")
+        if not stats:
+            # Never ran: no JDK, the scheduler was full, the run was cancelled
+            status = "error"
+        elif stats.get("exit_reason") in ("timeout", "cpu_limit"):
+            status = "timeout"
+        elif expected is not None:
+            actual = stdout
+            if stats.get("stdout_log") and os.path.exists(stats["stdout_log"]):
+                # The output was clipped for display; grade the complete log
+                actual = output_capture.read_log(stats["stdout_log"]).decode("utf-8", errors="replace")
+            status = "passed" if _normalize(actual) == _normalize(expected) else "failed"
+        else:
+            status = "error" if stderr else "passed"
+        results.append(_record(submission, case, status, stdout, stderr, wall, stats))
+    return results
+
+
+# Function to run every submission on a process pool; yields case results as
+# soon as the submission they belong to has finished
+def run_batch(submissions, cases=None, jobs=None):
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    # Workers must not inherit the parent's threads and pipes
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_init_process) as executor:
+        futures = {}
+        for submission in submissions:
+            submission_cases = submission["cases"] if submission["cases"] is not None else cases
+            futures[executor.submit(run_submission, submission, submission_cases)] = (submission, submission_cases)
+        for future in as_completed(futures):
+            try:
+                yield from future.result()
+            except Exception as e:
+                # Every case of the submission fails, in the same shape as a
+                # case that ran, so consumers need not special-case it
+                submission, submission_cases = futures[future]
+                for case in _cases_to_run(submission_cases):
+                    yield _record(submission, case, "error", "", f"Batch runner error: {e}", None, {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many submissions through the compile/run pipeline.")
+    parser.add_argument("submissions", help="directory of .py/.java files or JSONL file of submissions")
+    parser.add_argument("--cases", help="directory of NAME.in/NAME.out files or JSONL file of test cases")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="parallel processes")
+    parser.add_argument("--output", default="-", help="JSONL results file (default: standard output)")
+    args = parser.parse_args(argv)
+
+    try:
+        submissions = load_submissions(args.submissions)
+        cases = load_cases(args.cases) if args.cases else None
+    except (OSError, ValueError, BatchError) as e:
+        parser.error(str(e))
+    if not submissions:
+        parser.error(f"no submissions found in {args.submissions}")
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    counts = {}
+    started = time.perf_counter()
+    try:
+        for result in run_batch(submissions, cases, args.jobs):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{len(submissions)} submissions, {summary} in {time.perf_counter() - started:.1f} s",
+          file=sys.stderr)
+    return 0 if set(counts) == {"passed"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+# Load test for the compile/run and AI pipeline.
+#
+# Simulates N concurrent sessions, each running a mix of scenarios against the
+# functions the app itself calls (pipeline.run_code, analyze_code, ask_ai and
+# the download packaging), with FakeGenerativeModel standing in for Gemini.
+# Sessions are threads, as they are in the Streamlit server, and share the
+# same worker pools, scheduler and caches. Caches start empty in a private
+# directory unless --keep-cache is given.
+#
+# Results (p50/p95/p99 latency and throughput per scenario) are written as
+# JSON so runs from different commits can be compared:
+#
+#   python benchmark.py --sessions 8 --iterations 20 --output before.json
+#   python benchmark.py --sessions 8 --iterations 20 --compare before.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+SCENARIOS = ("run", "run_cached", "run_stdin", "analyze", "ask", "download")
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _git_commit():
+    try:
+        head = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_HERE,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=_HERE,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return f"{head}-dirty" if head and dirty else head or None
+
+
+# One simulated user; each scenario returns True when the result was correct
+class _Session:
+    def __init__(self, pipeline, index):
+        self.pipeline = pipeline
+        self.index = index
+        self.session_id = f"bench-{index}"
+        self.last_answer = ""
+
+    def run(self, iteration):
+        n = 1000 + self.index * 100 + iteration
+        # The marker makes every program unique so the execution cache misses
+        code = f"# session {self.index} run {iteration}\nprint(sum(range({n})))\n"
+        output, error = self.pipeline.run_code("Python", code, "main.py", session=self.session_id)
+        return not error and output.strip() == str(sum(range(n)))
+
+    def run_cached(self, iteration):
+        output, error = self.pipeline.run_code("Python", "print('cached')\n", "main.py",
+                                               session=self.session_id)
+        return not error and output.strip() == "cached"
+
+    def run_stdin(self, iteration):
+        code = f"# session {self.index} run {iteration}\nname = input()\nprint('Hello, ' + name)\n"
+        output, error = self.pipeline.run_code("Python", code, "main.py", stdin=f"user{iteration}\n",
+                                               session=self.session_id)
+        return not error and output.strip() == f"Hello, user{iteration}"
+
+    def analyze(self, iteration):
+        from code_analysis import analyze_code, execution_path
+        snippets = [
+            "import sys\ndata = sys.stdin.read()\nprint(len(data))",
+            "with open('out.txt', 'w') as f:\n    f.write('x')",
+            "import subprocess\nsubprocess.run(['ls'])",
+            "while True:\n    pass",
+            "public class Main { public static void main(String[] a) { System.out.println(1); } }",
+        ]
+        for j, snippet in enumerate(snippets):
+            language = "Java" if snippet.startswith("public") else "Python"
+            # A unique comment defeats the memoization of analyze_code
+            marker = "//" if language == "Java" else "#"
+            report = analyze_code(language, f"{snippet}\n{marker} {self.index}-{iteration}-{j}")
+            execution_path(report)
+        return True
+
+    def ask(self, iteration):
+        answer, _ = self.pipeline.ask_ai(f"generate code for task {self.index}-{iteration}")
+        self.last_answer = answer
+        return bool(answer)
+
+    def download(self, iteration):
+        from downloads import download_link, extract_code_blocks, zip_files
+        files = extract_code_blocks(self.last_answer or "```python\nprint(1)\n```")
+        links = [download_link(content.encode("utf-8"), name, name) for name, content in files]
+        links.append(download_link(zip_files(files), "code.zip", "zip", mime="application/zip"))
+        return bool(files) and all(links)
+
+
+# Function to run every session concurrently; returns {scenario: [(seconds, ok)]}
+def _drive(pipeline, sessions, iterations, scenarios):
+    samples = {name: [] for name in scenarios}
+    lock = threading.Lock()
+
+    def session_loop(index):
+        session = _Session(pipeline, index)
+        for iteration in range(iterations):
+            for name in scenarios:
+                start = time.perf_counter()
+                try:
+                    ok = getattr(session, name)(iteration)
+                except Exception:
+                    traceback.print_exc()
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    samples[name].append((elapsed, ok))
+
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="bench-session") as executor:
+        for future in [executor.submit(session_loop, i) for i in range(sessions)]:
+            future.result()
+    return samples
+
+
+def _summarize(records, wall):
+    latencies = [seconds for seconds, _ in records]
+    return {
+        "count": len(records),
+        "errors": sum(1 for _, ok in records if not ok),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "p50": metrics.percentile(latencies, 0.5),
+        "p95": metrics.percentile(latencies, 0.95),
+        "p99": metrics.percentile(latencies, 0.99),
+        "max": max(latencies) if latencies else None,
+        "throughput_per_s": len(records) / wall if wall else None,
+    }
+
+
+def run_benchmark(sessions=4, iterations=10, scenarios=SCENARIOS, latency=0.5, first_token=0.15,
+                  chars=1500, jitter=0.1, warmup=True):
+    import pipeline
+    from fake_model import FakeGenerativeModel
+    from model_gateway import get_gateway, register_backend
+
+    model = FakeGenerativeModel(latency=latency, first_token_latency=first_token, chars=chars,
+                                jitter=jitter, seed=0)
+    register_backend("benchmark", lambda: model)
+    get_gateway().use_backend("benchmark")
+    if warmup:
+        # Start the worker pool outside the measured window
+        pipeline.run_code("Python", "pass\n", "main.py", session="bench-warmup")
+
+    started = time.perf_counter()
+    samples = _drive(pipeline, sessions, iterations, scenarios)
+    wall = time.perf_counter() - started
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sessions": sessions,
+            "iterations": iterations,
+            "scenarios": list(scenarios),
+            "model": {"latency": latency, "first_token": first_token, "chars": chars, "jitter": jitter},
+            "started_at": time.time(),
+        },
+        "wall_seconds": wall,
+        "scenarios": {name: _summarize(records, wall) for name, records in samples.items()},
+        "total": _summarize([r for records in samples.values() for r in records], wall),
+    }
+
+
+def _ms(value):
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+def print_report(result, baseline=None, out=sys.stdout):
+    meta = result["meta"]
+    print(f"commit {meta['commit']}  sessions {meta['sessions']}  iterations {meta['iterations']}  "
+          f"wall {result['wall_seconds']:.2f} s", file=out)
+    header = f"{'scenario':<12}{'count':>7}{'errors':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>9}"
+    if baseline:
+        header += f"{'p50 diff':>10}{'p95 diff':>10}{'ops/s diff':>11}"
+    print(header, file=out)
+    rows = list(result["scenarios"].items()) + [("total", result["total"])]
+    for name, stats in rows:
+        line = (f"{name:<12}{stats['count']:>7}{stats['errors']:>7}{_ms(stats['p50']):>10}"
+                f"{_ms(stats['p95']):>10}{_ms(stats['p99']):>10}{stats['throughput_per_s'] or 0:>9.1f}")
+        if baseline:
+            old = baseline["total"] if name == "total" else baseline["scenarios"].get(name)
+            line += "".join(f"{_change(old, stats, key):>{width}}"
+                            for key, width in (("p50", 10), ("p95", 10), ("throughput_per_s", 11)))
+        print(line, file=out)
+
+
+# Function to format the relative change of one statistic against the baseline
+def _change(old, new, key):
+    if not old or not old.get(key) or new.get(key) is None:
+        return "-"
+    return f"{(new[key] - old[key]) / old[key] * 100:+.0f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the run/AI pipeline with a fake model.")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent simulated sessions")
+    parser.add_argument("--iterations", type=int, default=10, help="scenario rounds per session")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model total latency (s)")
+    parser.add_argument("--first-token", type=float, default=0.15, help="fake model time to first chunk (s)")
+    parser.add_argument("--chars", type=int, default=1500, help="fake model answer size")
+    parser.add_argument("--jitter", type=float, default=0.1, help="relative latency spread")
+    parser.add_argument("--llm-rate", type=float, default=0,
+                        help="model gateway requests per second (0 = unlimited)")
+    parser.add_argument("--no-warmup", action="store_true", help="include worker startup in the results")
+    parser.add_argument("--keep-cache", action="store_true", help="use the normal result cache")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = sorted(set(scenarios) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    if not args.keep_cache:
+        # Must be set before result_cache is imported by the pipeline
+        os.environ["ABCDE_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="abcde-bench-"), "cache.sqlite3")
+    # Read by model_gateway when the pipeline imports it
+    os.environ["ABCDE_LLM_RATE"] = str(args.llm_rate)
+
+    result = run_benchmark(args.sessions, args.iterations, scenarios, args.latency, args.first_token,
+                           args.chars, args.jitter, warmup=not args.no_warmup)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 1 if result["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
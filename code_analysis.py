@@ -0,0 +1,237 @@
+# Static analysis of editor code before it runs.
+#
+# Python code is inspected with the ast module and Java code with a small
+# tokenizer that blanks out comments and literals first, so a word inside a
+# string or a comment never counts, and method names like read()/write() on
+# arbitrary objects are not mistaken for file I/O. The report is memoized per
+# (language, code), so reruns of the same code never analyze it twice.
+import ast
+import functools
+import re
+
+# Python modules grouped by what importing them implies
+_NETWORK_MODULES = {"socket", "ssl", "urllib", "http", "requests", "httpx", "aiohttp",
+                    "ftplib", "smtplib", "poplib", "imaplib", "telnetlib", "websocket",
+                    "websockets", "xmlrpc"}
+_SUBPROCESS_MODULES = {"subprocess", "multiprocessing", "pty"}
+_FILE_MODULES = {"shutil", "tempfile", "glob", "sqlite3", "dbm", "shelve"}
+_NONDETERMINISTIC_MODULES = {"random", "time", "datetime", "uuid", "secrets", "threading",
+                             "multiprocessing", "concurrent"}
+
+# Fully qualified calls grouped the same way
+_STDIN_CALLS = {"input", "sys.stdin", "fileinput.input"}
+_FILE_CALLS = {"open", "io.open", "os.open", "os.remove", "os.unlink", "os.rename",
+               "os.replace", "os.mkdir", "os.makedirs", "os.rmdir", "os.listdir",
+               "os.scandir", "os.walk", "os.chdir"}
+_PATH_METHODS = {"read_text", "write_text", "read_bytes", "write_bytes", "unlink",
+                 "mkdir", "rmdir", "touch", "iterdir"}
+_SUBPROCESS_CALLS = {"os.system", "os.popen", "os.fork", "os.forkpty", "os.kill", "os.posix_spawn",
+                     "os.posix_spawnp", "asyncio.create_subprocess_exec", "asyncio.create_subprocess_shell",
+                     "asyncio.subprocess.create_subprocess_exec",
+                     "asyncio.subprocess.create_subprocess_shell", "pty.spawn"}
+_NONDETERMINISTIC_CALLS = {"os.urandom", "os.getpid", "os.environ", "id", "hash"}
+
+# Java constructs, matched against source with comments and literals blanked
+_JAVA_PATTERNS = {
+    "reads_stdin": r"\bSystem\s*\.\s*(in|console)\b",
+    "file_io": r"\bnew\s+(File|FileReader|FileWriter|FileInputStream|FileOutputStream|"
+               r"RandomAccessFile)\b|\b(Files|Paths)\s*\.\s*\w+",
+    "network": r"\bjava\s*\.\s*net\b|\b(Socket|ServerSocket|DatagramSocket|URL|URI|"
+               r"HttpClient|HttpURLConnection)\b",
+    "subprocess": r"\bProcessBuilder\b|\bRuntime\s*\.\s*getRuntime\s*\(\s*\)\s*\.\s*exec\b",
+    "nondeterministic": r"\b(Random|ThreadLocalRandom|SecureRandom|UUID|Thread|LocalDate|"
+                        r"LocalDateTime|LocalTime|Instant)\b|\bMath\s*\.\s*random\b|"
+                        r"\bSystem\s*\.\s*(currentTimeMillis|nanoTime|getenv)\b",
+}
+_JAVA_LITERALS = re.compile(
+    r'//[^\n]*|/\*.*?\*/|""".*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'',
+    re.DOTALL,
+)
+_JAVA_IMPORT = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+)", re.MULTILINE)
+_JAVA_INFINITE_LOOP = re.compile(r"\bwhile\s*\(\s*true\s*\)|\bfor\s*\(\s*;\s*;\s*\)")
+
+_REASONS = {
+    "reads_stdin": "reads standard input",
+    "file_io": "reads or writes files",
+    "network": "uses the network",
+    "subprocess": "starts other processes",
+    "long_loops": "contains a loop that may never end",
+    "nondeterministic": "output can change between runs",
+}
+
+
+def _empty_report(language):
+    return {
+        "language": language,
+        "syntax_ok": True,
+        "syntax_error": None,
+        "imports": [],
+        "reads_stdin": False,
+        "file_io": False,
+        "network": False,
+        "subprocess": False,
+        "long_loops": False,
+        "nondeterministic": False,
+    }
+
+
+# Visitor that resolves import aliases so `from os import system as s; s()`
+# is reported the same way as `os.system()`
+class _PythonVisitor(ast.NodeVisitor):
+    def __init__(self, report):
+        self.report = report
+        self.aliases = {}
+
+    def _module_imported(self, module):
+        root = module.split(".")[0]
+        self.report["imports"].append(module)
+        if root in _NETWORK_MODULES:
+            self.report["network"] = True
+        if root in _SUBPROCESS_MODULES:
+            self.report["subprocess"] = True
+        if root in _FILE_MODULES:
+            self.report["file_io"] = True
+        if root in _NONDETERMINISTIC_MODULES:
+            self.report["nondeterministic"] = True
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._module_imported(alias.name)
+            if alias.asname:
+                self.aliases[alias.asname] = alias.name
+            else:
+                root = alias.name.split(".")[0]
+                self.aliases[root] = root
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        if node.module and node.level == 0:
+            self._module_imported(node.module)
+            for alias in node.names:
+                self.aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+        self.generic_visit(node)
+
+    def _qualified_name(self, node):
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return None
+        parts.append(self.aliases.get(node.id, node.id))
+        return ".".join(reversed(parts))
+
+    def _check_name(self, name):
+        if name in _STDIN_CALLS or name.startswith("sys.stdin."):
+            self.report["reads_stdin"] = True
+        if name in _FILE_CALLS:
+            self.report["file_io"] = True
+        if name in _SUBPROCESS_CALLS or name.startswith(("os.exec", "os.spawn")):
+            self.report["subprocess"] = True
+        if name in _NONDETERMINISTIC_CALLS:
+            self.report["nondeterministic"] = True
+
+    def visit_Call(self, node):
+        name = self._qualified_name(node.func)
+        if name is not None:
+            self._check_name(name)
+        # Path("x").write_text(...) and similar pathlib calls
+        if isinstance(node.func, ast.Attribute) and node.func.attr in _PATH_METHODS \
+                and any(module.split(".")[0] == "pathlib" for module in self.report["imports"]):
+            self.report["file_io"] = True
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        name = self._qualified_name(node)
+        if name is not None:
+            self._check_name(name)
+        self.generic_visit(node)
+
+    def visit_While(self, node):
+        test = node.test
+        if isinstance(test, ast.Constant) and test.value and not _has_break(node.body):
+            self.report["long_loops"] = True
+        self.generic_visit(node)
+
+
+# Function to tell whether a loop body can break out of the loop itself
+def _has_break(body):
+    stack = list(body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.Break, ast.Return)):
+            return True
+        if isinstance(node, ast.Raise) or (
+                isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)
+                and isinstance(node.value.func, ast.Name) and node.value.func.id in ("exit", "quit")):
+            return True
+        # A break inside a nested loop or function does not end this loop
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.FunctionDef,
+                             ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        stack.extend(ast.iter_child_nodes(node))
+    return False
+
+
+def _analyze_python(code):
+    report = _empty_report("Python")
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        report["syntax_ok"] = False
+        report["syntax_error"] = f"{e.msg} (line {e.lineno})"
+        return report
+    _PythonVisitor(report).visit(tree)
+    return report
+
+
+# Function to list the (start, end) offsets of every comment, string literal
+# and text block in Java source
+def java_literal_spans(code):
+    return [match.span() for match in _JAVA_LITERALS.finditer(code)]
+
+
+def _analyze_java(code):
+    report = _empty_report("Java")
+    # Blank literals and comments but keep their length so offsets still match
+    stripped = _JAVA_LITERALS.sub(lambda m: " " * len(m.group()), code)
+    report["imports"] = _JAVA_IMPORT.findall(stripped)
+    for key, pattern in _JAVA_PATTERNS.items():
+        if re.search(pattern, stripped):
+            report[key] = True
+    if _JAVA_INFINITE_LOOP.search(stripped) and not re.search(r"\b(break|return)\b", stripped):
+        report["long_loops"] = True
+    return report
+
+
+# Function to analyze code once per (language, code); callers must not mutate the result
+@functools.lru_cache(maxsize=512)
+def analyze_code(language, code):
+    if language == "Python":
+        report = _analyze_python(code)
+    elif language == "Java":
+        report = _analyze_java(code)
+    else:
+        report = _empty_report(language)
+    # What comes back from the network or another program is outside our control
+    if report["network"] or report["subprocess"]:
+        report["nondeterministic"] = True
+    return report
+
+
+# Function to list the human readable findings of a report
+def describe(report):
+    return [reason for key, reason in _REASONS.items() if report.get(key)]
+
+
+# Function to pick how code should be executed:
+#   "simulated"  - the AI predicts the output (explicit opt-in only)
+#   "sandboxed"  - a throwaway worker, for code that can leave state behind
+#                  (processes, network, files) or may spin until the timeout
+#   "local"      - a warm, reusable worker
+def execution_path(report, simulate=False):
+    if simulate:
+        return "simulated"
+    if report["subprocess"] or report["network"] or report["file_io"] or report["long_loops"]:
+        return "sandboxed"
+    return "local"
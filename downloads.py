@@ -0,0 +1,104 @@
+# Downloads built straight from memory.
+#
+# Links are data URIs made from the bytes already in memory, so a click never
+# touches the working directory and concurrent sessions cannot race on a
+# shared file name. Ask AI answers are split into their fenced code blocks,
+# each saved under the file name the answer suggests, and packed into a zip
+# so a generated multi-file project downloads in one step.
+import base64
+import io
+import posixpath
+import re
+import zipfile
+
+_FENCE = re.compile(r"^(?P<fence>`{3,}|~{3,})[ \t]*(?P<info>[^\n`]*)\n(?P<body>.*?)^(?P=fence)[ \t]*$",
+                    re.MULTILINE | re.DOTALL)
+_FILE_NAME = re.compile(r"([\w][\w.\-/]*\.[A-Za-z0-9]{1,8})\b")
+_JAVA_CLASS = re.compile(r"\bpublic\s+(?:final\s+|abstract\s+)*(?:class|interface|enum|record)\s+(\w+)")
+
+# Fence language to file extension
+EXTENSIONS = {
+    "python": "py", "py": "py", "java": "java", "javascript": "js", "js": "js",
+    "typescript": "ts", "ts": "ts", "html": "html", "css": "css", "json": "json",
+    "bash": "sh", "sh": "sh", "shell": "sh", "sql": "sql", "c": "c", "cpp": "cpp",
+    "c++": "cpp", "go": "go", "rust": "rs", "kotlin": "kt", "yaml": "yaml",
+    "yml": "yaml", "xml": "xml", "markdown": "md", "md": "md", "text": "txt",
+    "dockerfile": "Dockerfile", "toml": "toml", "ini": "ini",
+}
+
+
+# Function to build an HTML download link from bytes held in memory
+def download_link(data, filename, label, mime="text/plain"):
+    b64 = base64.b64encode(data).decode()
+    return f'<a href="data:{mime};base64,{b64}" download="{filename}">{label}</a>'
+
+
+# Function to keep a suggested file name inside the archive (no absolute
+# paths or ..)
+def _safe_name(name):
+    parts = [part for part in posixpath.normpath(name.replace("\\", "/")).split("/")
+             if part not in ("", ".", "..")]
+    return "/".join(parts)
+
+
+def _name_from_hint(text):
+    match = _FILE_NAME.search(text)
+    return _safe_name(match.group(1)) if match else None
+
+
+def _guess_name(info, body, preceding_line, index):
+    words = info.split()
+    language = words[0].lower() if words else ""
+    # ```python app.py``` or ```python title="app.py"```
+    for word in words[1:]:
+        name = _name_from_hint(word)
+        if name:
+            return name
+    # "# app.py", "// Main.java" or "<!-- index.html -->" as the first line
+    first_line = body.split("\n", 1)[0].strip()
+    if re.match(r"^(#|//|<!--|--|/\*)", first_line) and len(first_line) < 80:
+        name = _name_from_hint(first_line)
+        if name:
+            return name
+    # "**app.py**" or "Create `app.py`:" just above the block
+    if preceding_line and len(preceding_line) < 120:
+        name = _name_from_hint(preceding_line)
+        if name:
+            return name
+    if language == "java":
+        match = _JAVA_CLASS.search(body)
+        if match:
+            return f"{match.group(1)}.java"
+    extension = EXTENSIONS.get(language, "txt")
+    if extension == "Dockerfile":
+        return "Dockerfile"
+    return f"file{index}.{extension}"
+
+
+# Function to extract fenced code blocks as (file name, content) pairs with
+# unique names, in the order they appear
+def extract_code_blocks(text):
+    files = []
+    used = set()
+    for index, match in enumerate(_FENCE.finditer(text), start=1):
+        before = text[:match.start()].rstrip("\n").rsplit("\n", 1)[-1].strip()
+        name = _guess_name(match.group("info"), match.group("body"), before, index)
+        stem, dot, extension = name.rpartition(".")
+        if not dot:
+            stem, extension = name, ""
+        candidate, n = name, 2
+        while candidate in used:
+            candidate = f"{stem}_{n}.{extension}" if dot else f"{stem}_{n}"
+            n += 1
+        used.add(candidate)
+        files.append((candidate, match.group("body")))
+    return files
+
+
+# Function to pack (file name, content) pairs into an in-memory zip archive
+def zip_files(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+    return buffer.getvalue()
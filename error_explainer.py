@@ -0,0 +1,394 @@
+# Instant explanations for common errors, without asking the model.
+#
+# Python code is compiled here before it is sent to a worker, so a syntax
+# error is reported without waiting for a runner. Errors are explained from a
+# catalog of rules: each rule matches the exception line of a Python
+# traceback, a javac diagnostic, a Java exception or a limit message, and
+# fills in a short explanation and the line of code the error points at. Only
+# errors no rule knows go to the model (see pipeline.explain_error).
+import builtins
+import difflib
+import functools
+import os
+import re
+import subprocess
+import sys
+import traceback
+import warnings
+
+import metrics
+import prompt_budget
+from worker_pool import POOL_PYTHON
+
+# Configuration, overridable through the environment
+SYNTAX_PRECHECK = os.environ.get("ABCDE_SYNTAX_PRECHECK", "1") != "0"
+
+_PY_EXCEPTION = re.compile(r"^(?P<type>[A-Za-z_][\w.]*)(?::\s?(?P<message>.*))?$")
+_JAVA_COMPILE_ERROR = re.compile(r"^[\w$]+\.java:\d+: error: (?P<message>.*)$")
+_JAVA_SYMBOL = re.compile(r"^\s*symbol:\s+(?P<kind>\w+)\s+(?P<name>[\w$]+)")
+_JAVA_EXCEPTION = re.compile(r'^(?:Exception in thread "[^"]*"|Caused by:) (?P<type>[\w.$]+)(?::\s?(?P<message>.*))?$')
+_JAVA_LAUNCH_ERROR = re.compile(r"^Error: (?P<message>.*)$")
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+# Errors that are often a misspelled name, worth a "Did you mean" suggestion
+_MISSPELLINGS = ("NameError", "AttributeError", "ImportError", "error: cannot find symbol")
+
+# Messages about how the run ended, checked before the error itself
+_RUN_RULES = [
+    (re.compile(r"Using AI to Simulate Output"), "Simulated run",
+     "The output above was predicted by the AI instead of produced by running the code, so it may "
+     "differ from a real run. Clear the simulate option to run the program for real."),
+    (re.compile(r"Execution timed out! Using AI Compiler"), "Time limit",
+     "The program did not finish in time, so the output above was predicted by the AI. Usually a "
+     "loop never ends, or the program waits for input: type it in the Program input (stdin) box."),
+    (re.compile(r"Execution timed out after (?P<seconds>[\d.]+) seconds"), "Time limit",
+     "The program ran for more than {seconds} seconds and was stopped. Usually a loop never ends "
+     "because its condition never becomes false, or the program waits for input that never comes: "
+     "type it in the Program input (stdin) box."),
+    (re.compile(r"Program stopped: it used more than (?P<seconds>[\d.]+) seconds of CPU time"), "CPU limit",
+     "The program kept the processor busy for more than {seconds} seconds. Look for a loop that never "
+     "ends, or an algorithm that does far more work than needed for this input."),
+    (re.compile(r"Program stopped: it tried to use more than (?P<mb>[\d.]+) MB of memory"), "Memory limit",
+     "The program needed more than {mb} MB of memory. Look for a list or string that keeps growing in "
+     "a loop, or recursion that never stops."),
+    (re.compile(r"Program stopped: it wrote more than (?P<mb>[\d.]+) MB of output"), "Output limit",
+     "The program printed more than {mb} MB. Usually a print inside a loop that never ends."),
+    (re.compile(r"Program was killed by the system"), "Killed",
+     "The program was stopped by the operating system, most often because it ran out of memory."),
+]
+
+# Python rules, matched against "Type: message" of the last exception
+_PYTHON_RULES = [
+    (r"NameError: name '(?P<name>\w+)' is not defined",
+     "`{name}` is used, but nothing with that name exists at this point. Check the spelling and "
+     "capitalisation, and make sure it is assigned, defined or imported above this line."),
+    (r"UnboundLocalError: .*'(?P<name>\w+)'",
+     "The function assigns to `{name}` somewhere, which makes it a local variable in the whole "
+     "function, but it is read before that assignment runs. Assign it first, pass it in as a "
+     "parameter, or declare `global {name}` if you mean the variable outside the function."),
+    (r"IndentationError: expected an indented block",
+     "A line ending in `:` (`if`, `for`, `while`, `def`, `class`, ...) must be followed by an "
+     "indented block. Indent the body, or write `pass` if it should do nothing."),
+    (r"IndentationError: unexpected indent",
+     "This line is indented more than the lines of its block. Line it up with the lines around it."),
+    (r"IndentationError: unindent does not match any outer indentation level",
+     "This line is indented to a depth that no enclosing block uses. Line it up exactly with the "
+     "block it belongs to; a mix of tabs and spaces often causes this."),
+    (r"TabError",
+     "The indentation mixes tabs and spaces. Indent with spaces only, four per level."),
+    (r"SyntaxError: '(?P<bracket>[(\[{])' was never closed",
+     "The `{bracket}` opened on this line is never closed. Add the missing closing bracket."),
+    (r"SyntaxError: unmatched '(?P<bracket>[)\]}])'",
+     "There is a closing `{bracket}` without a matching opening bracket before it."),
+    (r"SyntaxError: closing parenthesis '(?P<closing>.)' does not match opening parenthesis '(?P<opening>.)'",
+     "A `{opening}` is closed with `{closing}`. Brackets must be closed with their own kind, "
+     "innermost first."),
+    (r"SyntaxError: unterminated (?:triple-quoted )?string literal",
+     "A string is missing its closing quote. Close it with the same kind of quote it starts with."),
+    (r"SyntaxError: expected ':'",
+     "`if`, `elif`, `else`, `for`, `while`, `def`, `class`, `try` and `with` lines must end with a colon."),
+    (r"SyntaxError: Missing parentheses in call to '(?P<name>\w+)'",
+     "In Python 3 `{name}` is a function: write `{name}(...)` with parentheses."),
+    (r"SyntaxError: invalid syntax\. Maybe you meant '==' or ':=' instead of '='",
+     "A single `=` assigns a value. Use `==` to compare two values in a condition."),
+    (r"SyntaxError: invalid syntax\. Perhaps you forgot a comma",
+     "Two values stand next to each other with nothing between them. Separate the items of a list, "
+     "tuple or call with commas."),
+    (r"SyntaxError: '(?P<keyword>return|yield)' outside function",
+     "`{keyword}` can only be used inside a function defined with `def`. Check the indentation of "
+     "this line."),
+    (r"SyntaxError: '(?P<keyword>break|continue)' (?:outside loop|not properly in loop)",
+     "`{keyword}` can only be used inside a `for` or `while` loop. Check the indentation of this line."),
+    (r"SyntaxError: cannot assign to (?P<target>[^.]+?)(?: here)?(?:\.|$)",
+     "The left side of `=` must be a variable, an item or an attribute, not {target}. To compare "
+     "two values use `==`."),
+    (r"SyntaxError: invalid decimal literal",
+     "A number runs straight into letters, or a name starts with a digit. Names cannot begin with a "
+     "digit, and `2x` must be written `2 * x`."),
+    (r"SyntaxError: invalid character '(?P<char>.)'",
+     "The code contains `{char}`, usually from text copied out of a document or web page. Retype it "
+     "with plain quotes, dashes and spaces."),
+    (r"SyntaxError: invalid syntax$",
+     "Python could not read this line. Look near the `^` for a missing bracket, quote, colon or "
+     "operator; the real mistake is often at the end of the line before."),
+    (r"ZeroDivisionError",
+     "The program divided by zero with `/`, `//` or `%`. Check the divisor before dividing, for "
+     "example `if count != 0:`."),
+    (r"TypeError: can only concatenate str \(not \"(?P<other>\w+)\"\) to str",
+     "`+` cannot join text and a value of type `{other}`. Convert the value first with `str(...)`, or use an "
+     "f-string such as `f\"Total: {{total}}\"`."),
+    (r"TypeError: unsupported operand type\(s\) for (?P<op>.+?): '(?P<left>\w+)' and '(?P<right>\w+)'",
+     "`{op}` does not work between a `{left}` and a `{right}`. Convert one of them first; text read "
+     "with `input()` is a `str` and needs `int(...)` or `float(...)` before arithmetic."),
+    (r"TypeError: '(?P<op>[<>]=?)' not supported between instances of '(?P<left>\w+)' and '(?P<right>\w+)'",
+     "A `{left}` cannot be compared with a `{right}` using `{op}`. Convert them to the same type "
+     "first, e.g. `int(...)` for numbers read as text."),
+    (r"TypeError: '(?P<kind>\w+)' object is not callable",
+     "A `{kind}` value is called like a function with `(...)`. Often a variable has the same name as "
+     "a function (e.g. `list = [...]` hides `list()`), or a `*` is missing as in `2(x + 1)`."),
+    (r"TypeError: '(?P<kind>\w+)' object is not subscriptable",
+     "`[...]` is used on a `{kind}`, which has no items. Check that the variable holds the list, "
+     "string or dictionary you expect."),
+    (r"TypeError: '(?P<kind>\w+)' object is not iterable",
+     "A loop or unpacking goes over a `{kind}`, which has no items. To repeat something n times "
+     "use `range(n)`."),
+    (r"TypeError: (?P<func>[\w.]+)\(\) missing \d+ required (?:positional|keyword-only) arguments?: (?P<names>.+)",
+     "`{func}()` is called without {names}. Pass a value for every parameter the function declares."),
+    (r"TypeError: (?P<func>[\w.]+)\(\) takes (?P<expected>.+?) positional arguments? but (?P<given>\d+) (?:was|were) given",
+     "`{func}()` accepts {expected} positional argument(s) but {given} were passed. For a method, "
+     "`self` counts as the first one."),
+    (r"TypeError: (?:list|string|tuple|str) indices must be integers",
+     "Items are picked by whole-number position. Convert the index with `int(...)`, and use `//` "
+     "instead of `/` to compute one."),
+    (r"IndexError: (?P<kind>\w+) index out of range",
+     "The program asked for a position the {kind} does not have. Valid positions are 0 to "
+     "`len(...) - 1`; check loop bounds such as `range(len(items))`."),
+    (r"IndexError: pop from empty list",
+     "`pop()` was called on an empty list. Check `if items:` before taking an item out."),
+    (r"KeyError: (?P<key>.+)",
+     "The dictionary has no key {key}. Check the spelling, test with `if {key} in d:` first, or use "
+     "`d.get({key})` to get `None` instead of an error."),
+    (r"AttributeError: module '(?P<module>[\w.]+)' has no attribute '(?P<name>\w+)'",
+     "The module `{module}` has no `{name}`. Check the spelling; a file of yours named "
+     "`{module}.py` can also hide the real module."),
+    (r"AttributeError: '(?P<kind>\w+)' object has no attribute '(?P<name>\w+)'",
+     "`{kind}` values have no attribute or method `{name}`. Check the spelling and that the "
+     "variable holds the type you expect."),
+    (r"ValueError: invalid literal for int\(\) with base \d+: (?P<value>.+)",
+     "`int()` can only convert text that is a whole number, but got {value}. Use `float()` for "
+     "decimals, and check the program input for extra words or empty lines."),
+    (r"ValueError: could not convert string to float: (?P<value>.+)",
+     "`float()` can only convert text that is a number, but got {value}. Check the program input."),
+    (r"ValueError: not enough values to unpack \(expected (?P<expected>\d+), got (?P<got>\d+)\)",
+     "{expected} variables are assigned from something with only {got} value(s). With "
+     "`a, b = input().split()` the input line must hold exactly that many words."),
+    (r"ValueError: too many values to unpack \(expected (?P<expected>\d+)",
+     "{expected} variables are assigned from something with more values. With "
+     "`a, b = input().split()` the input line must hold exactly that many words."),
+    (r"ValueError: math domain error",
+     "A math function got a value outside its range, such as `math.sqrt()` of a negative number or "
+     "`math.log(0)`."),
+    (r"ModuleNotFoundError: No module named '(?P<module>[\w.]+)'",
+     "The module `{module}` is not installed on this server, or its name is misspelled. The standard "
+     "library and the preinstalled packages are available."),
+    (r"ImportError: cannot import name '(?P<name>\w+)' from '(?P<module>[\w.]+)'",
+     "`{module}` has nothing named `{name}`. Check the spelling and capitalisation."),
+    (r"RecursionError",
+     "A function kept calling itself without reaching a case that stops. Make sure the recursion has "
+     "a base case that returns without calling again, and that every call moves towards it."),
+    (r"EOFError",
+     "`input()` was called but there was no more input. Type what the program expects in the "
+     "Program input (stdin) box, one line per `input()` call."),
+    (r"FileNotFoundError: .*No such file or directory: (?P<path>.+)",
+     "There is no file {path}. Programs run in an empty directory, so a file must be created by the "
+     "program before it is read."),
+    (r"AssertionError",
+     "An `assert` statement found its condition false."),
+    (r"MemoryError",
+     "The program ran out of memory. Look for a list or string that keeps growing in a loop."),
+    (r"OverflowError",
+     "A number became too large for a float. Use integers, which have no limit, or smaller values."),
+]
+
+# Java rules: javac diagnostics ("error: message"), then exceptions
+_JAVA_RULES = [
+    (r"error: cannot find symbol\n(?P<kind>\w+) (?P<name>[\w$]+)",
+     "`{name}` is not declared where it is used. Java is case-sensitive: check the spelling, declare "
+     "the {kind} before this line, or add the missing `import`."),
+    (r"error: '(?P<token>[^']+)' expected",
+     "The compiler expected `{token}` here. A missing `;` is usually at the end of the statement "
+     "before the marked position."),
+    (r"error: incompatible types: possible lossy conversion from (?P<source>\w+) to (?P<target>\w+)",
+     "Converting `{source}` to `{target}` can lose information, so Java wants it spelled out "
+     "with a cast: `({target}) value`."),
+    (r"error: incompatible types: (?P<found>.+?) cannot be converted to (?P<required>.+)",
+     "A value of type `{found}` is used where `{required}` is needed. Convert it explicitly, e.g. "
+     "`Integer.parseInt(text)` or `String.valueOf(number)`, or change the variable's type."),
+    (r"error: missing return statement",
+     "The method declares a return type, but some path through it ends without `return`. Add a "
+     "`return` after the last `if`/`else` or loop."),
+    (r"error: variable (?P<name>\w+) might not have been initialized",
+     "`{name}` is read before it is certainly given a value. Initialize it where it is declared."),
+    (r"error: variable (?P<name>\w+) is already defined",
+     "`{name}` is declared twice in the same scope. Remove the type in front of the second one to "
+     "assign to the existing variable."),
+    (r"error: class (?P<name>\w+) is public, should be declared in a file named",
+     "A public class must be in a file of the same name. Rename the class to match the file, or the "
+     "file to `{name}.java`."),
+    (r"error: unclosed string literal",
+     "A string is missing its closing `\"`."),
+    (r"error: reached end of file while parsing",
+     "The file ended inside a block: a closing `}}` is missing."),
+    (r"error: unreachable statement",
+     "This statement can never run because it comes after a `return`, `break`, `continue` or "
+     "`throw`. Remove it or move it before that statement."),
+    (r"error: non-static (?:variable|method) (?P<name>\S+) cannot be referenced from a static context",
+     "`main` is `static`, so it cannot use `{name}` directly. Declare it `static` too, or create an "
+     "object and use it through that."),
+    (r"error: bad operand types for binary operator '(?P<op>[^']+)'",
+     "`{op}` does not work with these types. Compare strings with `.equals(...)` and convert text "
+     "to numbers with `Integer.parseInt(...)`."),
+    (r"error: method (?P<name>\w+) in class (?P<cls>\w+) cannot be applied to given types",
+     "`{name}` is called with arguments that do not match its parameters. Check their number, order "
+     "and types against the declaration in `{cls}`."),
+    (r"error: unreported exception (?P<type>[\w.]+); must be caught or declared to be thrown",
+     "`{type}` is a checked exception. Wrap the call in `try`/`catch`, or add `throws {type}` to the "
+     "method declaration."),
+    (r"error: 'else' without 'if'",
+     "This `else` does not follow an `if` block. Often a stray `;` after `if (...)` or a missing "
+     "`}}` ends the `if` too early."),
+    (r"java\.lang\.ArithmeticException: / by zero",
+     "The program divided an integer by zero. Check the divisor before dividing."),
+    (r"java\.lang\.(?:Array|String)?IndexOutOfBoundsException: (?P<message>.+)",
+     "The program used a position that does not exist ({message}). Valid positions are 0 to "
+     "length - 1; loops over an array should use `i < array.length`, not `<=`."),
+    (r"java\.lang\.NullPointerException",
+     "A variable that holds `null` was used as an object. Make sure it is assigned, e.g. with "
+     "`new`, before calling its methods or reading its fields."),
+    (r"java\.lang\.NumberFormatException: For input string: (?P<value>\"[^\"]*\")",
+     "{value} is not a number, so it cannot be parsed. Check the program input and trim spaces "
+     "with `.trim()` first."),
+    (r"java\.util\.InputMismatchException",
+     "`Scanner` read a value of the wrong type, e.g. `nextInt()` on a word. Check the program input."),
+    (r"java\.util\.NoSuchElementException",
+     "`Scanner` ran out of input. Type what the program expects in the Program input (stdin) box."),
+    (r"java\.lang\.ClassCastException: (?P<message>.+)",
+     "An object was cast to a type it does not have ({message}). Check the type with `instanceof` "
+     "before casting."),
+    (r"java\.lang\.StackOverflowError",
+     "A method kept calling itself without reaching a case that stops. Make sure the recursion has a "
+     "base case and that every call moves towards it."),
+    (r"java\.lang\.OutOfMemoryError",
+     "The program ran out of memory. Look for a collection that keeps growing in a loop."),
+    (r"Error: Could not find or load main class",
+     "The class with `main` could not be found. Check that the class name matches the file name."),
+    (r"Error: Main method not found",
+     "The class has no `public static void main(String[] args)` method to start from."),
+]
+
+_RULES = {
+    "Python": [(re.compile(pattern), text) for pattern, text in _PYTHON_RULES],
+    "Java": [(re.compile(pattern), text) for pattern, text in _JAVA_RULES],
+}
+
+
+# Function to check that the workers run the same Python version as this
+# process, so compile() here accepts exactly what they would
+@functools.lru_cache(maxsize=1)
+def _same_python():
+    try:
+        version = subprocess.run([POOL_PYTHON, "-I", "-c", "import sys; print(sys.version_info[:2])"],
+                                 capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return version == str(sys.version_info[:2])
+
+
+# Function to compile Python code the way the worker does; returns the error
+# as the worker would print it, or None when the code compiles (or cannot be
+# checked here)
+@functools.lru_cache(maxsize=512)
+def syntax_check(code, filename="main.py"):
+    if not SYNTAX_PRECHECK or not _same_python():
+        return None
+    try:
+        with warnings.catch_warnings():
+            # The worker prints these when the code runs
+            warnings.simplefilter("ignore")
+            compile(code, filename, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return "".join(traceback.format_exception_only(type(e), e))
+    except (ValueError, RecursionError, MemoryError):
+        # Null bytes or absurdly deep nesting; let the worker report it
+        return None
+    return None
+
+
+# Function to find what a Python traceback or Java output is about; returns
+# (title, the text the rules match)
+def _error_key(language, stderr):
+    lines = [line for line in stderr.splitlines() if line.strip()]
+    if language == "Java":
+        for i, line in enumerate(lines):
+            match = _JAVA_COMPILE_ERROR.match(line)
+            if match:
+                # javac names the missing symbol a few lines below
+                symbol = next((m for m in map(_JAVA_SYMBOL.match, lines[i + 1:i + 4]) if m), None)
+                extra = f"\n{symbol.group('kind')} {symbol.group('name')}" if symbol else ""
+                return "Compile error", f"error: {match.group('message')}{extra}"
+        for line in lines:
+            match = _JAVA_EXCEPTION.match(line)
+            if match:
+                name = match.group("type")
+                return name.rsplit(".", 1)[-1], f"{name}: {match.group('message') or ''}"
+        for line in lines:
+            if _JAVA_LAUNCH_ERROR.match(line):
+                return "Launch error", line
+        return None, None
+    # The exception line is the last unindented one that names an exception
+    for line in reversed(lines):
+        match = None if line.startswith(" ") else _PY_EXCEPTION.match(line)
+        if match and re.search(r"(Error|Exception|Warning)$", match.group("type")):
+            name = match.group("type").rsplit(".", 1)[-1]
+            return name, f"{name}: {match.group('message') or ''}"
+    return None, None
+
+
+# Function to suggest a known name close to a misspelled one
+def _did_you_mean(name, candidates):
+    close = difflib.get_close_matches(name, sorted(set(candidates) - {name}), n=1, cutoff=0.75)
+    return f" Did you mean `{close[0]}`?" if close else ""
+
+
+def _suggestion(language, values, code):
+    name = values.get("name")
+    if not name or values.get("module"):
+        return ""
+    if values.get("kind") in vars(builtins) and isinstance(vars(builtins)[values["kind"]], type):
+        # A method of a built-in type, e.g. 'str' object has no attribute 'uppper'
+        return _did_you_mean(name, dir(vars(builtins)[values["kind"]]))
+    candidates = _IDENTIFIER.findall(code)
+    if language == "Python":
+        candidates += dir(builtins)
+    return _did_you_mean(name, candidates)
+
+
+def _source_line(language, stderr, code, filename):
+    lines = prompt_budget.failing_lines(stderr, filename)
+    if not lines:
+        return None, ""
+    # The innermost frame in the user's file: last in Python, first in Java
+    number = lines[-1] if language == "Python" else lines[0]
+    code_lines = code.splitlines()
+    source = code_lines[number - 1].strip() if 0 < number <= len(code_lines) else ""
+    return number, source.replace("```", "")
+
+
+# Function to explain an error from the rule catalog; returns Markdown, or
+# None when no rule knows the error
+@functools.lru_cache(maxsize=512)
+def explain(language, stderr, code="", filename="main.py"):
+    title, text = None, None
+    for pattern, name, template in _RUN_RULES:
+        match = pattern.search(stderr)
+        if match:
+            title, text = name, template.format(**match.groupdict())
+            break
+    if text is None:
+        title, key = _error_key(language, stderr)
+        for pattern, template in _RULES.get(language, []) if key else []:
+            match = pattern.match(key)
+            if match:
+                values = {name: value or "" for name, value in match.groupdict().items()}
+                text = template.format(**values)
+                if key.startswith(_MISSPELLINGS):
+                    text += _suggestion(language, match.groupdict(), code)
+                break
+    metrics.inc("abcde_error_rules_total", language=language, result="miss" if text is None else "hit")
+    if text is None:
+        return None
+
+    number, source = _source_line(language, stderr, code, filename)
+    heading = f"**{title}**" + (f" on line {number}" if number else "")
+    fence = "python" if language == "Python" else "java"
+    quoted = f"\n\n```{fence}\n{source}\n```" if source else ""
+    return f"{heading}:{quoted}\n\n{text}"
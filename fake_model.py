@@ -0,0 +1,92 @@
+# Local stand-in for google.generativeai.GenerativeModel.
+#
+# Answers after a configurable delay with deterministic text of a
+# configurable size, streamed in chunks like the real SDK, so the pipeline can
+# be load tested without network access or an API key. Prompts that ask for
+# code get a fenced code block, which keeps the download path busy too.
+import hashlib
+import os
+import random
+import threading
+import time
+
+# Defaults, overridable through the environment
+FAKE_LATENCY = float(os.environ.get("ABCDE_FAKE_LATENCY", "1.0"))
+FAKE_FIRST_TOKEN = float(os.environ.get("ABCDE_FAKE_FIRST_TOKEN", "0.3"))
+FAKE_CHARS = int(os.environ.get("ABCDE_FAKE_CHARS", "1500"))
+FAKE_CHUNK_CHARS = int(os.environ.get("ABCDE_FAKE_CHUNK_CHARS", "120"))
+# Relative spread applied to both delays, e.g. 0.2 for +/-20%
+FAKE_JITTER = float(os.environ.get("ABCDE_FAKE_JITTER", "0.0"))
+
+_CODE_WORDS = ("code", "generate", "write", "build", "program")
+_FILLER = ("The program reads its input, processes it step by step and prints the result. "
+           "Each line of the output corresponds to one statement in the code above. ")
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    def __init__(self, text, chunk_chars, first_token, remaining, stream):
+        self.text = text
+        self.safety_ratings = []
+        self._chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)] or [""]
+        self._first_token = first_token
+        self._remaining = remaining
+        self._stream = stream
+
+    def __iter__(self):
+        if not self._stream:
+            yield _Chunk(self.text)
+            return
+        pause = self._remaining / max(1, len(self._chunks) - 1)
+        for i, text in enumerate(self._chunks):
+            time.sleep(self._first_token if i == 0 else pause)
+            yield _Chunk(text)
+
+    def resolve(self):
+        pass
+
+
+class FakeGenerativeModel:
+    def __init__(self, latency=FAKE_LATENCY, first_token_latency=FAKE_FIRST_TOKEN, chars=FAKE_CHARS,
+                 chunk_chars=FAKE_CHUNK_CHARS, jitter=FAKE_JITTER, seed=None):
+        self.latency = latency
+        self.first_token_latency = min(first_token_latency, latency)
+        self.chars = chars
+        self.chunk_chars = max(1, chunk_chars)
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _scale(self):
+        if not self.jitter:
+            return 1.0
+        with self._lock:
+            return max(0.0, 1 + self._random.uniform(-self.jitter, self.jitter))
+
+    # Function to build a deterministic answer of about self.chars characters
+    def _answer(self, prompt):
+        digest = hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()[:12]
+        parts = [f"Answer {digest}.\n\n"]
+        if any(word in str(prompt).lower() for word in _CODE_WORDS):
+            parts.append(f"**main.py**\n```python\ndef solve():\n    return '{digest}'\n\n"
+                         f"print(solve())\n```\n\n")
+        head = "".join(parts)
+        filler = _FILLER * (max(0, self.chars - len(head)) // len(_FILLER) + 1)
+        return head + filler[:max(0, self.chars - len(head))]
+
+    # Same signature as GenerativeModel.generate_content for the arguments the app uses
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        scale = self._scale()
+        first_token = self.first_token_latency * scale
+        remaining = max(0.0, self.latency - self.first_token_latency) * scale
+        text = self._answer(prompt)
+        if not stream:
+            time.sleep(first_token + remaining)
+        return FakeResponse(text, self.chunk_chars, first_token, remaining, stream)
@@ -0,0 +1,138 @@
+# Real Java execution backed by long-lived compile daemons.
+#
+# Each daemon is a JVM running CompileServer.java: it compiles the editor
+# source in memory and runs main() in a fresh class loader, so neither JVM
+# startup nor javac warm-up is paid per click. Compiled classes are cached by
+# source hash in the daemon's memory, so re-running unchanged code skips
+# compilation. There is no disk tier: programs share the server's user and
+# could replace class files for everyone else.
+#
+# The daemons reuse the worker pool machinery from worker_pool: same capture
+# files, same timeout and recycling rules, same CompletedProcess results.
+import atexit
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import threading
+
+from worker_pool import WorkerDied, WorkerPool, _Worker
+
+COMPILE_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "CompileServer.java")
+
+# Configuration, overridable through the environment
+JAVA_BIN = os.environ.get("ABCDE_JAVA", "java")
+JAVA_DAEMONS = int(os.environ.get("ABCDE_JAVA_DAEMONS", "1"))
+JAVA_MAX_RUNS = int(os.environ.get("ABCDE_JAVA_MAX_RUNS", "200"))
+JAVA_HEAP_MB = int(os.environ.get("ABCDE_JAVA_HEAP_MB", "256"))
+
+_INT = struct.Struct(">i")
+
+
+# Function to check that a full JDK (java plus the compiler) is installed
+def java_available():
+    java = shutil.which(JAVA_BIN)
+    if java is None:
+        return False
+    java_home = os.path.dirname(os.path.realpath(java))
+    return shutil.which("javac", path=java_home) is not None
+
+
+# Function to compute the class cache key for a source file
+def source_hash(class_name, code):
+    return hashlib.sha256(f"{class_name}\0{code}".encode("utf-8")).hexdigest()
+
+
+# A JVM running CompileServer; speaks length-prefixed fields instead of JSON
+class _JavaDaemon(_Worker):
+    # The heap is bounded by -Xmx; an address space limit would stop the JVM
+    # from reserving its code cache and metaspace
+    limit_address_space = False
+
+    # The protocol runs over two pipes whose numbers are passed as arguments;
+    # the JVM's stdin and stdout are /dev/null, so FileDescriptor.in/out in a
+    # program cannot read the next request or forge a reply
+    def _start(self, command):
+        request_read, request_write = os.pipe()
+        reply_read, reply_write = os.pipe()
+        try:
+            proc = super()._start(command + [str(request_read), str(reply_write)], stdin=subprocess.DEVNULL,
+                                  stdout=subprocess.DEVNULL, pass_fds=(request_read, reply_write))
+        except BaseException:
+            os.close(request_write)
+            os.close(reply_read)
+            raise
+        finally:
+            os.close(request_read)
+            os.close(reply_write)
+        # send(), recv() and kill() use the pipes through these attributes
+        proc.stdin = os.fdopen(request_write, "wb")
+        proc.stdout = os.fdopen(reply_read, "rb")
+        return proc
+
+    def send(self, message):
+        class_name = os.path.splitext(os.path.basename(message["filename"]))[0]
+        fields = [
+            source_hash(class_name, message["code"]),
+            class_name,
+            message["code"],
+            message["stdin_path"],
+            message["stdout_path"],
+            message["stderr_path"],
+        ]
+        payload = b"".join(
+            _INT.pack(len(data)) + data for data in (field.encode("utf-8") for field in fields)
+        )
+        try:
+            self.proc.stdin.write(payload)
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise WorkerDied()
+
+    def recv(self, deadline):
+        exit_code, cached, clean, heap_mb = struct.unpack(">i??i", self._read_exact(10, deadline))
+        return {
+            "returncode": exit_code,
+            "cached": cached,
+            "clean": clean,
+            "rss_mb": heap_mb,
+        }
+
+
+class JavaDaemonPool(WorkerPool):
+    language = "Java"
+    # System.exit() ends the daemon's JVM
+    exit_ends_runner = True
+
+    def __init__(self, size=JAVA_DAEMONS, max_runs=JAVA_MAX_RUNS, heap_mb=JAVA_HEAP_MB,
+                 java=JAVA_BIN):
+        self.heap_mb = heap_mb
+        # The heap limit is enforced by the JVM itself; recycle a little
+        # before it so a daemon never runs user code close to OOM
+        super().__init__(size=size, max_runs=max_runs, max_rss_mb=heap_mb * 0.9,
+                         python=java, preload=[])
+
+    def _new_worker(self):
+        return _JavaDaemon([
+            self.python,
+            f"-Xmx{self.heap_mb}m",
+            "-Xshare:auto",
+            "-XX:+UseSerialGC",
+            "-XX:TieredStopAtLevel=1",
+            COMPILE_SERVER,
+        ])
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the process-wide Java daemon pool, starting it on first use
+def get_java_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = JavaDaemonPool()
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,328 @@
+# Persistent per-session Python kernels for the notebook mode.
+#
+# In notebook mode the editor is split into cells at "# %%" lines (the percent
+# format of Jupyter, VS Code and Spyder); code without markers is one cell.
+# Each session gets its own python_worker process whose namespace survives
+# between runs, so a run only executes the cells whose source changed since
+# the last run and the cells after them. The output of the unchanged cells in
+# front is replayed from the run that produced it. A changed stdin or file
+# name runs every cell again.
+#
+# A kernel holds its memory for as long as it lives, so kernels are reclaimed
+# when idle for KERNEL_IDLE_SECONDS, when they grow past KERNEL_MAX_RSS_MB,
+# when the host runs low on available memory (least recently used first),
+# and when more than KERNEL_MAX sessions have one. Timeouts, crashes and
+# cancelled runs reclaim the kernel too. The next run after a reclaim starts
+# from an empty namespace. Runs are bounded and measured by run_limits like
+# pool runs.
+import atexit
+import os
+import re
+import subprocess
+import threading
+import time
+
+import metrics
+import output_capture
+import run_limits
+from worker_pool import (POOL_PRELOAD, POOL_PYTHON, STREAM_INTERVAL, WORKER_SCRIPT, WorkerDied, _Worker,
+                         record_run, stream_output)
+
+# Configuration, overridable through the environment
+KERNEL_IDLE_SECONDS = float(os.environ.get("ABCDE_KERNEL_IDLE_SECONDS", "600"))
+KERNEL_MAX_RSS_MB = float(os.environ.get("ABCDE_KERNEL_MAX_RSS_MB", "512"))
+KERNEL_MAX = int(os.environ.get("ABCDE_KERNEL_MAX", "8"))
+# Idle kernels are reclaimed while the host has less memory available than this
+KERNEL_MIN_AVAILABLE_MB = float(os.environ.get("ABCDE_KERNEL_MIN_AVAILABLE_MB", "256"))
+KERNEL_REAP_INTERVAL = float(os.environ.get("ABCDE_KERNEL_REAP_INTERVAL", "30"))
+
+_CELL_MARKER = re.compile(r"^\s*#\s*%%")
+
+
+# Function to split code into [(first line number, source)] cells at "# %%"
+# lines; each marker line belongs to the cell it starts
+def split_cells(code):
+    cells = []
+    for number, line in enumerate(code.splitlines(True), 1):
+        if not cells or _CELL_MARKER.match(line):
+            cells.append([number, ""])
+        cells[-1][1] += line
+    return [(first_line, source) for first_line, source in cells if source.strip()]
+
+
+# Function to read the memory the host can still hand out, in MB
+def _available_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+# A worker whose namespace is kept between runs, owned by one session
+class _Kernel(_Worker):
+    def __init__(self, command, session):
+        super().__init__(command)
+        self.session = session
+        # (source, stdout, stderr) of the cells that ran successfully, in order
+        self.cells = []
+        self.stdin = None
+        self.filename = None
+        self.rss_mb = 0.0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class KernelManager:
+    # Language the runs are recorded under in run_limits
+    language = "Python"
+
+    def __init__(self, max_kernels=KERNEL_MAX, idle_seconds=KERNEL_IDLE_SECONDS, max_rss_mb=KERNEL_MAX_RSS_MB,
+                 min_available_mb=KERNEL_MIN_AVAILABLE_MB, python=POOL_PYTHON, preload=POOL_PRELOAD):
+        self.max_kernels = max(1, max_kernels)
+        self.idle_seconds = idle_seconds
+        self.max_rss_mb = max_rss_mb
+        self.min_available_mb = min_available_mb
+        self.python = python
+        self.preload = [name.strip() for name in preload if name.strip()]
+        self._kernels = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _spawn(self, session):
+        # Make room first, so a new kernel is never what tips the host over
+        self.reap()
+        with self._lock:
+            while len(self._kernels) >= self.max_kernels:
+                victim = self._least_recent_idle()
+                if victim is None:
+                    break
+                self._discard(victim, "capacity")
+        with metrics.timer("abcde_worker_spawn_seconds", language="Python kernel"):
+            kernel = _Kernel([self.python, "-I", "-u", WORKER_SCRIPT, *self.preload], session)
+        with self._lock:
+            self._kernels[session] = kernel
+        return kernel
+
+    # Must be called with self._lock held
+    def _least_recent_idle(self):
+        idle = [kernel for kernel in self._kernels.values() if not kernel.lock.locked()]
+        return min(idle, key=lambda kernel: kernel.last_used) if idle else None
+
+    # Must be called with self._lock held
+    def _discard(self, kernel, reason):
+        if self._kernels.get(kernel.session) is kernel:
+            del self._kernels[kernel.session]
+        kernel.kill()
+        metrics.inc("abcde_kernel_reclaimed_total", reason=reason)
+
+    def _reclaim(self, kernel, reason):
+        with self._lock:
+            self._discard(kernel, reason)
+
+    # Function to run code in the session's kernel, executing only the cells
+    # that changed; mirrors WorkerPool.run (CompletedProcess, TimeoutExpired,
+    # on_output chunks, ``.stats``). The stats carry a "kernel" entry with the
+    # number of cells, how many were reused and how many ran.
+    def run(self, session, code, filename, timeout=20, on_output=None, stdin=""):
+        if self._closed:
+            raise RuntimeError("kernel manager is shut down")
+        while True:
+            with self._lock:
+                kernel = self._kernels.get(session)
+            fresh = kernel is None or kernel.proc.poll() is not None
+            if fresh:
+                if kernel is not None:
+                    self._reclaim(kernel, "died")
+                kernel = self._spawn(session)
+            with kernel.lock:
+                with self._lock:
+                    # Reclaimed between the lookup and the lock: start over
+                    if self._kernels.get(session) is not kernel:
+                        continue
+                kernel.last_used = time.monotonic()
+                try:
+                    return self._run_cells(kernel, code, filename, timeout, on_output, stdin, fresh)
+                finally:
+                    kernel.last_used = time.monotonic()
+
+    def _run_cells(self, kernel, code, filename, timeout, on_output, stdin, fresh):
+        cells = split_cells(code)
+        if stdin != kernel.stdin or filename != kernel.filename:
+            kernel.cells = []
+        reused = 0
+        while (reused < min(len(cells), len(kernel.cells))
+               and cells[reused][1] == kernel.cells[reused][0]):
+            reused += 1
+        kernel.cells = kernel.cells[:reused]
+        kernel.stdin, kernel.filename = stdin, filename
+        replayed_out = "".join(stdout for _, stdout, _ in kernel.cells)
+        replayed_err = "".join(stderr for _, _, stderr in kernel.cells)
+        if on_output is not None and (replayed_out or replayed_err):
+            on_output(replayed_out, replayed_err)
+        to_run = cells[reused:]
+        metrics.inc("abcde_kernel_cells_total", len(to_run), action="executed")
+        metrics.inc("abcde_kernel_cells_total", reused, action="reused")
+        info = {"cells": len(cells), "reused": reused, "executed": 0, "fresh": fresh}
+
+        args = [kernel.proc.args[0], filename]
+        usage = run_limits.start_run(kernel.proc.pid)
+        kernel.reset_stream()
+        if not to_run:
+            stats = record_run(self.language, kernel, usage, 0, "")
+            stats["kernel"] = info
+            result = subprocess.CompletedProcess(args, 0, replayed_out, replayed_err)
+            result.stats = stats
+            return result
+
+        deadline = time.monotonic() + timeout
+        try:
+            kernel.write_stdin(stdin)
+            kernel.send({
+                "code": code,
+                "cells": to_run,
+                "filename": filename,
+                "stdin_path": kernel.stdin_path,
+                "stdout_path": kernel.stdout_path,
+                "stderr_path": kernel.stderr_path,
+            })
+            if on_output is not None:
+                remaining = timeout
+                while remaining > 0 and not kernel.wait_readable(min(STREAM_INTERVAL, remaining)):
+                    stream_output(kernel, on_output)
+                    remaining = deadline - time.monotonic()
+            reply = kernel.recv(deadline)
+        except subprocess.TimeoutExpired:
+            stream_output(kernel, on_output, final=True)
+            stdout, stderr = kernel.read_output()
+            stats = record_run(self.language, kernel, usage, None, stderr, timed_out=True)
+            stats["kernel"] = dict(info, reclaimed="timeout")
+            self._reclaim(kernel, "timeout")
+            error = subprocess.TimeoutExpired(args, timeout, output=output_capture.clip(replayed_out + stdout),
+                                              stderr=output_capture.clip(replayed_err + stderr))
+            error.stats = stats
+            raise error
+        except WorkerDied:
+            returncode = kernel.wait_exited()
+            stream_output(kernel, on_output, final=True)
+            stdout, stderr = kernel.read_output()
+            stats = record_run(self.language, kernel, usage, returncode, stderr)
+            stats["kernel"] = dict(info, reclaimed="died")
+            self._reclaim(kernel, "died")
+            result = subprocess.CompletedProcess(args, returncode, output_capture.clip(replayed_out + stdout),
+                                                 output_capture.clip(replayed_err + stderr))
+            result.stats = stats
+            return result
+        except BaseException:
+            # The caller gave up mid-run; the namespace is in an unknown state
+            record_run(self.language, kernel, usage, None, "", reason="cancelled")
+            self._reclaim(kernel, "cancelled")
+            raise
+
+        stream_output(kernel, on_output, final=True)
+        stdout, stderr = kernel.read_output()
+        stats = record_run(self.language, kernel, usage, reply["returncode"], stderr)
+        kernel.rss_mb = reply["rss_mb"]
+        sizes = reply.get("sizes") or []
+        # Remember each finished cell with its own slice of the output
+        start = [0, 0]
+        for (_, source), end in zip(to_run, sizes):
+            if end is None:
+                break
+            kernel.cells.append((source, output_capture.read_range(kernel.stdout_path, start[0], end[0]),
+                                 output_capture.read_range(kernel.stderr_path, start[1], end[1])))
+            start = end
+        info["executed"] = len(kernel.cells) - reused
+        reason = None
+        if not reply["clean"]:
+            reason = "unclean"
+        elif reply["rss_mb"] > self.max_rss_mb:
+            reason = "memory"
+        if reason:
+            info["reclaimed"] = reason
+            self._reclaim(kernel, reason)
+        stats["kernel"] = info
+        result = subprocess.CompletedProcess(args, reply["returncode"], output_capture.clip(replayed_out + stdout),
+                                             output_capture.clip(replayed_err + stderr))
+        result.stats = stats
+        return result
+
+    # Function to drop the session's kernel so the next run starts fresh
+    def restart(self, session):
+        with self._lock:
+            kernel = self._kernels.get(session)
+            if kernel is not None:
+                self._discard(kernel, "restart")
+
+    # Function to reclaim idle kernels, and the least recently used ones
+    # while the host is short of memory
+    def reap(self):
+        now = time.monotonic()
+        with self._lock:
+            for kernel in list(self._kernels.values()):
+                if not kernel.lock.locked() and now - kernel.last_used > self.idle_seconds:
+                    self._discard(kernel, "idle")
+            while self.min_available_mb > 0:
+                available = _available_mb()
+                if available is None or available >= self.min_available_mb:
+                    break
+                victim = self._least_recent_idle()
+                if victim is None:
+                    break
+                self._discard(victim, "memory_pressure")
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            kernels = list(self._kernels.values())
+        return {
+            "kernels": len(kernels),
+            "rss_mb": sum(kernel.rss_mb for kernel in kernels),
+            "sessions": [{"session": kernel.session[:8], "cells": len(kernel.cells),
+                          "rss_mb": round(kernel.rss_mb, 1), "idle_seconds": round(now - kernel.last_used)}
+                         for kernel in kernels],
+        }
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            kernels = list(self._kernels.values())
+            self._kernels.clear()
+        for kernel in kernels:
+            kernel.kill()
+
+
+def _reap_periodically(manager):
+    while not manager._closed:
+        time.sleep(KERNEL_REAP_INTERVAL)
+        manager.reap()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+# Function to get the process-wide kernel manager, starting it on first use
+def get_kernel_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = KernelManager()
+            atexit.register(_manager.shutdown)
+            threading.Thread(target=_reap_periodically, args=(_manager,), name="kernel-reaper",
+                             daemon=True).start()
+        return _manager
+
+
+def _collect_metrics():
+    if _manager is None:
+        return
+    status = _manager.status()
+    yield "abcde_kernels", {}, status["kernels"]
+    yield "abcde_kernel_rss_mb", {}, status["rss_mb"]
+
+
+metrics.register_collector(_collect_metrics)
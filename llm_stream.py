@@ -0,0 +1,70 @@
+# Streaming helper shared by every Gemini call site.
+#
+# generate_content(..., stream=True) yields the answer in chunks; passing each
+# chunk to on_text lets the page render partial text instead of waiting behind
+# a spinner for the whole response. Every call records its time to first
+# token and total latency so slow prompts show up in latency_summary().
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# Most recent calls kept for latency_summary()
+LATENCY_HISTORY = 500
+
+_latencies = deque(maxlen=LATENCY_HISTORY)
+_latencies_lock = threading.Lock()
+
+
+# Function to generate a response chunk by chunk; returns the full text and
+# the underlying response object once the stream is exhausted. timeout, when
+# given, is the request timeout in seconds passed to the client.
+def generate_streaming(model, prompt, on_text=None, kind="generic", timeout=None):
+    start = time.monotonic()
+    first_token = None
+    parts = []
+    options = {} if timeout is None else {"request_options": {"timeout": timeout}}
+    try:
+        response = model.generate_content(prompt, stream=True, **options)
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # A chunk without text (e.g. a trailing safety verdict) only
+                # matters if nothing was generated at all
+                if parts:
+                    continue
+                raise
+            if not text:
+                continue
+            if first_token is None:
+                first_token = time.monotonic() - start
+                metrics.observe("abcde_llm_first_token_seconds", first_token, kind=kind)
+            parts.append(text)
+            if on_text is not None:
+                on_text(text)
+    except Exception as e:
+        metrics.inc("abcde_llm_errors_total", kind=kind, error=type(e).__name__)
+        raise
+    total = time.monotonic() - start
+    metrics.observe("abcde_llm_seconds", total, kind=kind)
+    metrics.inc("abcde_llm_characters_total", sum(len(part) for part in parts), kind=kind)
+    with _latencies_lock:
+        _latencies.append((kind, first_token, total))
+    return "".join(parts), response
+
+
+# Function to summarize recorded latencies (seconds), optionally for one kind
+def latency_summary(kind=None):
+    with _latencies_lock:
+        records = [r for r in _latencies if kind is None or r[0] == kind]
+    first_tokens = [r[1] for r in records if r[1] is not None]
+    totals = [r[2] for r in records]
+    return {
+        "calls": len(records),
+        "ttft_p50": metrics.percentile(first_tokens, 0.5),
+        "ttft_p95": metrics.percentile(first_tokens, 0.95),
+        "total_p50": metrics.percentile(totals, 0.5),
+        "total_p95": metrics.percentile(totals, 0.95),
+    }
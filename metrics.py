@@ -0,0 +1,242 @@
+# Process-wide counters and latency histograms for capacity planning.
+#
+# Hot paths call inc(), observe() or wrap themselves in timer(); modules with
+# state of their own (caches, scheduler) register a collector that reports
+# gauges when metrics are read. Metrics are exposed in the Prometheus text
+# format on a local HTTP endpoint (ABCDE_METRICS_PORT, /metrics and
+# /metrics.json) and/or dumped periodically as JSON to ABCDE_METRICS_JSON.
+# Both are off by default; render_prometheus() and snapshot() always work.
+import contextlib
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configuration, overridable through the environment
+METRICS_HOST = os.environ.get("ABCDE_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("ABCDE_METRICS_PORT", "0"))
+METRICS_JSON_PATH = os.environ.get("ABCDE_METRICS_JSON", "")
+METRICS_JSON_INTERVAL = float(os.environ.get("ABCDE_METRICS_JSON_INTERVAL", "60"))
+
+# Upper bounds in seconds, from a warm worker run to a slow Gemini answer
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_collectors = []
+_exporters_started = False
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# Function to add to a counter
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+# Function to record one observation (usually seconds) in a histogram
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                            "sum": 0.0, "count": 0}
+        for i, bound in enumerate(histogram["buckets"]):
+            if value <= bound:
+                histogram["counts"][i] += 1
+                break
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+# Context manager that records how long a block took, labelled with its outcome:
+# "ok", "error" for exceptions, "cancelled" for rerun/stop signals
+@contextlib.contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    except BaseException:
+        outcome = "cancelled"
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, outcome=outcome, **labels)
+
+
+# Decorator form of timer()
+def timed(name, **labels):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Function to register a callable returning (name, labels, value) gauge samples
+def register_collector(collector):
+    with _lock:
+        _collectors.append(collector)
+
+
+def _gauges():
+    with _lock:
+        collectors = list(_collectors)
+    samples = []
+    for collector in collectors:
+        try:
+            samples.extend((name, _key(name, labels)[1], value)
+                           for name, labels, value in collector() if value is not None)
+        except Exception:
+            # A broken collector must not take the endpoint down
+            continue
+    return samples
+
+
+# Function to estimate a quantile from bucket counts (upper bound of its bucket)
+def _quantile(histogram, fraction):
+    if not histogram["count"]:
+        return None
+    target = fraction * histogram["count"]
+    seen = 0
+    for bound, count in zip(histogram["buckets"], histogram["counts"]):
+        seen += count
+        if seen >= target:
+            return bound
+    return float("inf")
+
+
+# Function to pick a percentile from raw samples (nearest rank), None if empty
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# Function to return every metric as plain data, for the JSON dump
+def snapshot():
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(_counters.items())]
+        histograms = [{
+            "name": name,
+            "labels": dict(labels),
+            "count": h["count"],
+            "sum": h["sum"],
+            "p50": _quantile(h, 0.5),
+            "p95": _quantile(h, 0.95),
+            "p99": _quantile(h, 0.99),
+        } for (name, labels), h in sorted(_histograms.items())]
+    gauges = [{"name": name, "labels": dict(labels), "value": value} for name, labels, value in _gauges()]
+    return {"time": time.time(), "counters": counters, "histograms": histograms, "gauges": gauges}
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+# Function to render every metric in the Prometheus text exposition format
+def render_prometheus():
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, dict(h, counts=list(h["counts"]))) for key, h in _histograms.items())
+    for (name, labels), value in counters:
+        declare(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), h in histograms:
+        declare(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(h["buckets"], h["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {h['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {h['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {h['count']}")
+    for name, labels, value in sorted(_gauges()):
+        declare(name, "gauge")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = render_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(snapshot()).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Function to write snapshot() to path atomically
+def dump_json(path=METRICS_JSON_PATH):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _dump_periodically():
+    while True:
+        time.sleep(METRICS_JSON_INTERVAL)
+        try:
+            dump_json()
+        except OSError:
+            pass
+
+
+# Function to start the configured exporters, once per process
+def start_exporters():
+    global _exporters_started
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    if METRICS_PORT:
+        try:
+            server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), _MetricsHandler)
+        except OSError:
+            # Another server process already serves this port
+            server = None
+        if server is not None:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    if METRICS_JSON_PATH:
+        threading.Thread(target=_dump_periodically, name="metrics-json", daemon=True).start()
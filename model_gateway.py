@@ -0,0 +1,285 @@
+# Gateway between the app and the language model.
+#
+# Every prompt goes through ModelGateway.generate() instead of calling
+# generate_content() on the session thread:
+#   - the call runs on a bounded pool of gateway threads and the caller only
+#     waits until its deadline, so a slow API can no longer hang a session;
+#     the client gets the time left as its request timeout, so a hung call
+#     also releases its gateway thread;
+#   - a token bucket caps the request rate sent to the API;
+#   - failures that are worth retrying (rate limited, unavailable, network)
+#     are retried with jittered exponential backoff while nothing has been
+#     streamed yet and the deadline allows it;
+#   - identical prompts that are already in flight are coalesced: later
+#     callers follow the first call's stream instead of sending their own.
+# Backends are factories registered by name; "gemini" uses the API key from
+# the environment unless the app registers its own, "fake" is the local stub.
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from llm_stream import generate_streaming
+
+# Configuration, overridable through the environment
+LLM_BACKEND = os.environ.get("ABCDE_LLM_BACKEND", "gemini")
+LLM_MODEL = os.environ.get("ABCDE_LLM_MODEL", "gemini-pro")
+LLM_TIMEOUT = float(os.environ.get("ABCDE_LLM_TIMEOUT", "60"))
+# Requests per second and burst size of the token bucket; 0 disables it
+LLM_RATE = float(os.environ.get("ABCDE_LLM_RATE", "2"))
+LLM_BURST = int(os.environ.get("ABCDE_LLM_BURST", "5"))
+LLM_RETRIES = int(os.environ.get("ABCDE_LLM_RETRIES", "3"))
+LLM_BACKOFF = float(os.environ.get("ABCDE_LLM_BACKOFF", "0.5"))
+LLM_BACKOFF_MAX = float(os.environ.get("ABCDE_LLM_BACKOFF_MAX", "8"))
+LLM_CONCURRENCY = int(os.environ.get("ABCDE_LLM_CONCURRENCY", "8"))
+
+# google.api_core exception names worth retrying, matched by name so the SDK
+# does not have to be imported
+_RETRYABLE = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+              "DeadlineExceeded", "GatewayTimeout", "Aborted"}
+
+
+class GatewayError(Exception):
+    pass
+
+
+class DeadlineExceeded(GatewayError, TimeoutError):
+    pass
+
+
+class RateLimited(GatewayError):
+    pass
+
+
+def _gemini_from_environment():
+    from google.generativeai import configure, GenerativeModel
+    api_key = os.environ.get("ABCDE_GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        raise GatewayError("no Gemini API key configured")
+    configure(api_key=api_key)
+    return GenerativeModel(LLM_MODEL)
+
+
+def _fake():
+    from fake_model import FakeGenerativeModel
+    return FakeGenerativeModel()
+
+
+_backends = {"gemini": _gemini_from_environment, "fake": _fake}
+_backends_lock = threading.Lock()
+
+
+# Function to register a backend; factory() returns an object with a
+# GenerativeModel-compatible generate_content(prompt, stream=True,
+# request_options={"timeout": seconds})
+def register_backend(name, factory):
+    with _backends_lock:
+        _backends[name] = factory
+
+
+def _retryable(error):
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in _RETRYABLE
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Function to take one token, waiting for it until the deadline at most
+    def acquire(self, deadline):
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+# One call in progress; every caller with the same prompt follows its chunks
+class _Flight:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.result = None
+        self.error = None
+        self.cond = threading.Condition()
+
+    def push(self, text):
+        with self.cond:
+            self.chunks.append(text)
+            self.cond.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self.cond:
+            self.result = result
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+    # Function to deliver chunks to on_text on the caller's own thread (the
+    # Streamlit placeholders belong to it) until the call ends or the deadline
+    def follow(self, on_text, deadline):
+        delivered = 0
+        while True:
+            with self.cond:
+                while delivered == len(self.chunks) and not self.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DeadlineExceeded("the model did not answer in time")
+                    self.cond.wait(remaining)
+                new = self.chunks[delivered:]
+                delivered = len(self.chunks)
+                done = self.done
+            if on_text is not None:
+                for text in new:
+                    on_text(text)
+            if done and delivered == len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return self.result
+
+
+class ModelGateway:
+    def __init__(self, backend=LLM_BACKEND, timeout=LLM_TIMEOUT, rate=LLM_RATE, burst=LLM_BURST,
+                 retries=LLM_RETRIES, backoff=LLM_BACKOFF, backoff_max=LLM_BACKOFF_MAX,
+                 concurrency=LLM_CONCURRENCY):
+        self.backend = backend
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._bucket = TokenBucket(rate, burst)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="model-gateway")
+        self._lock = threading.Lock()
+        self._models = {}
+        self._flights = {}
+        self._random = random.Random()
+
+    # Function to switch the backend used by later calls
+    def use_backend(self, name):
+        self.backend = name
+
+    def _model(self, backend):
+        with self._lock:
+            model = self._models.get(backend)
+        if model is None:
+            with _backends_lock:
+                factory = _backends.get(backend)
+            if factory is None:
+                raise GatewayError(f"unknown model backend: {backend}")
+            model = factory()
+            with self._lock:
+                self._models[backend] = model
+        return model
+
+    # Function to drop cached backend models, e.g. after register_backend()
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+    # Function to generate a response for prompt; returns (text, response) like
+    # llm_stream.generate_streaming and streams chunks to on_text. Raises
+    # DeadlineExceeded when no answer arrives within timeout seconds.
+    def generate(self, prompt, on_text=None, kind="generic", timeout=None):
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        key = (self.backend, prompt)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            self._executor.submit(self._call, key, flight, prompt, kind, deadline)
+        else:
+            metrics.inc("abcde_llm_coalesced_total", kind=kind)
+        try:
+            return flight.follow(on_text, deadline)
+        except DeadlineExceeded:
+            metrics.inc("abcde_llm_deadline_exceeded_total", kind=kind)
+            raise
+
+    # Runs on a gateway thread: rate limit, call the backend, retry
+    def _call(self, key, flight, prompt, kind, deadline):
+        backend = key[0]
+        attempt = 0
+        try:
+            while True:
+                if not self._bucket.acquire(deadline):
+                    metrics.inc("abcde_llm_rate_limited_total", kind=kind)
+                    raise RateLimited("too many requests to the model; please try again shortly")
+                streamed = []
+
+                def push(text):
+                    streamed.append(text)
+                    flight.push(text)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded("the model did not answer in time")
+                try:
+                    result = generate_streaming(self._model(backend), prompt, push, kind=kind, timeout=remaining)
+                    break
+                except Exception as e:
+                    if isinstance(e, TimeoutError) and time.monotonic() >= deadline:
+                        # The request timeout is the caller's deadline; report
+                        # it the same way whichever of the two fires first
+                        raise DeadlineExceeded("the model did not answer in time") from e
+                    attempt += 1
+                    # Chunks already delivered cannot be taken back, so only a
+                    # call that streamed nothing is retried
+                    if streamed or attempt > self.retries or not _retryable(e):
+                        raise
+                    delay = self._random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+                    if time.monotonic() + delay >= deadline:
+                        raise
+                    metrics.inc("abcde_llm_retries_total", kind=kind, error=type(e).__name__)
+                    time.sleep(delay)
+        except BaseException as e:
+            self._land(key)
+            flight.finish(error=e)
+            return
+        self._land(key)
+        flight.finish(result=result)
+
+    def _land(self, key):
+        with self._lock:
+            self._flights.pop(key, None)
+
+    def status(self):
+        with self._lock:
+            return {"backend": self.backend, "in_flight": len(self._flights)}
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+# Function to get the process-wide gateway, creating it on first use
+def get_gateway():
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = ModelGateway()
+        return _gateway
+
+
+def _collect_metrics():
+    if _gateway is None:
+        return
+    yield "abcde_llm_in_flight", {}, _gateway.status()["in_flight"]
+
+
+metrics.register_collector(_collect_metrics)
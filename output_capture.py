@@ -0,0 +1,114 @@
+# Memory-bounded capture of program output.
+#
+# Programs write stdout/stderr into capture files (see worker_pool), which
+# run_limits caps at ABCDE_LIMIT_OUTPUT_MB. The server never reads more than
+# OUTPUT_CAPTURE_KB of either stream back into memory: a stream that is
+# larger keeps its head and its tail with a marker in between, and the whole
+# file is spilled to SPILL_DIR so the complete log can still be downloaded.
+# Spilled logs are deleted after SPILL_TTL seconds. While a program runs, at
+# most half the capture size is streamed to the page.
+import os
+import shutil
+import tempfile
+import time
+
+# Configuration, overridable through the environment
+OUTPUT_CAPTURE_BYTES = int(float(os.environ.get("ABCDE_OUTPUT_CAPTURE_KB", "64")) * 1024)
+SPILL_DIR = os.environ.get("ABCDE_OUTPUT_SPILL_DIR", os.path.join(tempfile.gettempdir(), "abcde-output"))
+SPILL_TTL = float(os.environ.get("ABCDE_OUTPUT_SPILL_TTL", "3600"))
+# Lines per page when long output is shown in pages
+PAGE_LINES = int(os.environ.get("ABCDE_OUTPUT_PAGE_LINES", "200"))
+STREAM_BYTES = OUTPUT_CAPTURE_BYTES // 2
+
+STREAM_MARKER = "\n... more output follows; the end is shown when the program finishes ...\n"
+
+
+def _decode(data):
+    return data.decode("utf-8", errors="replace")
+
+
+def _marker(omitted):
+    return f"\n... {omitted} bytes omitted; download the full log to see everything ...\n"
+
+
+# Function to keep the head and tail of output that is larger than limit
+def clip(data, limit=OUTPUT_CAPTURE_BYTES):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if len(data) <= limit:
+        return _decode(data)
+    head, tail = limit // 2, limit - limit // 2
+    return _decode(data[:head]) + _marker(len(data) - limit) + _decode(data[-tail:])
+
+
+# Function to delete spilled logs older than SPILL_TTL
+def _prune():
+    cutoff = time.time() - SPILL_TTL
+    try:
+        entries = list(os.scandir(SPILL_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+# Function to copy a capture file that is too large to keep in memory;
+# returns the path of the copy, or None when it could not be made
+def spill(path):
+    try:
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        _prune()
+        fd, destination = tempfile.mkstemp(prefix="output-", suffix=".log", dir=SPILL_DIR)
+        os.close(fd)
+        shutil.copyfile(path, destination)
+        return destination
+    except OSError:
+        return None
+
+
+# Function to read bytes start..end of a capture file with bounded memory,
+# keeping the head and tail of a range larger than limit
+def read_range(path, start, end, limit=OUTPUT_CAPTURE_BYTES):
+    try:
+        with open(path, "rb") as f:
+            f.seek(start)
+            if end - start <= limit:
+                return _decode(f.read(end - start))
+            head, tail = limit // 2, limit - limit // 2
+            first = f.read(head)
+            f.seek(end - tail)
+            last = f.read(tail)
+    except OSError:
+        return ""
+    return _decode(first) + _marker(end - start - limit) + _decode(last)
+
+
+# Function to read a capture file with bounded memory; returns the text, the
+# size of the file and the spilled copy (None when nothing was cut)
+def read_capped(path, limit=OUTPUT_CAPTURE_BYTES):
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return "", 0, None
+    return read_range(path, 0, size, limit), size, spill(path) if size > limit else None
+
+
+# Function to read a spilled log for download
+def read_log(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def page_count(text, lines=PAGE_LINES):
+    return max(1, -(-text.count("\n") // lines)) if text else 1
+
+
+# Function to get one page (1-based) of output and the range of its lines
+def page(text, number, lines=PAGE_LINES):
+    all_lines = text.splitlines(True)
+    start = (number - 1) * lines
+    return "".join(all_lines[start:start + lines]), start + 1, min(len(all_lines), start + lines), len(all_lines)
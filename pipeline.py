@@ -0,0 +1,244 @@
+# The compile/run and AI pipeline behind the app, importable without Streamlit.
+#
+# streamlit_app renders the pages and calls into this module; the benchmark
+# drives the same functions directly with a stand-in model, and batch.py runs
+# many submissions through run_code without the UI. Every prompt goes
+# through model_gateway, whose backends are registered by the caller, so
+# nothing here needs Streamlit secrets.
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import error_explainer
+import metrics
+import prompt_budget
+import run_limits
+from code_analysis import analyze_code, execution_path
+from java_runner import get_java_pool, java_available
+from kernel import get_kernel_manager
+from model_gateway import get_gateway
+from result_cache import execution_cache, llm_cache
+from scheduler import Cancelled, SchedulerBusy, get_scheduler
+from worker_pool import WorkerUnavailable, get_worker_pool
+
+# Configuration, overridable through the environment
+EXPLAIN_THREADS = int(os.environ.get("ABCDE_EXPLAIN_THREADS", "4"))
+
+# Runs that ended on their own; limits, timeouts and lost runners are not
+# repeatable and never cached
+_REPEATABLE_EXIT_REASONS = ("ok", "error")
+
+# Model explanations run here so the page can show the output meanwhile
+_explain_executor = ThreadPoolExecutor(max_workers=EXPLAIN_THREADS, thread_name_prefix="abcde-explain")
+
+# Function to answer an Ask AI question; returns the answer and the model
+# response (None when the answer came from the cache)
+def ask_ai(question, on_text=None):
+    answer = llm_cache.get("ask", "", question)
+    if answer is not None:
+        return answer, None
+    answer, response = get_gateway().generate(question, on_text, kind="ask")
+    if answer:
+        llm_cache.put("ask", "", question, answer)
+    return answer, response
+
+
+# Function to explain the editor code and, when given, its output
+def explain_code(language, code, on_text=None, output=""):
+    prompt = prompt_budget.explain_code_prompt(language, code, output)
+    explanation = llm_cache.get("explain_code", language, prompt)
+    if explanation is not None:
+        return explanation
+    explanation, _ = get_gateway().generate(prompt, on_text, kind="explain_code")
+    if explanation:
+        llm_cache.put("explain_code", language, prompt, explanation)
+    return explanation
+
+
+# Function to get AI-generated explanations for errors; code and filename, when
+# given, let the prompt include the lines the error points at
+@metrics.timed("abcde_handler_seconds", handler="explain_error")
+def get_ai_explanation(error_message, on_text=None, code="", filename="main.py"):
+    prompt = prompt_budget.explain_error_prompt(error_message, code, filename)
+    cached = llm_cache.get("explain_error", "", prompt)
+    if cached is not None:
+        return cached
+    try:
+        explanation, _ = get_gateway().generate(prompt, on_text, kind="explain_error")
+        llm_cache.put("explain_error", "", prompt, explanation)
+        return explanation
+    except Exception as e:
+        metrics.inc("abcde_handler_errors_total", handler="explain_error", error=type(e).__name__)
+        return f"An unexpected error occurred while generating an explanation: {e}"
+
+
+# A model explanation being generated in the background; text grows as the
+# model streams and result() waits for the complete explanation
+class PendingExplanation:
+    def __init__(self, error_message, code, filename):
+        self._parts = []
+        self._future = _explain_executor.submit(get_ai_explanation, error_message, self._parts.append,
+                                                code, filename)
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def done(self):
+        return self._future.done()
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+
+# Function to explain an error: instantly from the local rules when one
+# matches, otherwise by the model in the background. Returns the explanation
+# and None, or None and the PendingExplanation of the model
+def explain_error(language, error_message, code="", filename="main.py", use_rules=True):
+    explanation = error_explainer.explain(language, error_message, code, filename) if use_rules else None
+    if explanation is not None:
+        return explanation, None
+    return None, PendingExplanation(error_message, code, filename)
+
+
+# Function to simulate AI pretend code compiler for Python and Java
+@metrics.timed("abcde_handler_seconds", handler="simulate")
+def ai_pretend_compiler(language, code, on_text=None, stdin=""):
+    cache_input = f"{code}\0{stdin}"
+    cached = llm_cache.get("simulate", language, cache_input)
+    if cached is not None:
+        return cached
+    try:
+        prompt = prompt_budget.simulate_prompt(language, code, stdin)
+        simulated_output, _ = get_gateway().generate(prompt, on_text, kind="simulate")
+        llm_cache.put("simulate", language, cache_input, simulated_output)
+        return simulated_output
+    except Exception as e:
+        metrics.inc("abcde_handler_errors_total", handler="simulate", error=type(e).__name__)
+        return f"An unexpected error occurred while generating the pretend output: {e}"
+
+
+# Function to compile and run the code
+# on_output, when given, receives (stdout, stderr) chunks while the program runs;
+# stdin is piped into the program, and simulate=True asks the AI instead of running it.
+# on_stats, when given, receives the resource usage of a real run; on_wait receives
+# (queue position, estimated seconds) while the run waits for a free slot, and
+# session identifies the caller for fair queueing. notebook=True runs Python in
+# the session's persistent kernel, re-executing only the cells that changed.
+# Timeouts and a missing JDK are reported as errors; ai_fallback=True asks the
+# AI to predict the output instead
+@metrics.timed("abcde_run_code_seconds")
+def run_code(language, code, filename, on_output=None, stdin="", simulate=False, on_stats=None,
+             on_wait=None, session=None, notebook=False, ai_fallback=False):
+    # Simulated output is streamed into the same Output panel as real output
+    on_simulated = (lambda chunk: on_output(chunk, "")) if on_output else None
+
+    # The static analysis decides between a warm worker, a throwaway one and the AI
+    report = analyze_code(language, code)
+    path = execution_path(report, simulate)
+    if path == "simulated":
+        metrics.inc("abcde_run_code_total", language=language, path="simulated")
+        metrics.inc("abcde_run_code_fallbacks_total", reason="simulate_requested")
+        ai_output = ai_pretend_compiler(language, code, on_simulated, stdin)
+        return ai_output, "Using AI to Simulate Output"
+
+    # Code that may leave processes or connections behind still gets a
+    # throwaway worker instead of a kernel that outlives the run
+    notebook = notebook and language == "Python" and not (report["subprocess"] or report["network"])
+
+    # A syntax error is found by compiling the code here, without waiting for
+    # a runner. Not in notebook mode, where the cells before it still run
+    if language == "Python" and not notebook:
+        started = time.monotonic()
+        syntax_error = error_explainer.syntax_check(code, filename)
+        if syntax_error is not None:
+            metrics.inc("abcde_run_code_total", language=language, path="precheck")
+            if on_stats:
+                on_stats({"wall_seconds": time.monotonic() - started, "cpu_seconds": None,
+                          "peak_rss_mb": None, "returncode": 1, "exit_reason": "syntax_error"})
+            return "", syntax_error
+
+    # Deterministic programs give the same output every time; serve repeats from
+    # the cache. Kernel runs depend on the kept namespace, so they never are.
+    # The file name is part of the input: javac checks it against the class
+    cache_input = f"{code}\0{stdin}\0{filename}"
+    cached = None if notebook else execution_cache.get("run", language, cache_input)
+    if cached is not None:
+        metrics.inc("abcde_run_code_total", language=language, path="cached")
+        if on_stats:
+            # Entries written before the stats were stored hold two fields
+            on_stats(dict(cached[2] if len(cached) > 2 else {}, cached=True))
+        return cached[0], cached[1]
+
+    if language == "Java" and not java_available():
+        if not ai_fallback:
+            metrics.inc("abcde_run_code_errors_total", reason="no_jdk")
+            return "", "Java is not installed on this host."
+        # No JDK on this host: simulate Java code execution using AI
+        metrics.inc("abcde_run_code_total", language=language, path="simulated")
+        metrics.inc("abcde_run_code_fallbacks_total", reason="no_jdk")
+        return ai_pretend_compiler(language, code, on_simulated, stdin), ""
+
+    metrics.inc("abcde_run_code_total", language=language, path="kernel" if notebook else path)
+    try:
+        # Wait for a free execution slot so concurrent sessions never run
+        # more programs than there are CPUs
+        with get_scheduler().slot(session, on_wait=on_wait):
+            if notebook:
+                # The session's kernel keeps its namespace between runs
+                result = get_kernel_manager().run(session or "", code, filename, timeout=20,
+                                                  on_output=on_output, stdin=stdin)
+            else:
+                if language == "Python":
+                    # Run on a pre-started worker instead of spawning a fresh python3;
+                    # the worker receives the source over a pipe, so no file is written
+                    pool = get_worker_pool()
+                else:
+                    # Compile in memory and run on a warm JVM; unchanged code is
+                    # served from the class cache without invoking javac again
+                    pool = get_java_pool()
+                result = pool.run(
+                    code,
+                    filename,
+                    timeout=20,  # 20 seconds timeout
+                    on_output=on_output,
+                    stdin=stdin,
+                    disposable=path == "sandboxed"
+                )
+        if on_stats:
+            on_stats(result.stats)
+        stderr = result.stderr + run_limits.limit_message(result.stats)
+        # Spilled logs are pruned long before the cache entry would expire
+        spilled = "stdout_log" in result.stats or "stderr_log" in result.stats
+        if (not notebook and not report["nondeterministic"] and not spilled
+                and result.stats["exit_reason"] in _REPEATABLE_EXIT_REASONS):
+            execution_cache.put("run", language, cache_input, [result.stdout, stderr, result.stats])
+        return result.stdout, stderr
+    except SchedulerBusy:
+        metrics.inc("abcde_run_code_errors_total", reason="scheduler_busy")
+        return "", "The server is busy running other programs. Please try again in a moment."
+    except Cancelled:
+        metrics.inc("abcde_run_code_errors_total", reason="cancelled")
+        return "", "This run was replaced by a newer run from the same session."
+    except WorkerUnavailable:
+        metrics.inc("abcde_run_code_errors_total", reason="no_worker")
+        return "", "No runner could be started for this program. Please try again in a moment."
+    except subprocess.TimeoutExpired as e:
+        if on_stats and hasattr(e, "stats"):
+            on_stats(e.stats)
+        # Keep whatever the program printed before it was stopped; only fall
+        # back to the AI compiler when there is nothing real to show
+        metrics.inc("abcde_run_code_errors_total", reason="timeout")
+        if e.output or e.stderr:
+            return e.output or "", f"{e.stderr or ''}Execution timed out after {e.timeout} seconds! Showing the output produced so far."
+        if not ai_fallback:
+            return "", f"Execution timed out after {e.timeout} seconds!"
+        metrics.inc("abcde_run_code_fallbacks_total", reason="timeout")
+        return ai_pretend_compiler(language, code, on_simulated, stdin), "Execution timed out! Using AI Compiler for results."
+    except FileNotFoundError as e:
+        metrics.inc("abcde_run_code_errors_total", reason="file_not_found")
+        return "", f"File not found: {e.filename}"
+    except Exception as e:
+        metrics.inc("abcde_run_code_errors_total", reason="unexpected")
+        return "", f"An unexpected error occurred: {e}"
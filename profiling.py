@@ -0,0 +1,79 @@
+# Startup and rerun profiler.
+#
+# Streamlit executes the whole script on every interaction, so the script
+# calls checkpoint() after each part of the page and every rerun records how
+# many milliseconds each part took. The first rerun of a process also pays for the imports, which is
+# reported separately as the startup profile. Set ABCDE_PROFILE=1 to show the
+# report in the sidebar; runs that exceed their budget are flagged.
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+ENABLED = os.environ.get("ABCDE_PROFILE", "0") == "1"
+STARTUP_BUDGET_MS = float(os.environ.get("ABCDE_STARTUP_BUDGET_MS", "1500"))
+RERUN_BUDGET_MS = float(os.environ.get("ABCDE_RERUN_BUDGET_MS", "150"))
+HISTORY = 200
+
+_local = threading.local()
+_lock = threading.Lock()
+_startup = None
+_history = deque(maxlen=HISTORY)
+
+
+# Function to start timing a rerun of the script in the current session thread
+def start_rerun():
+    now = time.perf_counter()
+    _local.rerun = {"started": now, "last": now, "sections": []}
+
+
+# Function to record the time spent since the previous checkpoint under name
+def checkpoint(name):
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return
+    now = time.perf_counter()
+    rerun["sections"].append((name, (now - rerun["last"]) * 1000))
+    rerun["last"] = now
+
+
+# Function to close the current rerun; the first one of the process becomes
+# the startup profile, later ones feed the per-interaction history
+def finish_rerun():
+    global _startup
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return None
+    _local.rerun = None
+    profile = {
+        "total_ms": (time.perf_counter() - rerun["started"]) * 1000,
+        "sections": rerun["sections"],
+    }
+    with _lock:
+        if _startup is None:
+            _startup = profile
+        else:
+            _history.append(profile)
+    return profile
+
+
+# Function to summarize the startup profile and the average cost of each
+# section across recent reruns
+def report():
+    with _lock:
+        startup = _startup
+        history = list(_history)
+    per_section = defaultdict(list)
+    for profile in history:
+        for name, ms in profile["sections"]:
+            per_section[name].append(ms)
+    rerun_avg = {name: sum(values) / len(values) for name, values in per_section.items()}
+    return {
+        "startup": startup,
+        "startup_over_budget": bool(startup) and startup["total_ms"] > STARTUP_BUDGET_MS,
+        "reruns": len(history),
+        "rerun_avg_ms": sum(p["total_ms"] for p in history) / len(history) if history else None,
+        "rerun_sections_avg_ms": dict(sorted(rerun_avg.items(), key=lambda item: -item[1])),
+        "last_rerun": history[-1] if history else None,
+        "last_rerun_over_budget": bool(history) and history[-1]["total_ms"] > RERUN_BUDGET_MS,
+    }
@@ -0,0 +1,258 @@
+# Prompt construction under a token budget.
+#
+# Model latency and cost grow with the prompt, and most of a long prompt is
+# noise: library frames in a deep traceback, hundreds of identical output
+# lines, code far away from the line that failed. Every prompt is built here
+# before it reaches the model:
+#   - tracebacks keep the frames in the user's file, the frame that raised
+#     and the exception itself;
+#   - only the code around the failing lines is sent, with line numbers;
+#   - repeated output lines are collapsed and long output keeps its head and
+#     tail;
+#   - whatever is left is cut to fit ABCDE_PROMPT_TOKENS (an estimate, the
+#     model's tokenizer is not available locally).
+import io
+import os
+import re
+import tokenize
+
+import metrics
+from code_analysis import java_literal_spans
+
+PROMPT_TOKENS = int(os.environ.get("ABCDE_PROMPT_TOKENS", "2000"))
+# Lines of code kept above and below each failing line
+CODE_CONTEXT_LINES = int(os.environ.get("ABCDE_PROMPT_CONTEXT_LINES", "6"))
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+_PY_FRAME = re.compile(r'^\s*File "(?P<file>[^"]+)", line (?P<line>\d+)')
+_JAVA_FRAME = re.compile(r"^\s*at [\w$.<>/]+\((?P<file>[\w$]+\.java):(?P<line>\d+)\)")
+_JAVA_COMPILE = re.compile(r"^(?P<file>[\w$]+\.java):(?P<line>\d+): error")
+_JAVA_MORE = re.compile(r"^\s*\.\.\. \d+ more$")
+
+
+# Function to estimate the number of model tokens in text: words and
+# punctuation count once, long words one token per four characters
+def estimate_tokens(text):
+    return sum(max(1, len(token) // 4) for token in _TOKEN_RE.findall(text))
+
+
+# Function to cut text to a token budget, keeping its head and tail
+def fit(text, budget):
+    if estimate_tokens(text) <= budget:
+        return text
+    lines = text.splitlines()
+    head, tail = [], []
+    used = estimate_tokens("... lines omitted ...")
+    i, j = 0, len(lines) - 1
+    while i <= j:
+        # Alternate so both ends survive; the head gets the first chance
+        line = lines[i] if len(head) <= len(tail) else lines[j]
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        used += cost
+        if len(head) <= len(tail):
+            head.append(line)
+            i += 1
+        else:
+            tail.insert(0, line)
+            j -= 1
+    if not head and not tail:
+        # A single huge line: cut by characters
+        return text[:budget * 4] + " ..."
+    omitted = j - i + 1
+    return "\n".join(head + [f"... {omitted} lines omitted ..."] + tail)
+
+
+def _repeated(count):
+    return f"... previous line repeated {count} more time{'s' if count > 1 else ''} ..."
+
+
+# Function to collapse runs of identical lines ("x" printed 500 times)
+def dedupe_lines(text):
+    out = []
+    previous, count = None, 0
+    for line in text.splitlines():
+        if line == previous:
+            count += 1
+            continue
+        if count > 1:
+            out.append(_repeated(count - 1))
+        out.append(line)
+        previous, count = line, 1
+    if count > 1:
+        out.append(_repeated(count - 1))
+    return "\n".join(out)
+
+
+def _is_user_file(path, filename):
+    return os.path.basename(path) == os.path.basename(filename)
+
+
+# Function to keep the frames of a traceback that matter: those in the user's
+# file, the innermost frame of each exception (last in Python, first in
+# Java), and every exception message line
+def trim_traceback(stderr, filename="main.py"):
+    lines = stderr.splitlines()
+    keep = []
+    omitted = 0
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        match = _PY_FRAME.match(line) or _JAVA_FRAME.match(line)
+        if match is None:
+            if not _JAVA_MORE.match(line):
+                keep.append(line)
+            i += 1
+            continue
+        end = i + 1
+        if _PY_FRAME.match(line):
+            # A Python frame is followed by its indented source and caret lines
+            while end < len(lines) and lines[end].startswith("    ") and not _PY_FRAME.match(lines[end]):
+                end += 1
+            innermost = end == len(lines) or not _PY_FRAME.match(lines[end])
+        else:
+            innermost = i == 0 or not _JAVA_FRAME.match(lines[i - 1])
+        if _is_user_file(match.group("file"), filename) or innermost:
+            if omitted:
+                keep.append(f"  ... {omitted} library frame{'s' if omitted > 1 else ''} omitted ...")
+                omitted = 0
+            keep.extend(lines[i:end])
+        else:
+            omitted += 1
+        i = end
+    if omitted:
+        keep.append(f"  ... {omitted} library frame{'s' if omitted > 1 else ''} omitted ...")
+    return "\n".join(keep)
+
+
+# Function to find the line numbers of the user's file named in an error
+def failing_lines(stderr, filename="main.py"):
+    found = []
+    for line in stderr.splitlines():
+        match = _PY_FRAME.match(line) or _JAVA_FRAME.match(line) or _JAVA_COMPILE.match(line)
+        if match and _is_user_file(match.group("file"), filename):
+            number = int(match.group("line"))
+            if number not in found:
+                found.append(number)
+    return found
+
+
+# Function to excerpt the code around the given lines (1-based), numbered and
+# with gaps marked; the whole code is returned when it fits the budget
+def code_regions(code, lines, budget, context=CODE_CONTEXT_LINES):
+    if estimate_tokens(code) <= budget:
+        return code
+    source = code.splitlines()
+    if not lines:
+        return fit(code, budget)
+    wanted = set()
+    # Innermost (last) failing line first, so it survives a tight budget
+    for number in reversed(lines):
+        wanted.update(range(max(1, number - context), min(len(source), number + context) + 1))
+        if estimate_tokens("\n".join(source[n - 1] for n in wanted)) > budget:
+            break
+    out, previous = [], 0
+    for number in sorted(wanted):
+        if number != previous + 1:
+            out.append("...")
+        marker = ">>" if number in lines else "  "
+        out.append(f"{marker}{number:4d} | {source[number - 1]}")
+        previous = number
+    if previous < len(source):
+        out.append("...")
+    return fit("\n".join(out), budget)
+
+
+# Function to record the size of a finished prompt
+def _measure(prompt, kind):
+    metrics.observe("abcde_prompt_tokens", estimate_tokens(prompt), buckets=_TOKEN_BUCKETS, kind=kind)
+    return prompt
+
+
+# Prompt for explaining an error, optionally with the code that raised it
+def explain_error_prompt(error_message, code="", filename="main.py", budget=PROMPT_TOKENS):
+    error = fit(dedupe_lines(trim_traceback(error_message, filename)), budget * 2 // 5)
+    prompt = f"The following error was encountered in the code:\n\n{error}\n\n"
+    if code:
+        regions = code_regions(code, failing_lines(error_message, filename), budget - estimate_tokens(error))
+        prompt += f"Relevant code (failing lines are marked >>):\n\n{regions}\n\n"
+    prompt += "Please provide an explanation and suggest a solution."
+    return _measure(prompt, "explain_error")
+
+
+# Function to find the lines a compaction must leave alone: every line that
+# ends inside a string literal, text block or block comment. Returns None when
+# the code cannot be tokenized, so it is sent unchanged.
+def _literal_lines(code, language):
+    spans = []
+    if language == "Python":
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(code).readline):
+                if token.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT):
+                    spans.append((token.start[0], token.end[0]))
+        except (tokenize.TokenError, SyntaxError):
+            return None
+    else:
+        for start, end in java_literal_spans(code):
+            first = code.count("\n", 0, start) + 1
+            spans.append((first, first + code.count("\n", start, end)))
+    return {line for start, end in spans for line in range(start, end)}
+
+
+# Function to shorten code for a prompt without changing what it does: outside
+# string literals, trailing whitespace is dropped and whole-line comments are
+# emptied. Every line keeps its number so predicted tracebacks stay right.
+def compact_code(code, language):
+    literal = _literal_lines(code, language)
+    if literal is None:
+        return code
+    comment = "#" if language == "Python" else "//"
+    lines = []
+    for number, line in enumerate(code.split("\n"), 1):
+        stripped = line.rstrip()
+        if number in literal or stripped.endswith("\\"):
+            lines.append(line)
+        elif stripped.lstrip().startswith(comment) and not stripped.startswith("#!"):
+            lines.append("")
+        else:
+            lines.append(stripped)
+    return "\n".join(lines)
+
+
+# Prompt for the AI compiler; code over budget is compacted rather than
+# excerpted because every line can change the output
+def simulate_prompt(language, code, stdin="", budget=PROMPT_TOKENS):
+    runtime = "Python interpreter" if language == "Python" else "JVM"
+    limit = budget * 4 // 5
+    if estimate_tokens(code) > limit:
+        code = compact_code(code, language)
+    code = fit(code, limit)
+    prompt = f"""Pretend you are a real {runtime} and execute the following {language} code. Provide the exact output as it would appear if run on an actual {runtime}.
+
+If there are any errors, please:
+- Identify the type of error (e.g., syntax error, runtime exception).
+- Describe where the error occurs in the code.
+- Suggest a fix for the error.
+
+Here is the {language} code to evaluate:
+\n\n{code}
+
+What is the expected output of the code?
+"""
+    if stdin:
+        stdin = fit(dedupe_lines(stdin), max(1, budget - estimate_tokens(code)))
+        prompt += f"\nThe program receives the following standard input:\n\n{stdin}\n"
+    return _measure(prompt, "simulate")
+
+
+# Prompt for the Explain button, with the program output when there is one
+def explain_code_prompt(language, code, output="", budget=PROMPT_TOKENS):
+    code = fit(code, budget * 3 // 4)
+    prompt = f"Explain the following {language} code and its output.\n\nCode:\n\n{code}\n"
+    if output:
+        output = fit(dedupe_lines(output), max(1, budget - estimate_tokens(code)))
+        prompt += f"\nOutput:\n\n{output}\n"
+    return _measure(prompt, "explain_code")
@@ -0,0 +1,303 @@
+# Long-lived Python worker used by worker_pool.WorkerPool.
+#
+# The worker is started once, imports the modules it was asked to preload and
+# then waits for code on its stdin pipe. Every request is executed in a child
+# forked from the worker, in a fresh __main__ namespace, so a program can
+# never change what the next one sees; the program reads its stdin from a
+# file prepared by the parent, and stdout/stderr are written to capture files
+# owned by the parent so that output survives even if the code crashes or
+# times out. Requests that carry ``cells`` come from kernel.py: they run in
+# the worker itself, in a namespace that is kept between requests, cell by
+# cell. This file is started with ``python3 -I`` and must not import anything
+# from the application.
+import ast
+import builtins
+import json
+import linecache
+import os
+import resource
+import signal
+import struct
+import sys
+import threading
+import traceback
+import types
+
+_HEADER = struct.Struct(">I")
+
+
+# Functions to exchange length-prefixed JSON frames with the parent
+def _read_exact(fd, size):
+    data = b""
+    while len(data) < size:
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _recv(fd):
+    header = _read_exact(fd, _HEADER.size)
+    if header is None:
+        return None
+    payload = _read_exact(fd, _HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload.decode("utf-8"))
+
+
+def _send(fd, message):
+    payload = json.dumps(message).encode("utf-8")
+    os.write(fd, _HEADER.pack(len(payload)) + payload)
+
+
+# Function to read the current resident set size of this worker in MB
+def _current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the peak, not the current size, but it is the best
+        # we can do on platforms without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Function to print an exception the way the interpreter does for a script
+def _print_exception(exc, skip_frames):
+    tb = exc.__traceback__
+    for _ in range(skip_frames):
+        if tb is not None:
+            tb = tb.tb_next
+    traceback.print_exception(type(exc), exc, tb)
+
+
+# Function to map SystemExit to an exit status the way the interpreter does
+def _exit_status(e):
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+# Function to execute one request and return its exit status
+def _execute(code, filename):
+    lines = code.splitlines(True)
+    linecache.cache[filename] = (len(code), None, lines, filename)
+
+    main_module = types.ModuleType("__main__")
+    main_module.__file__ = filename
+    main_module.__builtins__ = builtins
+    sys.modules["__main__"] = main_module
+    sys.argv = [filename]
+
+    try:
+        compiled = compile(code, filename, "exec")
+    except SyntaxError as e:
+        _print_exception(e, skip_frames=1)
+        return 1
+
+    try:
+        exec(compiled, main_module.__dict__)
+    except SystemExit as e:
+        return _exit_status(e)
+    except BaseException as e:
+        _print_exception(e, skip_frames=1)
+        return 1
+    return 0
+
+
+def _capture_sizes():
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        return [os.fstat(1).st_size, os.fstat(2).st_size]
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+# Function to run notebook cells in a kept namespace, stopping at the first
+# cell that fails. Returns the exit status and the capture file sizes after
+# each cell that finished, so the parent can tell the output of the cells apart.
+def _execute_cells(module, code, cells, filename):
+    linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+    sys.modules["__main__"] = module
+    sys.argv = [filename]
+    sizes = []
+    for first_line, source in cells:
+        # Pad the cell so line numbers in tracebacks match the editor
+        try:
+            tree = ast.parse("\n" * (first_line - 1) + source, filename)
+        except SyntaxError as e:
+            traceback.print_exception(type(e), e, None)
+            return 1, sizes
+        last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+        try:
+            exec(compile(tree, filename, "exec"), module.__dict__)
+            if last is not None:
+                # Echo the value of a trailing expression, like a notebook does
+                exec(compile(ast.Interactive([last]), filename, "single"), module.__dict__)
+        except SystemExit as e:
+            returncode = _exit_status(e)
+            if returncode == 0:
+                sizes.append(_capture_sizes())
+            return returncode, sizes
+        except BaseException as e:
+            _print_exception(e, skip_frames=1)
+            return 1, sizes
+        sizes.append(_capture_sizes())
+    return 0, sizes
+
+
+# Function to point fd 0/1/2 at the files of a request; returns the stdin file
+def _redirect(request):
+    stdout_fd = os.open(request["stdout_path"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    stderr_fd = os.open(request["stderr_path"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    os.close(stdout_fd)
+    os.close(stderr_fd)
+    # A fresh text stream per run so no buffered input leaks between runs
+    stdin_file = open(request["stdin_path"], encoding="utf-8", errors="replace")
+    os.dup2(stdin_file.fileno(), 0)
+    sys.stdin = stdin_file
+    return stdin_file
+
+
+# Function to run one request in a child forked from this worker. The child
+# starts with everything preloaded, and whatever the program changes (modules,
+# builtins, this file's functions) dies with it, so no run can affect the
+# next. The child leads its own process group: whatever it started and left
+# running is killed once it exits, and the worker is retired. Returns the
+# reply for the parent.
+def _run_forked(request, protocol_fds):
+    try:
+        pid = os.fork()
+    except OSError as e:
+        # Usually EAGAIN: the user is at its process limit
+        for path, text in ((request["stdout_path"], ""),
+                           (request["stderr_path"], f"Could not start the program: {e.strerror}. "
+                                                    "Too many programs are running; please try again.\n")):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return {"returncode": 1, "rss_mb": _current_rss_mb(), "clean": False, "sizes": None,
+                "reason": "no_process"}
+    if pid == 0:
+        returncode = 1
+        try:
+            os.setpgid(0, 0)
+            for fd in protocol_fds:
+                os.close(fd)
+            _redirect(request)
+            returncode = _execute(request["code"], request["filename"])
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except BaseException:
+            pass
+        finally:
+            os._exit(returncode & 0xFF)
+    try:
+        # Also here, so the group exists before the parent can time the run out
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    _, status, usage = os.wait4(pid, 0)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+        clean = False
+    except OSError:
+        # Nothing was left running
+        clean = True
+    return {
+        "returncode": -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status),
+        "rss_mb": _current_rss_mb(),
+        "clean": clean,
+        "sizes": None,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+    }
+
+
+def _serve(preload):
+    # Keep private copies of the protocol pipes and detach fd 0/1 from them so
+    # user code can never read from or write into the protocol stream
+    proto_in = os.dup(0)
+    proto_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    for name in preload:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+    sandbox_dir = os.getcwd()
+    original_main = sys.modules["__main__"]
+    original_path = list(sys.path)
+    builtins_dict = vars(builtins)
+    original_builtins = dict(builtins_dict)
+    # The namespace of kernel requests, created by the first one
+    kernel_module = None
+
+    while True:
+        request = _recv(proto_in)
+        if request is None:
+            break
+
+        if request.get("cells") is None:
+            _send(proto_out, _run_forked(request, (proto_in, proto_out)))
+            continue
+
+        # Kernel requests run in this process: a kernel belongs to one
+        # session and its namespace has to survive between requests
+        stdin_file = _redirect(request)
+        if kernel_module is None:
+            kernel_module = types.ModuleType("__main__")
+            kernel_module.__file__ = request["filename"]
+            kernel_module.__builtins__ = builtins
+        returncode, sizes = _execute_cells(kernel_module, request["code"], request["cells"],
+                                           request["filename"])
+
+        clean = True
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except (ValueError, OSError):
+            clean = False
+        sys.stdin = sys.__stdin__
+        sys.stdout = sys.__stdout__
+        sys.stderr = sys.__stderr__
+        stdin_file.close()
+        os.dup2(devnull, 0)
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+
+        # Undo the global state user code is most likely to touch; anything we
+        # cannot reset (threads, closed std streams) makes the worker retire
+        if threading.active_count() > 1 or sys.stdout.closed or sys.stderr.closed:
+            clean = False
+        sys.modules["__main__"] = original_main
+        sys.path[:] = original_path
+        builtins_dict.clear()
+        builtins_dict.update(original_builtins)
+        linecache.cache.pop(request["filename"], None)
+        try:
+            os.chdir(sandbox_dir)
+        except OSError:
+            clean = False
+
+        _send(proto_out, {
+            "returncode": returncode,
+            "rss_mb": _current_rss_mb(),
+            "clean": clean,
+            "sizes": sizes,
+        })
+
+
+if __name__ == "__main__":
+    _serve([name for name in sys.argv[1:] if name])
@@ -0,0 +1,244 @@
+# Content-addressed cache for local executions and LLM answers.
+#
+# Students re-run the same programs and hit the same tracebacks constantly, so
+# results are cached by (language, code hash, prompt kind). Every
+# cache has an in-memory LRU tier in front of a larger SQLite tier with
+# TTL and size-bounded eviction, and keeps hit/miss counters. Executions and
+# LLM responses use separate caches so their policies can be tuned apart.
+#
+# The programs the server runs share its user, so they can write to any file
+# the server can. Disk entries are therefore signed with a key that only ever
+# exists in this process's memory; rows written by anything else fail the
+# check and are dropped. The SQLite file lives in a private directory created
+# per process, since no entry of an earlier process could be verified anyway.
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+CACHE_PATH = os.environ.get("ABCDE_CACHE_PATH")
+
+_SIGNING_KEY = os.urandom(32)
+_SIGNATURE_LENGTH = 64
+
+
+# Policy for one cache, read from ABCDE_<NAME>_CACHE_* environment variables;
+# a TTL of 0 disables the cache
+def _policy(name, ttl, memory_entries, disk_mb):
+    prefix = f"ABCDE_{name.upper()}_CACHE_"
+    return {
+        "ttl": float(os.environ.get(prefix + "TTL", ttl)),
+        "memory_entries": int(os.environ.get(prefix + "ENTRIES", memory_entries)),
+        "disk_bytes": int(float(os.environ.get(prefix + "DISK_MB", disk_mb)) * 1024 * 1024),
+    }
+
+
+EXECUTION_POLICY = _policy("exec", ttl=24 * 3600, memory_entries=256, disk_mb=32)
+LLM_POLICY = _policy("llm", ttl=7 * 24 * 3600, memory_entries=512, disk_mb=64)
+
+
+# Function to normalize code before hashing; only line endings, because any
+# other whitespace can be inside a string literal or Java text block and
+# change what the program prints
+def normalize_code(code):
+    return code.replace("\r\n", "\n")
+
+
+def cache_key(kind, language, code):
+    digest = hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+    return f"{kind}:{language}:{digest}"
+
+
+def _signature(cache, key, value):
+    message = f"{cache}\0{key}\0{value}".encode("utf-8")
+    return hmac.new(_SIGNING_KEY, message, hashlib.sha256).hexdigest()
+
+
+# SQLite tier shared by all caches; one connection guarded by a lock because
+# Streamlit serves every session from its own thread. Values are stored with
+# their signature in front.
+class _DiskStore:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " cache TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (cache, key))"
+        )
+
+    def get(self, cache, key, ttl):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE cache = ? AND key = ?", (cache, key)
+            ).fetchone()
+            if row is None:
+                return None
+            signature, value = row[0][:_SIGNATURE_LENGTH], row[0][_SIGNATURE_LENGTH:]
+            if now - row[1] > ttl or not hmac.compare_digest(signature, _signature(cache, key, value)):
+                self._conn.execute("DELETE FROM entries WHERE cache = ? AND key = ?", (cache, key))
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE cache = ? AND key = ?", (now, cache, key)
+            )
+            return value
+
+    # Store a value and evict expired, then least recently used, entries
+    # until the cache fits in max_bytes; returns the number evicted
+    def put(self, cache, key, value, ttl, max_bytes):
+        now = time.time()
+        value = _signature(cache, key, value) + value
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (cache, key, value, len(value), now, now),
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM entries WHERE cache = ? AND created_at < ?", (cache, now - ttl)
+            ).rowcount
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE cache = ?", (cache,)
+            ).fetchone()[0]
+            if total > max_bytes:
+                rows = self._conn.execute(
+                    "SELECT key, size FROM entries WHERE cache = ? ORDER BY accessed_at", (cache,)
+                ).fetchall()
+                victims = []
+                for victim, size in rows:
+                    if total <= max_bytes:
+                        break
+                    victims.append((cache, victim))
+                    total -= size
+                self._conn.executemany("DELETE FROM entries WHERE cache = ? AND key = ?", victims)
+                evicted += len(victims)
+            return evicted
+
+    def clear(self, cache):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE cache = ?", (cache,))
+
+
+class ResultCache:
+    def __init__(self, name, store, ttl, memory_entries, disk_bytes):
+        self.name = name
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self._store = store
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    # Function to look up a result; returns None on a miss
+    def get(self, kind, language, code):
+        if not self.enabled:
+            return None
+        key = cache_key(kind, language, code)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        raw = None
+        if self._store is not None:
+            try:
+                raw = self._store.get(self.name, key, self.ttl)
+            except sqlite3.Error:
+                raw = None
+        if raw is None:
+            self._count("misses")
+            return None
+        value = json.loads(raw)
+        self._remember(key, value, now)
+        self._count("disk_hits")
+        return value
+
+    def put(self, kind, language, code, value):
+        if not self.enabled:
+            return
+        key = cache_key(kind, language, code)
+        self._remember(key, value, time.time())
+        self._count("puts")
+        if self._store is not None:
+            try:
+                evicted = self._store.put(self.name, key, json.dumps(value), self.ttl, self.disk_bytes)
+            except sqlite3.Error:
+                return
+            self._count("evictions", evicted)
+
+    def _remember(self, key, value, created_at):
+        with self._lock:
+            self._memory[key] = (created_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._store is not None:
+            self._store.clear(self.name)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def _open_store(path):
+    if path is None:
+        directory = tempfile.mkdtemp(prefix="abcde-cache-")
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "cache.sqlite3")
+    try:
+        return _DiskStore(path)
+    except sqlite3.Error:
+        # Unwritable location: keep working with the memory tier only
+        return None
+
+
+_store = _open_store(CACHE_PATH)
+execution_cache = ResultCache("execution", _store, **EXECUTION_POLICY)
+llm_cache = ResultCache("llm", _store, **LLM_POLICY)
+
+
+# Function to report the counters of both caches as metrics gauges
+def _collect_metrics():
+    for cache in (execution_cache, llm_cache):
+        stats = cache.stats()
+        labels = {"cache": cache.name}
+        yield "abcde_cache_hit_ratio", labels, stats["hit_ratio"]
+        yield "abcde_cache_entries", labels, stats["memory_entries"]
+        for counter in ("memory_hits", "disk_hits", "misses", "puts", "evictions"):
+            yield f"abcde_cache_{counter}", labels, stats[counter]
+
+
+metrics.register_collector(_collect_metrics)
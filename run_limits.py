@@ -0,0 +1,234 @@
+# Resource limits and accounting for every program run by the worker pools.
+#
+# Workers are long-lived, so limits are applied from the parent with
+# prlimit(): address space, open files, processes and file size (which also
+# caps the stdout/stderr capture files) once when a worker starts, and a CPU
+# budget before every run. The budget is set above the CPU time the worker
+# has already used, because Java daemons and kernels run programs in their own
+# process. Python programs run in a child forked from the worker, which
+# inherits the limits and counts its CPU time from zero, so they get that small
+# amount on top; the CPU time of their children counts towards the run whether
+# or not they were reaped yet.
+#
+# The process limit is not per run: RLIMIT_NPROC is checked against every
+# process and thread of the server's user, so it is one ceiling shared by the
+# server, its workers and all runs, and a run that reaches it makes fork()
+# fail in the others too. It only keeps a runaway fork loop from exhausting
+# the host. Unless ABCDE_LIMIT_PROCESSES sets it, it is what the user already
+# runs when the first worker starts plus ABCDE_LIMIT_PROCESSES_PER_RUN for
+# each run that can execute at the same time.
+# Each run records its wall time, CPU time, peak RSS and exit reason; the
+# most recent runs are kept for summary(). Limits are best effort on
+# platforms without prlimit or /proc.
+import functools
+import os
+import resource
+import signal
+import threading
+import time
+from collections import Counter, deque
+
+import metrics
+from scheduler import EXEC_SLOTS
+
+# Configuration, overridable through the environment; 0 disables a limit
+LIMIT_AS_MB = float(os.environ.get("ABCDE_LIMIT_AS_MB", "1024"))
+LIMIT_CPU_SECONDS = float(os.environ.get("ABCDE_LIMIT_CPU_SECONDS", "10"))
+LIMIT_OPEN_FILES = int(os.environ.get("ABCDE_LIMIT_OPEN_FILES", "256"))
+# Shared by the whole user, see above; unset derives it from the per-run share
+LIMIT_PROCESSES = os.environ.get("ABCDE_LIMIT_PROCESSES")
+LIMIT_PROCESSES_PER_RUN = int(os.environ.get("ABCDE_LIMIT_PROCESSES_PER_RUN", "256"))
+LIMIT_OUTPUT_MB = float(os.environ.get("ABCDE_LIMIT_OUTPUT_MB", "4"))
+STATS_HISTORY = int(os.environ.get("ABCDE_STATS_HISTORY", "1000"))
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+_stats = deque(maxlen=STATS_HISTORY)
+_stats_lock = threading.Lock()
+
+
+def _prlimit(pid, limit, soft, hard=None):
+    if not hasattr(resource, "prlimit"):
+        return
+    try:
+        resource.prlimit(pid, limit, (soft, soft if hard is None else hard))
+    except (OSError, ValueError):
+        pass
+
+
+# Function to count the processes and threads of this user, as RLIMIT_NPROC does
+def _user_tasks():
+    uid = os.getuid()
+    total = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+            if int(fields["Uid"].split()[0]) == uid:
+                total += int(fields["Threads"])
+        except (OSError, KeyError, ValueError, IndexError):
+            pass
+    return total
+
+
+# Function to get the process limit of the user, derived once when not configured
+@functools.lru_cache(maxsize=1)
+def process_limit():
+    if LIMIT_PROCESSES is not None:
+        return int(LIMIT_PROCESSES)
+    try:
+        running = _user_tasks()
+    except OSError:
+        # No /proc: leave the limit off rather than guess
+        return 0
+    return running + LIMIT_PROCESSES_PER_RUN * EXEC_SLOTS
+
+
+# Function to apply the fixed limits to a freshly started worker; JVMs reserve
+# far more address space than they use, so they rely on -Xmx instead
+def apply_worker_limits(pid, address_space=True):
+    if address_space and LIMIT_AS_MB > 0:
+        _prlimit(pid, resource.RLIMIT_AS, int(LIMIT_AS_MB * 1024 * 1024))
+    if LIMIT_OPEN_FILES > 0:
+        _prlimit(pid, resource.RLIMIT_NOFILE, LIMIT_OPEN_FILES)
+    if hasattr(resource, "RLIMIT_NPROC") and process_limit() > 0:
+        _prlimit(pid, resource.RLIMIT_NPROC, process_limit())
+    if LIMIT_OUTPUT_MB > 0:
+        _prlimit(pid, resource.RLIMIT_FSIZE, output_limit_bytes())
+
+
+def output_limit_bytes():
+    return int(LIMIT_OUTPUT_MB * 1024 * 1024) if LIMIT_OUTPUT_MB > 0 else None
+
+
+# Function to list the running children of a process
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return []
+
+
+# Function to read the CPU seconds a process has used so far; children=True
+# adds its reaped children and, recursively, the ones still running
+def _cpu_seconds(pid, children=False):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces, so split after it
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = int(fields[11]) + int(fields[12])
+        if children:
+            ticks += int(fields[13]) + int(fields[14])
+    except (OSError, IndexError, ValueError):
+        return None
+    seconds = ticks / _CLOCK_TICKS
+    if children:
+        seconds += sum(_cpu_seconds(child, children=True) or 0 for child in child_pids(pid))
+    return seconds
+
+
+# Function to read the peak RSS of a process and its running children
+def _peak_rss_mb(pid):
+    peaks = []
+    for process in [pid] + child_pids(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peaks.append(int(line.split()[1]) / 1024)
+        except (OSError, ValueError):
+            pass
+    return max(peaks) if peaks else None
+
+
+# Function to prepare a worker for one run; returns the handle finish_run needs.
+# The CPU budget is a soft limit above what the worker already used, the hard
+# limit stays open so it can be moved again for the next run.
+def start_run(pid):
+    cpu = _cpu_seconds(pid)
+    if LIMIT_CPU_SECONDS > 0 and cpu is not None:
+        _prlimit(pid, resource.RLIMIT_CPU, int(cpu + LIMIT_CPU_SECONDS) + 1, resource.RLIM_INFINITY)
+    # Reset the peak RSS counter so VmHWM covers this run only
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    return {"pid": pid, "started": time.monotonic(), "cpu": _cpu_seconds(pid, children=True)}
+
+
+# Function to classify how a run ended
+def exit_reason(returncode, stderr="", output_bytes=0, timed_out=False):
+    limit = output_limit_bytes()
+    if timed_out:
+        return "timeout"
+    if returncode == -signal.SIGXCPU:
+        return "cpu_limit"
+    if returncode == -getattr(signal, "SIGXFSZ", 25) or (limit and output_bytes >= limit):
+        return "output_limit"
+    if returncode == 0:
+        return "ok"
+    tail = stderr[-300:]
+    if "MemoryError" in tail or "OutOfMemoryError" in stderr:
+        return "memory_limit"
+    if returncode < 0:
+        return "killed"
+    return "error"
+
+
+_LIMIT_MESSAGES = {
+    "cpu_limit": "Program stopped: it used more than {cpu:g} seconds of CPU time.",
+    "memory_limit": "Program stopped: it tried to use more than {memory:g} MB of memory.",
+    "output_limit": "Program stopped: it wrote more than {output:g} MB of output.",
+    "killed": "Program was killed by the system.",
+    "worker_died": "The program's runner stopped unexpectedly. Please run it again.",
+}
+
+
+# Function to explain a run that hit a limit, for the error panel; "" otherwise
+def limit_message(stats):
+    message = _LIMIT_MESSAGES.get(stats.get("exit_reason"))
+    if message is None:
+        return ""
+    return "\n" + message.format(cpu=LIMIT_CPU_SECONDS, memory=LIMIT_AS_MB, output=LIMIT_OUTPUT_MB)
+
+
+# Function to measure a finished run; must be called before the worker is reaped.
+# reason overrides the exit reason for runs the caller stopped itself, and
+# peak_rss_mb is the peak the worker measured itself for a child it reaped.
+def finish_run(handle, returncode, stderr="", output_bytes=0, timed_out=False, reason=None, peak_rss_mb=None):
+    cpu = _cpu_seconds(handle["pid"], children=True)
+    return {
+        "wall_seconds": time.monotonic() - handle["started"],
+        "cpu_seconds": cpu - handle["cpu"] if cpu is not None and handle["cpu"] is not None else None,
+        "peak_rss_mb": peak_rss_mb if peak_rss_mb is not None else _peak_rss_mb(handle["pid"]),
+        "returncode": returncode,
+        "exit_reason": reason or exit_reason(returncode, stderr, output_bytes, timed_out),
+    }
+
+
+# Function to keep the stats of a run for summary()
+def record(language, stats):
+    with _stats_lock:
+        _stats.append((language, stats))
+
+
+# Function to summarize recorded runs, optionally for one language
+def summary(language=None):
+    with _stats_lock:
+        runs = [stats for lang, stats in _stats if language is None or lang == language]
+    walls = [s["wall_seconds"] for s in runs]
+    cpus = [s["cpu_seconds"] for s in runs if s["cpu_seconds"] is not None]
+    peaks = [s["peak_rss_mb"] for s in runs if s["peak_rss_mb"] is not None]
+    return {
+        "runs": len(runs),
+        "exit_reasons": dict(Counter(s["exit_reason"] for s in runs)),
+        "wall_p50": metrics.percentile(walls, 0.5),
+        "wall_p95": metrics.percentile(walls, 0.95),
+        "cpu_total": sum(cpus),
+        "cpu_p95": metrics.percentile(cpus, 0.95),
+        "peak_rss_max_mb": max(peaks) if peaks else None,
+    }
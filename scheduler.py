@@ -0,0 +1,208 @@
+# Process-wide admission control for program runs.
+#
+# Every Streamlit session runs the script on its own thread, so without a
+# gate a burst of clicks starts more interpreters than there are CPUs and
+# every run slows down. The scheduler hands out a fixed number of slots
+# (one per core by default). Sessions that find no free slot wait in their
+# own queue and are served round-robin, so one session submitting many runs
+# cannot starve the others. When the queues are full new runs are rejected
+# with SchedulerBusy instead of piling up.
+#
+# A waiting run calls on_wait(position, eta_seconds) about twice a second.
+# In the app that callback updates a placeholder; Streamlit raises its
+# rerun/stop exception from inside such calls when the session reruns or
+# disconnects, which drops the run from the queue. A new run from the same
+# session also replaces the one it still has waiting.
+import contextlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metrics
+
+# Configuration, overridable through the environment
+EXEC_SLOTS = int(os.environ.get("ABCDE_EXEC_SLOTS", os.cpu_count() or 2))
+EXEC_MAX_QUEUE = int(os.environ.get("ABCDE_EXEC_MAX_QUEUE", EXEC_SLOTS * 8))
+EXEC_MAX_PER_SESSION = int(os.environ.get("ABCDE_EXEC_MAX_PER_SESSION", EXEC_SLOTS))
+# How often a waiting run reports its position
+WAIT_POLL = float(os.environ.get("ABCDE_EXEC_WAIT_POLL", "0.5"))
+
+
+class SchedulerBusy(Exception):
+    pass
+
+
+class Cancelled(Exception):
+    pass
+
+
+class _Ticket:
+    __slots__ = ("session", "granted", "cancelled")
+
+    def __init__(self, session):
+        self.session = session
+        self.granted = False
+        self.cancelled = False
+
+
+class ExecutionScheduler:
+    def __init__(self, slots=EXEC_SLOTS, max_queue=EXEC_MAX_QUEUE, max_per_session=EXEC_MAX_PER_SESSION):
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.max_per_session = max(1, max_per_session)
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        # Moving average of how long a run holds its slot, for wait estimates
+        self._avg_hold = 1.0
+        self._counts = {"granted": 0, "rejected": 0, "cancelled": 0}
+
+    # Context manager that holds a slot for the duration of a run. replace=True
+    # cancels the session's older waiting runs (an interactive rerun), and
+    # replace=False queues the run behind them. Callers without a session
+    # (None) each get their own queue, so they never replace one another.
+    @contextlib.contextmanager
+    def slot(self, session, on_wait=None, replace=True):
+        ticket = self._enqueue(object() if session is None else session, replace)
+        waiting_since = time.monotonic()
+        try:
+            self._wait(ticket, on_wait)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        started = time.monotonic()
+        metrics.observe("abcde_scheduler_wait_seconds", started - waiting_since)
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def _enqueue(self, session, replace):
+        with self._cond:
+            queue = self._queues.get(session)
+            if replace and queue:
+                for old in queue:
+                    old.cancelled = True
+                    self._counts["cancelled"] += 1
+                self._queued -= len(queue)
+                queue.clear()
+            if self._queued >= self.max_queue or (queue and len(queue) >= self.max_per_session):
+                self._counts["rejected"] += 1
+                raise SchedulerBusy()
+            ticket = _Ticket(session)
+            if queue is None:
+                queue = self._queues[session] = deque()
+            queue.append(ticket)
+            self._queued += 1
+            self._dispatch()
+            return ticket
+
+    # Grant free slots round-robin: the head of the first session's queue,
+    # after which that session moves to the back of the rotation
+    def _dispatch(self):
+        while self._running < self.slots and self._queued:
+            session, queue = next(iter(self._queues.items()))
+            if not queue:
+                del self._queues[session]
+                continue
+            ticket = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            ticket.granted = True
+            self._running += 1
+            self._counts["granted"] += 1
+        self._cond.notify_all()
+
+    # Number of runs that will be granted before this ticket, following the rotation
+    def _position(self, ticket):
+        queue = self._queues.get(ticket.session)
+        if queue is None or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        ahead = index
+        before = True
+        for session, other in self._queues.items():
+            if session == ticket.session:
+                before = False
+                continue
+            ahead += min(len(other), index + (1 if before else 0))
+        return ahead + 1
+
+    def _wait(self, ticket, on_wait):
+        while True:
+            with self._cond:
+                if ticket.granted:
+                    return
+                if ticket.cancelled:
+                    raise Cancelled()
+                position = self._position(ticket)
+                eta = math.ceil(position / self.slots) * self._avg_hold
+            # Called without the lock: the callback may render, raise or block
+            if on_wait is not None:
+                on_wait(position, eta)
+            with self._cond:
+                if not ticket.granted and not ticket.cancelled:
+                    self._cond.wait(WAIT_POLL)
+
+    def _abandon(self, ticket):
+        with self._cond:
+            if ticket.granted:
+                self._running -= 1
+                self._dispatch()
+                return
+            if ticket.cancelled:
+                return
+            ticket.cancelled = True
+            self._counts["cancelled"] += 1
+            queue = self._queues.get(ticket.session)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[ticket.session]
+
+    def _release(self, held):
+        with self._cond:
+            self._running -= 1
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+            self._dispatch()
+
+    def status(self):
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "running": self._running,
+                "queued": self._queued,
+                "waiting_sessions": len(self._queues),
+                "avg_hold_seconds": self._avg_hold,
+                **self._counts,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Function to get the process-wide scheduler, creating it on first use
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ExecutionScheduler()
+        return _scheduler
+
+
+def _collect_metrics():
+    if _scheduler is None:
+        return
+    for name, value in _scheduler.status().items():
+        yield f"abcde_scheduler_{name}", {}, value
+
+
+metrics.register_collector(_collect_metrics)
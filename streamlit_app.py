@@ -1,271 +1,224 @@
+import profiling
+
+# Time the whole rerun; the first one of the process also pays for the imports below
+profiling.start_rerun()
+
+import html
 import os
 import streamlit as st
-import subprocess
+import uuid
 from streamlit_ace import st_ace
 import streamlit.components.v1 as components
-import requests
 import streamlit_lottie as st_lottie
-import base64
-from google.generativeai import configure, GenerativeModel
-import re
-import time
-
-# Configure the Generative AI
-configure(api_key=st.secrets["api_key"])
-model = GenerativeModel('gemini-pro')
-
-# Lottie animation loader
-def load_lottie_url(url: str):
-    response = requests.get(url)
-    if response.status_code != 200:
-        return None
-    return response.json()
-
-# Function to download generated code
-def download_generated_code(content, filename, format='txt'):
-    extension = format
-    temp_filename = f"{filename}.{extension}"
-    with open(temp_filename, 'w') as file:
-        file.write(content)
-    with open(temp_filename, 'rb') as file:
-        data = file.read()
-    b64 = base64.b64encode(data).decode()
-    href = f'<a href="data:file/{format};base64,{b64}" download="{filename}.{format}">Download Code ({format.upper()})</a>'
-    st.markdown(href, unsafe_allow_html=True)
-    os.remove(temp_filename)
-
-# Function to get AI-generated explanations for errors
-def get_ai_explanation(error_message):
-    try:
-        prompt = f"The following error was encountered in the code:\n\n{error_message}\n\nPlease provide an explanation and suggest a solution."
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"An unexpected error occurred while generating an explanation: {e}"
-
-# Function to simulate AI pretend code compiler for Python and Java
-def ai_pretend_compiler(language, code):
-    try:
-        if language == "Python":
-            prompt = f"""Pretend you are a real Python interpreter and execute the following Python code. Provide the exact output as it would appear if run on an actual Python interpreter.
-
-If there are any errors, please:
-- Identify the type of error (e.g., syntax error, runtime exception).
-- Describe where the error occurs in the code.
-- Suggest a fix for the error.
-
-Here is the Python code to evaluate:
-\n\n{code}
-
-What is the expected output of the code?
-"""
-        elif language == "Java":
-            prompt = f"""Pretend you are a real JVM and execute the following Java code. Provide the exact output as it would appear if run on an actual JVM.
-
-If there are any errors, please:
-- Identify the type of error (e.g., syntax error, runtime exception).
-- Describe where the error occurs in the code.
-- Suggest a fix for the error.
-
-Here is the Java code to evaluate:
-\n\n{code}
-
-What is the expected output of the code?
-"""
-
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"An unexpected error occurred while generating the pretend output: {e}"
-
-# Function to detect I/O operations in the code
-def contains_io_operations(language, code):
-    if language == "Python":
-        io_patterns = [
-            r'\binput\s*\(',
-            r'\bopen\s*\(',
-            r'\bread\s*\(',
-            r'\bwrite\s*\(',
-        ]
-    elif language == "Java":
-        io_patterns = [
-            r'\bScanner\s*\(',
-            r'\bSystem\.in\b',
-            r'\bBufferedReader\s*\(',
-            r'\bFileReader\s*\(',
-            r'\bFileWriter\s*\(',
-        ]
-    for pattern in io_patterns:
-        if re.search(pattern, code):
-            return True
-    return False
-
-# Function to compile and run the code
-def run_code(language, code, filename):
-    if contains_io_operations(language, code):
-        io_message = "I/O Detected"
-        ai_compiler_message = "Using AI to Simulate Output"
-        ai_output = ai_pretend_compiler(language, code)
-        return ai_output, f"{io_message}\n{ai_compiler_message}"
-
-    try:
-        start_time = time.time()
-        if language == "Python":
-            with open(filename, "w", encoding='utf-8') as f:
-                f.write(code)
-            result = subprocess.run(
-                ["python3", filename],
-                capture_output=True,
-                text=True,
-                timeout=20  # 20 seconds timeout
-            )
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 10:
-                return ai_pretend_compiler(language, code), "Execution took too long. Using AI Compiler for results."
-            return result.stdout, result.stderr
-
-        elif language == "Java":
-            # Simulate Java code execution using AI
-            return ai_pretend_compiler(language, code), ""
-    except subprocess.TimeoutExpired:
-        return ai_pretend_compiler(language, code), "Execution timed out! Using AI Compiler for results."
-    except FileNotFoundError as e:
-        return "", f"File not found: {e.filename}"
-    except Exception as e:
-        return "", f"An unexpected error occurred: {e}"
-
-# Set up the Streamlit page
-st.set_page_config(page_title="Autobot Code Compiler", page_icon="💻", layout="wide")
-
-# Custom CSS for styling
-st.markdown(
-    """
-    <style>
-    .generated-content {
-        background-color: #1e1e1e;
-        padding: 15px;
-        border-radius: 5px;
-        margin: 10px 0;
-        color: #61dafb;
-        font-family: "Courier New", Courier, monospace;
-        overflow-x: auto;
-        max-height: 400px;
-        box-shadow: 0 0 10px rgba(0, 0, 0, 0.2);
-        transition: transform 0.2s ease-in-out;
-    }
-    .generated-content:hover {
-        transform: scale(1.02);
-    }
-    .error-content {
-        background-color: #1e1e1e;
-        padding: 15px;
-        border-radius: 5px;
-        margin: 10px 0;
-        color: #ff0000;
-        font-family: "Courier New", Courier, monospace;
-        overflow-x: auto;
-        max-height: 400px;
-        box-shadow: 0 0 10px rgba(255, 0, 0, 0.2);
-        transition: transform 0.2s ease-in-out;
-    }
-    .error-content:hover {
-        transform: scale(1.02);
-    }
-    .title-container {
-        display: flex;
-        align-items: center;
-    }
-    .title-container img {
-        margin-right: 10px;
-    }
-    .footer {
-        text-align: center;
-        margin-top: 30px;
-        padding: 10px 0;
-        background-color: #f1f1f1;
-    }
-    .footer a {
-        margin: 0 15px;
-        text-decoration: none;
-        color: #4e73df;
-    }
-    .footer img {
-        width: 24px;
-        height: 24px;
-        vertical-align: middle;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-# Title of the application with logo
-st.markdown(
-    """
-    <div class="title-container">
-        <img src="data:image/png;base64,{}" width="60" height="60">
-        <h1>ABCDE & CO</h1>
-    </div>
-    """.format(base64.b64encode(open("abcde2.png", "rb").read()).decode()),
-    unsafe_allow_html=True
-)
-
-st.markdown("AutoBot Code Development Environment & Computational Optimization (ABCDE & CO)")
+from code_analysis import analyze_code
+from downloads import download_link, extract_code_blocks, zip_files
+import metrics
+import output_capture
+import run_limits
+from kernel import get_kernel_manager
+from model_gateway import LLM_MODEL, GatewayError, register_backend
+from pipeline import ask_ai, explain_code, explain_error, run_code
+from scheduler import get_scheduler
+from assets import (APP_CSS, FOOTER_HTML, LOTTIE_ANIMATIONS, RAZORPAY_BUTTON_HTML,
+                    load_lottie_url, logo_bytes, prefetch_lottie, title_html)
+
+profiling.checkpoint("imports")
+
+# Configure the Generative AI on first use; importing the SDK alone costs
+# more than a whole rerun, and most interactions never call the model. The
+# gateway creates the model once per process and sends every prompt through it.
+def get_model():
+    from google.generativeai import configure, GenerativeModel
+    configure(api_key=st.secrets["api_key"])
+    return GenerativeModel(LLM_MODEL)
+
+register_backend("gemini", get_model)
+
+# Start downloading every Lottie animation in the background so pages never wait on it
+prefetch_lottie()
+
+# Serve /metrics or dump JSON metrics when configured (ABCDE_METRICS_*)
+metrics.start_exporters()
+
+# Model explanations of errors are shown in this container
+EXPLANATION_TEMPLATE = '<div class="generated-content">{}</div>'
+
+# Function to build an on_text callback that renders a streamed answer into a placeholder
+def render_stream(placeholder, template=None):
+    parts = []
+
+    def on_text(chunk):
+        parts.append(chunk)
+        text = "".join(parts)
+        if template:
+            placeholder.markdown(template.format(text), unsafe_allow_html=True)
+        else:
+            placeholder.markdown(text)
+    return on_text
 
-st.subheader("Autobot Code Compiler")
-# Sidebar for navigation
-st.sidebar.title("Navigation")
-st.markdown("*Developed by Sandeep Kasturi*")
-st.sidebar.image("abcde2.png", use_column_width=True)
-page = st.sidebar.selectbox("Go to", ["Home", "About", "Our Company", "Support", "Become Insider"])
+# Function to show the "Support Us" note and the Razorpay donation button
+def show_support_us(width=300):
+    st.sidebar.markdown("### Support Us")
+    st.sidebar.markdown("If you find this tool useful, please consider supporting us by making a donation.")
+    components.html(RAZORPAY_BUTTON_HTML, height=450, width=width)
 
-if page == "Home":
-    # Create a dropdown menu for language selection
-    language = st.selectbox("Choose Language", ["Python", "Java"])
+# Function to download generated code, built from memory without a temp file
+def download_generated_code(content, filename, format='txt'):
+    href = download_link(content.encode("utf-8"), f"{filename}.{format}",
+                         f"Download Code ({format.upper()})", mime=f"file/{format}")
+    st.markdown(href, unsafe_allow_html=True)
 
-    # Define default code for each language
-    default_code = {
-        "Python": "print('Hello, World!')",
-        "Java": """
+# Function to offer each fenced code block of an answer as its own .txt file,
+# plus every block under its real name in a single zip archive
+def download_code_blocks(answer):
+    files = extract_code_blocks(answer)
+    if not files:
+        download_generated_code(answer, "code", format='txt')
+        return
+    links = [download_link(content.encode("utf-8"), f"{name.replace('/', '_')}.txt", name)
+             for name, content in files]
+    links.append(download_link(zip_files(files), "code.zip",
+                               f"Download all {len(files)} files (ZIP)", mime="application/zip"))
+    st.markdown(" | ".join(links), unsafe_allow_html=True)
+
+# Function to show program output as escaped, preformatted text; newlines are
+# encoded so blank lines cannot end the HTML block early
+def program_output_html(text, css_class="generated-content"):
+    body = html.escape(text).replace("\n", "&#10;")
+    return f'<div class="{css_class}"><pre class="program-output">{body}</pre></div>'
+
+# Function to show long program output one page at a time, with a download of
+# the complete log (read only when the button is clicked)
+def show_program_output(area, text, log, name, css_class="generated-content"):
+    shown = text
+    pages = output_capture.page_count(text)
+    if pages > 1:
+        number = st.number_input(f"{name.capitalize()} page (of {pages})", min_value=1, max_value=pages,
+                                 value=1, key=f"{name}_page")
+        shown, first, last, total = output_capture.page(text, number)
+        st.caption(f"Lines {first}–{last} of {total}")
+    area.markdown(program_output_html(shown, css_class), unsafe_allow_html=True)
+    if log and os.path.exists(log):
+        st.download_button(f"Download full {name}", data=lambda: output_capture.read_log(log),
+                           file_name=f"{name}.log", mime="text/plain", key=f"{name}_log")
+    elif pages > 1:
+        st.download_button(f"Download {name}", data=text, file_name=f"{name}.log", mime="text/plain",
+                           key=f"{name}_log")
+
+# Function to describe the resource usage of a run in one line
+def format_run_stats(stats):
+    if stats.get("cached"):
+        return "Served from cache"
+    parts = [f"Wall {stats['wall_seconds']:.2f} s"]
+    if stats.get("cpu_seconds") is not None:
+        parts.append(f"CPU {stats['cpu_seconds']:.2f} s")
+    if stats.get("peak_rss_mb") is not None:
+        parts.append(f"Peak RSS {stats['peak_rss_mb']:.1f} MB")
+    parts.append(f"Exit: {stats['exit_reason'].replace('_', ' ')}")
+    kernel = stats.get("kernel")
+    if kernel:
+        parts.append(f"Cells: {kernel['executed']} run, {kernel['reused']} reused of {kernel['cells']}")
+        if kernel.get("reclaimed"):
+            parts.append("Kernel restarted; the next run starts fresh")
+    return " · ".join(parts)
+
+# Default code for each language
+DEFAULT_CODE = {
+    "Python": "print('Hello, World!')",
+    "Java": """
     public class Main {
         public static void main(String[] args) {
             System.out.println("Hello, World!");
         }
     }
     """
-    }
+}
+
+# The Home page is split into fragments: a click or an edit only reruns the
+# panel it belongs to, not the header, sidebar, iframes and footer. Panels
+# share what they need through session state: the editor panel keeps the
+# code in editor_code, the run panel keeps its last result in last_run and
+# the Ask AI panel its last answer in ask_result, so results survive reruns
+# of the other panels.
+
+# Editor panel: language, code and program input
+@st.fragment
+def editor_panel():
+    # Create a dropdown menu for language selection
+    language = st.selectbox("Choose Language", ["Python", "Java"])
 
     # Initialize session state if not already done
     if 'language' not in st.session_state:
         st.session_state.language = language
-        st.session_state.code = default_code[language]
-        st.session_state.saved_code = default_code[language]
+        st.session_state.code = DEFAULT_CODE[language]
+        st.session_state.saved_code = DEFAULT_CODE[language]
         st.session_state.filename = "main.py" if language == "Python" else "Main.java"
 
     # Update the code editor content if the language changes
     if st.session_state.language != language:
         st.session_state.language = language
-        st.session_state.code = default_code[language]
-        st.session_state.saved_code = default_code[language]  # Reset saved code on language change
+        st.session_state.code = DEFAULT_CODE[language]
+        st.session_state.saved_code = DEFAULT_CODE[language]  # Reset saved code on language change
         st.session_state.filename = "main.py" if language == "Python" else "Main.java"
 
+    editor_column, stdin_column = st.columns([3, 1])
+
     # ACE editor configuration
-    code = st_ace(
-        language=language.lower(),
-        theme="cobalt",
-        value=st.session_state.code,
-        height=300,
-        auto_update=False,
-        readonly=False,
-        keybinding="vscode",
-        font_size=14,
-        tab_size=4,
-        show_gutter=True,
-        wrap=False,
-        min_lines=20,
-        key="ace_editor",
-    )
-    #INTEGRATING AUTOBOT AI
+    with editor_column:
+        st.session_state.editor_code = st_ace(
+            language=language.lower(),
+            theme="cobalt",
+            value=st.session_state.code,
+            height=300,
+            auto_update=False,
+            readonly=False,
+            keybinding="vscode",
+            font_size=14,
+            tab_size=4,
+            show_gutter=True,
+            wrap=False,
+            min_lines=20,
+            key="ace_editor",
+        )
+
+    # Program input, piped to the program's standard input when it runs
+    with stdin_column:
+        st.text_area(
+            "Program input (stdin)",
+            height=300,
+            placeholder="Text typed here is what input() / Scanner reads",
+            key="stdin",
+        )
+        st.checkbox(
+            "Simulate with AI instead of running",
+            help="Asks the AI model to predict the output. Slower and not always exact.",
+            key="simulate",
+        )
+        notebook = st.checkbox(
+            "Notebook mode (keep variables between runs)",
+            help="Split the code into cells with '# %%' lines. Only the cells that changed, "
+                 "and the cells after them, run again.",
+            key="notebook",
+            disabled=language != "Python",
+        )
+        if notebook and language == "Python" and st.button("Restart kernel"):
+            get_kernel_manager().restart(st.session_state.session_id)
+            st.caption("Kernel restarted.")
+
+# Function to show the note and download links under an Ask AI answer
+def show_answer_downloads(question, answer):
+    st.markdown('---')
+    st.markdown(
+        "Security Note: We use **.txt** file format for code downloads, which is not easily susceptible to virus and malware attacks. "
+        "The ZIP archive keeps the original file names, so check its contents before running them.")
+    code_keywords = ["code", "write code", "develop code", "generate code", "generate", "build"]
+    if any(keyword in question.lower() for keyword in code_keywords):
+        st.text("Download the generated code 💀:")
+        download_code_blocks(answer)
+
+#INTEGRATING AUTOBOT AI
+@st.fragment
+def ask_panel():
     st.header("AutoBot 💀")
     st.markdown(
         "AutoBot is effective for code generation. If your prompt contains code generation **-prompt-**, you can get downloadable files.")
@@ -273,104 +226,230 @@ if page == "Home":
     question = st.text_input("Ask the model a question:")
 
     if st.button("Ask AI"):
+        st.session_state.ask_result = None
 
         # Animation for insider page
-        lottie_animation_url = "https://lottie.host/9ea2d5e2-feac-4b64-b36b-8dfad9d46e6e/fUbiNI1HFw.json"
+        lottie_animation_url = LOTTIE_ANIMATIONS["ask_ai"]
         lottie_animation = load_lottie_url(lottie_animation_url)
         if lottie_animation:
             st_lottie.st_lottie(lottie_animation, height=300)
-        with st.spinner("Generating response 💀..."):
+        with st.spinner("Generating response 💀..."), metrics.timer("abcde_handler_seconds", handler="ask"):
             try:
-                response = model.generate_content(question)
-                if response.text:
-                    st.text("AutoBot Response:")
-                    st.write(response.text)
-                    st.markdown('---')
-                    st.markdown(
-                        "Security Note: We use **.txt** file format for code downloads, which is not easily susceptible to virus and malware attacks.")
-                else:
+                st.text("AutoBot Response:")
+                answer_area = st.empty()
+                answer, response = ask_ai(question, render_stream(answer_area))
+                if not answer:
                     st.error("No valid response received from the AI model.")
                     st.write(f"Safety ratings: {response.safety_ratings}")
+                if answer:
+                    answer_area.write(answer)
+                    st.session_state.ask_result = {"question": question, "answer": answer}
+                    show_answer_downloads(question, answer)
             except ValueError as e:
+                metrics.inc("abcde_handler_errors_total", handler="ask", error=type(e).__name__)
                 st.info(f"Unable to assist with that prompt due to: {e}")
             except IndexError as e:
+                metrics.inc("abcde_handler_errors_total", handler="ask", error=type(e).__name__)
                 st.info(f"Unable to assist with that prompt due to: {e}")
             except Exception as e:
+                metrics.inc("abcde_handler_errors_total", handler="ask", error=type(e).__name__)
                 st.info(f"An unexpected error occurred: {e}")
-
-            code_keywords = ["code", "write code", "develop code", "generate code", "generate", "build"]
-            if any(keyword in question.lower() for keyword in code_keywords):
-                st.text("Download the generated code 💀:")
-                download_generated_code(response.text, "code", format='txt')
-
-    # Initialize the compilation count in session state if not already set
-    if 'compile_count' not in st.session_state:
-        st.session_state.compile_count = 0
-
-    # Add the "Compile and Run" button
-    if st.button("Compile and Run Code"):
-        st.session_state.saved_code = code
-        st.session_state.saved_code = code
-        output, error = run_code(language, code, st.session_state.filename)
-        st.session_state.compile_count += 1  # Increment compile count
-
-        # Display the output in a styled container
-        st.subheader("Output:")
-        if output:
-            st.markdown(
-                f'<div class="generated-content">{output}</div>',
-                unsafe_allow_html=True
-            )
+    elif st.session_state.get("ask_result"):
+        # Show the previous answer again when another interaction reruns this panel
+        st.text("AutoBot Response:")
+        st.write(st.session_state.ask_result["answer"])
+        show_answer_downloads(st.session_state.ask_result["question"], st.session_state.ask_result["answer"])
+
+# Function to run the editor code, streaming into the output panel; returns
+# the result that is kept in session state
+def run_editor_code(stats_area, output_area, error_area):
+    language = st.session_state.language
+    code = st.session_state.editor_code
+    stdin = st.session_state.stdin
+    simulate = st.session_state.simulate
+    st.session_state.saved_code = code
+    run = {"language": language, "code": code, "filename": st.session_state.filename, "stats": None,
+           "rules_explanation": None, "error_explanation": None, "pending_explanation": None,
+           "code_explanation": None}
+    streamed = {"stdout": "", "stderr": ""}
+
+    def show_chunk(stdout_chunk, stderr_chunk):
+        streamed["stdout"] += stdout_chunk
+        streamed["stderr"] += stderr_chunk
+        if streamed["stdout"]:
+            output_area.markdown(program_output_html(streamed["stdout"]), unsafe_allow_html=True)
+        if streamed["stderr"]:
+            error_area.markdown(program_output_html(streamed["stderr"], "error-content"), unsafe_allow_html=True)
+
+    # Shown in the Output panel while every execution slot is busy
+    def show_queue(position, eta):
+        output_area.info(f"Waiting for a free runner: position {position} in the queue, "
+                         f"about {eta:.0f} s.")
+
+    def show_stats(stats):
+        run["stats"] = stats
+        stats_area.caption(format_run_stats(stats))
+
+    if not stdin and not simulate and analyze_code(language, code)["reads_stdin"]:
+        st.info("This program reads input; type it in the Program input (stdin) box.")
+    run["output"], run["error"] = run_code(language, code, run["filename"], on_output=show_chunk,
+                                           stdin=stdin, simulate=simulate, on_stats=show_stats,
+                                           on_wait=show_queue, session=st.session_state.session_id,
+                                           notebook=st.session_state.notebook, ai_fallback=True)
+    st.session_state.compile_count += 1  # Increment compile count
+    error_area.empty()
+    # A new run starts on the first page of its output
+    st.session_state.pop("output_page", None)
+    st.session_state.pop("errors_page", None)
+    return run
+
+# Function to show the output and errors of a run; the error explanation is
+# streamed when the run has none yet. Output of a real run is shown escaped and
+# in pages; text from the AI compiler is rendered as Markdown.
+def show_run(run, stats_area, output_area):
+    stats = run["stats"]
+    if stats:
+        stats_area.caption(format_run_stats(stats))
+    if not run["output"]:
+        output_area.write("No output.")
+    elif stats:
+        show_program_output(output_area, run["output"], stats.get("stdout_log"), "output")
+    else:
+        output_area.markdown(
+            f'<div class="generated-content">{run["output"]}</div>',
+            unsafe_allow_html=True
+        )
+
+    # Display any errors in a styled container
+    if run["error"]:
+        st.subheader("Errors:")
+        if stats:
+            show_program_output(st.empty(), run["error"], stats.get("stderr_log"), "errors", "error-content")
         else:
-            st.write("No output.")
-
-        # Display any errors in a styled container
-        if error:
-            st.subheader("Errors:")
             st.markdown(
-                f'<div class="error-content">{error}</div>',
+                f'<div class="error-content">{run["error"]}</div>',
                 unsafe_allow_html=True
             )
 
-            # Display AI-generated explanation for errors
-            ai_explanation = get_ai_explanation(error)
+        # Common errors are explained at once from the local rules; the model
+        # explains the others in the background while the output stays visible
+        if not (run["rules_explanation"] or run["pending_explanation"] or run["error_explanation"]):
+            run["rules_explanation"], run["pending_explanation"] = explain_error(
+                run["language"], run["error"], run["code"], run["filename"])
+        if run["rules_explanation"]:
+            st.subheader("Explanation:")
+            st.markdown(run["rules_explanation"])
+            if run["error_explanation"] is None and run["pending_explanation"] is None \
+                    and st.button("Ask AutoBot for more detail"):
+                _, run["pending_explanation"] = explain_error(
+                    run["language"], run["error"], run["code"], run["filename"], use_rules=False)
+        if run["pending_explanation"] is not None:
             st.subheader("AI Explanation:")
-            st.markdown(
-                f'<div class="generated-content">{ai_explanation}</div>',
-                unsafe_allow_html=True
-            )
+            show_pending_explanation(run)
+        elif run["error_explanation"] is not None:
+            st.subheader("AI Explanation:")
+            st.markdown(EXPLANATION_TEMPLATE.format(run["error_explanation"]), unsafe_allow_html=True)
+
+# Function to show a model explanation while it is generated; polls until it
+# is complete and then keeps showing the result itself, so finishing it never
+# reruns more than this fragment
+@st.fragment(run_every=0.5)
+def show_pending_explanation(run):
+    pending = run["pending_explanation"]
+    if pending is not None and pending.done():
+        run["error_explanation"] = pending.result()
+        run["pending_explanation"] = None
+    if run["error_explanation"] is not None:
+        st.markdown(EXPLANATION_TEMPLATE.format(run["error_explanation"]), unsafe_allow_html=True)
+    elif pending is not None and pending.text:
+        st.markdown(EXPLANATION_TEMPLATE.format(pending.text), unsafe_allow_html=True)
+    else:
+        st.caption("AutoBot is writing an explanation...")
+
+# Run panel: compile and run, output, explanations and download
+@st.fragment
+def run_panel():
+    # Initialize the compilation count in session state if not already set
+    if 'compile_count' not in st.session_state:
+        st.session_state.compile_count = 0
 
-    #Explanation of Output
-    if st.session_state.compile_count > 0:
-        if st.button("Explain"):
-            with st.spinner("Preparing Explanation..."):
-                compiled_code = f"Explain the Code and Output{code}"
-                response = model.generate_content(compiled_code)
-                if response.text:
-                    st.text("AutoBot Response:")
-                    st.write(response.text)
+    # Add the "Compile and Run" button
+    run_clicked = st.button("Compile and Run Code")
+    if run_clicked or st.session_state.get("last_run"):
+        # Display the output in a styled container, filled in live while the program runs
+        output_header, stats_column = st.columns([1, 3])
+        output_header.subheader("Output:")
+        stats_area = stats_column.empty()
+        output_area = st.empty()
+        error_area = st.empty()
+        if run_clicked:
+            st.session_state.last_run = run_editor_code(stats_area, output_area, error_area)
+        show_run(st.session_state.last_run, stats_area, output_area)
+
+    #Explanation of Output, from the stored run instead of running the code again
+    run = st.session_state.get("last_run")
+    if run:
+        if st.button("Explain") and run["code_explanation"] is None:
+            with st.spinner("Preparing Explanation..."), metrics.timer("abcde_handler_seconds", handler="explain_code"):
+                st.text("AutoBot Response:")
+                explanation_area = st.empty()
+                # Nothing is stored on failure, so clicking Explain again retries
+                try:
+                    run["code_explanation"] = explain_code(run["language"], run["code"],
+                                                           render_stream(explanation_area), output=run["output"])
+                    explanation_area.write(run["code_explanation"])
+                except GatewayError as e:
+                    metrics.inc("abcde_handler_errors_total", handler="explain_code", error=type(e).__name__)
+                    explanation_area.info(f"Unable to explain the code right now: {e}")
+                except Exception as e:
+                    metrics.inc("abcde_handler_errors_total", handler="explain_code", error=type(e).__name__)
+                    explanation_area.info(f"An unexpected error occurred: {e}")
+        elif run["code_explanation"]:
+            st.text("AutoBot Response:")
+            st.write(run["code_explanation"])
 
     # Add a button to download the code
     if st.button("Download Code"):
         filename_without_ext = os.path.splitext(st.session_state.filename)[0]
-        download_generated_code(code, filename_without_ext, "py" if language == "Python" else "java")
+        download_generated_code(st.session_state.editor_code, filename_without_ext,
+                                "py" if st.session_state.language == "Python" else "java")
+
+# Set up the Streamlit page
+st.set_page_config(page_title="Autobot Code Compiler", page_icon="💻", layout="wide")
+
+# Custom CSS for styling
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# Title of the application with logo
+st.markdown(title_html(), unsafe_allow_html=True)
+
+st.markdown("AutoBot Code Development Environment & Computational Optimization (ABCDE & CO)")
+
+st.subheader("Autobot Code Compiler")
+profiling.checkpoint("header")
+# Sidebar for navigation
+st.sidebar.title("Navigation")
+st.markdown("*Developed by Sandeep Kasturi*")
+st.sidebar.image(logo_bytes(), use_column_width=True)
+page = st.sidebar.selectbox("Go to", ["Home", "About", "Our Company", "Support", "Become Insider"])
+profiling.checkpoint("sidebar")
+
+if page == "Home":
+    # Identify the session to the execution scheduler (fair queueing) and to
+    # its notebook kernel
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+    editor_panel()
+    ask_panel()
+    run_panel()
     # Add Razorpay donation button to the sidebar
-    st.sidebar.markdown("### Support Us")
-    st.sidebar.markdown("If you find this tool useful, please consider supporting us by making a donation.")
-    components.html(
-        """
-        <form>
-            <script src="https://checkout.razorpay.com/v1/payment-button.js" data-payment_button_id="pl_Oe7PyEQO3xI82m" async> </script>
-        </form>
-        """,
-        height=450,
-        width=300
-    )
+    show_support_us()
 
 
 elif page == "About":
     # Animation for about page
-    lottie_animation_url = "https://assets5.lottiefiles.com/packages/lf20_YXD37qLQnb.json"
+    lottie_animation_url = LOTTIE_ANIMATIONS["about"]
     lottie_animation = load_lottie_url(lottie_animation_url)
     if lottie_animation:
         st_lottie.st_lottie(lottie_animation, height=300)
@@ -436,21 +515,11 @@ elif page == "About":
 By following these instructions, you will be able to effectively use the features of the AutoBot Code Compiler application for code editing, execution, and error handling.
 """)
     # Add Razorpay donation button to the sidebar
-    st.sidebar.markdown("### Support Us")
-    st.sidebar.markdown("If you find this tool useful, please consider supporting us by making a donation.")
-    components.html(
-        """
-        <form>
-            <script src="https://checkout.razorpay.com/v1/payment-button.js" data-payment_button_id="pl_Oe7PyEQO3xI82m" async> </script>
-        </form>
-        """,
-        height=450,
-        width=300
-    )
+    show_support_us()
 
 elif page == "Our Company":
     # Animation for our company page
-    lottie_animation_url = "https://assets5.lottiefiles.com/packages/lf20_zZ2Y27.json"
+    lottie_animation_url = LOTTIE_ANIMATIONS["our_company"]
     lottie_animation = load_lottie_url(lottie_animation_url)
     if lottie_animation:
         st_lottie.st_lottie(lottie_animation, height=300)
@@ -458,41 +527,21 @@ elif page == "Our Company":
         "At ABCDE & CO, we are committed to building innovative software solutions that empower developers and businesses alike. Our team of experts is dedicated to delivering high-quality tools that streamline development processes.")
     st.markdown("[Website](https://skavtech.wegic.app)")
     # Add Razorpay donation button to the sidebar
-    st.sidebar.markdown("### Support Us")
-    st.sidebar.markdown("If you find this tool useful, please consider supporting us by making a donation.")
-    components.html(
-        """
-        <form>
-            <script src="https://checkout.razorpay.com/v1/payment-button.js" data-payment_button_id="pl_Oe7PyEQO3xI82m" async> </script>
-        </form>
-        """,
-        height=450,
-        width=300
-    )
+    show_support_us()
 
 elif page == "Support":
     # Animation for support page
-    lottie_animation_url = "https://assets5.lottiefiles.com/packages/lf20_QSo3N6.json"
+    lottie_animation_url = LOTTIE_ANIMATIONS["support"]
     lottie_animation = load_lottie_url(lottie_animation_url)
     if lottie_animation:
         st_lottie.st_lottie(lottie_animation, height=300)
     st.write("For support inquiries, please contact us at skavtech.in@gmail.com or call us at +91 9919932723.")
     # Add Razorpay donation button to the sidebar
-    st.sidebar.markdown("### Support Us")
-    st.sidebar.markdown("If you find this tool useful, please consider supporting us by making a donation.")
-    components.html(
-        """
-        <form>
-            <script src="https://checkout.razorpay.com/v1/payment-button.js" data-payment_button_id="pl_Oe7PyEQO3xI82m" async> </script>
-        </form>
-        """,
-        height=450,
-        width=400
-    )
+    show_support_us(width=400)
 
 elif page == "Become Insider":
     # Animation for insider page
-    lottie_animation_url = "https://assets5.lottiefiles.com/packages/lf20_UJNc2t.json"
+    lottie_animation_url = LOTTIE_ANIMATIONS["become_insider"]
     lottie_animation = load_lottie_url(lottie_animation_url)
     if lottie_animation:
         st_lottie.st_lottie(lottie_animation, height=300)
@@ -503,27 +552,17 @@ elif page == "Become Insider":
         <a href="https://pages.razorpay.com/becomeinsider" target="_blank">
             <img src="https://img.icons8.com/ios-glyphs/48/000000/money.png" alt="Donate">Become Insider
         </a> """, unsafe_allow_html=True)
+profiling.checkpoint(f"page: {page}")
+
 # Add the footer with social links and donation button
-st.markdown(
-    """
-    <div class="footer">
-        <a href="https://instagram.com/sandeep_kasturi_" target="_blank">
-            <img src="https://img.icons8.com/fluency/48/000000/instagram-new.png" alt="Instagram">
-        </a>
-        <a href="https://github.com/sandeepkasturi" target="_blank">
-            <img src="https://img.icons8.com/ios-glyphs/48/000000/github.png" alt="GitHub">
-        </a>
-        <a href="https://skavtech.wegic.app" target="_blank">
-            <img src="https://img.icons8.com/ios-glyphs/48/000000/domain.png" alt="Website">
-        </a>
-        <a href="https://pages.razorpay.com/becomeinsider" target="_blank">
-            <img src="https://img.icons8.com/ios-glyphs/48/000000/money.png" alt="Donate">
-        </a>
-        <br>
-        <form>
-            <script src="https://checkout.razorpay.com/v1/payment-button.js" data-payment_button_id="pl_Oe7PyEQO3xI82m" async> </script>
-        </form>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+st.markdown(FOOTER_HTML, unsafe_allow_html=True)
+profiling.checkpoint("footer")
+
+# Startup and rerun budget report, enabled with ABCDE_PROFILE=1
+profiling.finish_rerun()
+if profiling.ENABLED:
+    with st.sidebar.expander("Performance profile"):
+        st.json(profiling.report())
+        st.json(run_limits.summary())
+        st.json(get_scheduler().status())
+        st.json(get_kernel_manager().status())
@@ -0,0 +1,43 @@
+# Tests of the headless batch runner.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch  # noqa: E402
+
+CASES = [{"name": "sum", "stdin": "2 3\n", "expected": "5\n"},
+         {"name": "zero", "stdin": "0 0\n", "expected": "1\n"}]
+ADD = "a, b = map(int, input().split())\nprint(a + b)\n"
+
+
+def _submission(id, code):
+    return {"id": id, "language": "Python", "code": code, "filename": "main.py", "cases": None}
+
+
+class BatchTest(unittest.TestCase):
+    def test_cases_are_graded(self):
+        records = batch.run_submission(_submission("add", ADD), CASES)
+        self.assertEqual([(r["case"], r["status"]) for r in records], [("sum", "passed"), ("zero", "failed")])
+        self.assertEqual(records[0]["exit_reason"], "ok")
+        self.assertIsNotNone(records[0]["seconds"])
+
+    def test_runner_errors_keep_the_record_schema(self):
+        # code=None makes run_submission itself fail in the pool process
+        records = list(batch.run_batch([_submission("add", ADD), _submission("broken", None)], CASES, jobs=2))
+        good = [r for r in records if r["id"] == "add"]
+        broken = [r for r in records if r["id"] == "broken"]
+        self.assertEqual([r["case"] for r in broken], ["sum", "zero"])
+        for record in broken:
+            self.assertEqual(set(record), set(good[0]))
+            self.assertEqual(record["status"], "error")
+            self.assertFalse(record["passed"])
+            self.assertIn("Batch runner error", record["stderr"])
+            self.assertEqual(record["expected"], CASES[[c["name"] for c in CASES].index(record["case"])]["expected"])
+
+
+if __name__ == "__main__":
+    unittest.main()
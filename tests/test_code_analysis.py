@@ -0,0 +1,66 @@
+# Tests of the static analysis that picks the execution path.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_analysis import analyze_code, execution_path  # noqa: E402
+
+
+def path_of(code, language="Python"):
+    return execution_path(analyze_code(language, code))
+
+
+class ProcessSpawningTest(unittest.TestCase):
+    def assertSandboxed(self, code):
+        report = analyze_code("Python", code)
+        self.assertTrue(report["subprocess"], code)
+        self.assertEqual(execution_path(report), "sandboxed")
+
+    def test_posix_spawn(self):
+        self.assertSandboxed("import os\nos.posix_spawn('/bin/sh', ['sh'], {})")
+
+    def test_posix_spawnp(self):
+        self.assertSandboxed("from os import posix_spawnp as spawn\nspawn('sh', ['sh'], {})")
+
+    def test_asyncio_create_subprocess_exec(self):
+        self.assertSandboxed("import asyncio\nasyncio.run(asyncio.create_subprocess_exec('ls'))")
+
+    def test_asyncio_create_subprocess_shell(self):
+        self.assertSandboxed("from asyncio import create_subprocess_shell\ncreate_subprocess_shell('ls')")
+
+    def test_asyncio_subprocess_module(self):
+        self.assertSandboxed("import asyncio.subprocess as sp\nsp.create_subprocess_exec('ls')")
+
+    def test_pty_spawn(self):
+        self.assertSandboxed("import pty\npty.spawn('sh')")
+
+    def test_exec_and_spawn_families(self):
+        self.assertSandboxed("import os\nos.execv('/bin/ls', ['ls'])")
+        self.assertSandboxed("import os\nos.spawnlp(os.P_WAIT, 'ls', 'ls')")
+
+
+class ExecutionPathTest(unittest.TestCase):
+    def test_plain_code_runs_on_a_warm_worker(self):
+        self.assertEqual(path_of("print(sum(range(10)))"), "local")
+
+    def test_words_in_strings_and_comments_do_not_count(self):
+        self.assertEqual(path_of("# os.system('x')\nprint('subprocess.run and open()')"), "local")
+        self.assertEqual(path_of('class Main { /* new Socket() */ String s = "ProcessBuilder"; }', "Java"),
+                         "local")
+
+    def test_files_network_and_endless_loops_are_sandboxed(self):
+        self.assertEqual(path_of("open('x', 'w').write('1')"), "sandboxed")
+        self.assertEqual(path_of("import socket"), "sandboxed")
+        self.assertEqual(path_of("while True:\n    pass"), "sandboxed")
+        self.assertEqual(path_of("while True:\n    break"), "local")
+
+    def test_simulation_is_opt_in(self):
+        self.assertEqual(execution_path(analyze_code("Python", "print(1)"), simulate=True), "simulated")
+
+
+if __name__ == "__main__":
+    unittest.main()
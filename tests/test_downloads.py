@@ -0,0 +1,57 @@
+# Tests of the in-memory downloads and code block extraction.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import base64
+import io
+import os
+import sys
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloads import download_link, extract_code_blocks, zip_files  # noqa: E402
+
+
+class ExtractCodeBlocksTest(unittest.TestCase):
+    def names(self, text):
+        return [name for name, _ in extract_code_blocks(text)]
+
+    def test_names_come_from_the_answer(self):
+        answer = (
+            "```python app.py\nprint(1)\n```\n"
+            "```python\n# utils.py\ndef f(): pass\n```\n"
+            "Create `config.json`:\n```json\n{}\n```\n"
+            "```java\npublic final class Shapes {}\n```\n"
+        )
+        self.assertEqual(self.names(answer), ["app.py", "utils.py", "config.json", "Shapes.java"])
+
+    def test_unnamed_blocks_get_numbered_names(self):
+        self.assertEqual(self.names("```python\nx = 1\n```\ntext\n```\nplain\n```\n"), ["file1.py", "file2.txt"])
+
+    def test_duplicate_names_are_made_unique(self):
+        self.assertEqual(self.names("```py a.py\n1\n```\n```py a.py\n2\n```\n"), ["a.py", "a_2.py"])
+
+    def test_names_stay_inside_the_archive(self):
+        self.assertEqual(self.names("```sh ../../etc/evil.sh\nrm\n```\n"), ["etc/evil.sh"])
+        self.assertEqual(self.names("```py /tmp/abs.py\n1\n```\n"), ["tmp/abs.py"])
+
+    def test_block_contents_are_kept_verbatim(self):
+        self.assertEqual(extract_code_blocks("~~~python\n  indented\n```not a fence\n~~~\n"),
+                         [("file1.py", "  indented\n```not a fence\n")])
+
+
+class ArchiveTest(unittest.TestCase):
+    def test_zip_round_trip(self):
+        files = [("a.py", "print(1)\n"), ("pkg/b.py", "x = 'é'\n")]
+        with zipfile.ZipFile(io.BytesIO(zip_files(files))) as archive:
+            self.assertEqual([(name, archive.read(name).decode()) for name in archive.namelist()], files)
+
+    def test_download_link_embeds_the_bytes(self):
+        link = download_link(b"hello", "out.txt", "Download")
+        self.assertIn(f"base64,{base64.b64encode(b'hello').decode()}", link)
+        self.assertIn('download="out.txt"', link)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# Tests of the local error explanations and the syntax precheck.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import error_explainer  # noqa: E402
+
+# Programs that fail with a common error, each of which a rule must explain
+_COMMON_ERRORS = [
+    "print(totl)",
+    "def f():\n    x += 1\nf()",
+    "print(1 / 0)",
+    "print('a' + 1)",
+    "print(int(input()) + '1')",
+    "[1, 2][5]",
+    "{}['key']",
+    "'text'.uppper()",
+    "int('twelve')",
+    "a, b = [1]",
+    "import not_a_module",
+    "def f(): return f()\nf()",
+    "input()",
+    "open('missing.txt')",
+    "None()",
+    "if True:\nprint(1)",
+    "print('never closed'",
+    "if x = 1:\n    pass",
+]
+
+
+def _stderr(code):
+    return subprocess.run([sys.executable, "-I", "-c", code], input="", capture_output=True,
+                          text=True, timeout=10).stderr
+
+
+class PythonRulesTest(unittest.TestCase):
+    def test_common_errors_are_explained(self):
+        for code in _COMMON_ERRORS:
+            with self.subTest(code=code):
+                self.assertIsNotNone(error_explainer.explain("Python", _stderr(code), code, "<string>"))
+
+    def test_explanation_quotes_the_failing_line(self):
+        code = "count = 3\nprint(cuont)\n"
+        stderr = 'Traceback (most recent call last):\n  File "main.py", line 2, in <module>\n' \
+                 "NameError: name 'cuont' is not defined\n"
+        explanation = error_explainer.explain("Python", stderr, code, "main.py")
+        self.assertTrue(explanation.startswith("**NameError** on line 2"))
+        self.assertIn("print(cuont)", explanation)
+        self.assertIn("Did you mean `count`?", explanation)
+
+    def test_method_of_builtin_type_is_suggested(self):
+        stderr = "AttributeError: 'str' object has no attribute 'uppper'\n"
+        self.assertIn("Did you mean `upper`?", error_explainer.explain("Python", stderr))
+
+    def test_unknown_error_goes_to_the_model(self):
+        self.assertIsNone(error_explainer.explain("Python", "SomeLibraryError: it broke\n"))
+        self.assertIsNone(error_explainer.explain("Python", ""))
+
+    def test_limit_messages_come_first(self):
+        stderr = "Traceback ...\nMemoryError\nProgram stopped: it tried to use more than 256 MB of memory.\n"
+        self.assertIn("**Memory limit**", error_explainer.explain("Python", stderr))
+
+
+class JavaRulesTest(unittest.TestCase):
+    def test_compile_error_names_the_symbol(self):
+        code = "public class Main {\n    public static void main(String[] args) {\n        int count = 1;\n" \
+               "        System.out.println(cuont);\n    }\n}\n"
+        stderr = "Main.java:4: error: cannot find symbol\n        System.out.println(cuont);\n" \
+                 "                           ^\n  symbol:   variable cuont\n  location: class Main\n1 error\n"
+        explanation = error_explainer.explain("Java", stderr, code, "Main.java")
+        self.assertTrue(explanation.startswith("**Compile error** on line 4"))
+        self.assertIn("Did you mean `count`?", explanation)
+
+    def test_runtime_exception(self):
+        stderr = 'Exception in thread "main" java.lang.ArithmeticException: / by zero\n' \
+                 "\tat Main.main(Main.java:3)\n"
+        explanation = error_explainer.explain("Java", stderr, "", "Main.java")
+        self.assertTrue(explanation.startswith("**ArithmeticException** on line 3"))
+
+
+class SyntaxCheckTest(unittest.TestCase):
+    def test_reports_what_the_interpreter_prints(self):
+        code = "def f(:\n    pass\n"
+        expected = _stderr(code).replace('"<string>"', '"main.py"')
+        self.assertEqual(error_explainer.syntax_check(code, "main.py"), expected)
+
+    def test_valid_code_passes(self):
+        self.assertIsNone(error_explainer.syntax_check("print('ok')\n", "main.py"))
+
+    def test_warnings_are_not_errors(self):
+        self.assertIsNone(error_explainer.syntax_check("print('\\d')\nx = 1 is 1\n", "main.py"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# Tests of the Java compile daemons. The protocol tests use a stand-in daemon
+# and always run; the others need a JDK and are skipped without one.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from java_runner import JavaDaemonPool, _JavaDaemon, java_available  # noqa: E402
+
+# Answers every request with exit code 7, after checking that fd 0/1 carry
+# nothing and the protocol arrives on the pipes named by its arguments
+_STAND_IN = textwrap.dedent("""
+    import os, struct, sys
+    requests = open(f"/proc/self/fd/{sys.argv[1]}", "rb")
+    replies = open(f"/proc/self/fd/{sys.argv[2]}", "wb")
+    std_is_null = all(os.path.realpath(f"/proc/self/fd/{fd}") == os.devnull for fd in (0, 1))
+    while True:
+        fields = []
+        for _ in range(6):
+            header = requests.read(4)
+            if not header:
+                sys.exit(0)
+            fields.append(requests.read(struct.unpack(">i", header)[0]))
+        replies.write(struct.pack(">i??i", 7, False, std_is_null, 1))
+        replies.flush()
+""")
+
+
+class DaemonProtocolTest(unittest.TestCase):
+    def test_protocol_runs_on_private_pipes(self):
+        script = os.path.join(tempfile.mkdtemp(), "stand_in.py")
+        with open(script, "w") as f:
+            f.write(_STAND_IN)
+        daemon = _JavaDaemon([sys.executable, script])
+        self.addCleanup(daemon.kill)
+        for _ in range(2):
+            daemon.send({"code": "class Main {}", "filename": "Main.java", "stdin_path": daemon.stdin_path,
+                         "stdout_path": daemon.stdout_path, "stderr_path": daemon.stderr_path})
+            reply = daemon.recv(deadline=time.monotonic() + 10)
+            self.assertEqual((reply["returncode"], reply["clean"]), (7, True))
+
+
+@unittest.skipUnless(java_available(), "needs a JDK")
+class JavaDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = JavaDaemonPool(size=1)
+        self.addCleanup(self.pool.shutdown)
+
+    def run_main(self, body, imports=""):
+        code = f"{imports}\npublic class Main {{\n  public static void main(String[] args) throws Exception {{\n{body}\n  }}\n}}\n"
+        return self.pool.run(code, "Main.java", timeout=30)
+
+    def test_runs_and_serves_unchanged_code_from_the_cache(self):
+        first = self.run_main('System.out.println("Hello");')
+        self.assertEqual((first.stdout, first.returncode), ("Hello\n", 0))
+        self.assertEqual(self.run_main('System.out.println("Hello");').stdout, "Hello\n")
+
+    def test_compile_errors_name_the_file(self):
+        result = self.run_main("int x = ;")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Main.java:4: error", result.stderr)
+
+    def test_program_cannot_reach_the_protocol(self):
+        self.run_main('new java.io.FileOutputStream(java.io.FileDescriptor.out).write(new byte[10]);'
+                      'System.out.println(new java.io.FileInputStream(java.io.FileDescriptor.in).read());')
+        self.assertEqual(self.run_main('System.out.println("next");').stdout, "next\n")
+
+    def test_global_defaults_are_restored(self):
+        self.run_main('java.util.Locale.setDefault(java.util.Locale.GERMANY);'
+                      'java.util.TimeZone.setDefault(java.util.TimeZone.getTimeZone("Asia/Tokyo"));'
+                      'System.setProperty("abcde.leak", "yes");')
+        result = self.run_main('System.out.println(String.format("%.1f", 1.5) + " " + System.getProperty("abcde.leak"));')
+        self.assertEqual(result.stdout, "1.5 null\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
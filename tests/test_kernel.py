@@ -0,0 +1,85 @@
+# Tests of the persistent notebook kernels.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kernel import KernelManager, split_cells  # noqa: E402
+
+CODE = "# %% load\ndata = [1, 2, 3]\nprint('loaded')\n# %% use\nprint(sum(data))\n"
+
+
+class SplitCellsTest(unittest.TestCase):
+    def test_cells_start_at_markers(self):
+        self.assertEqual(split_cells(CODE), [(1, "# %% load\ndata = [1, 2, 3]\nprint('loaded')\n"),
+                                             (4, "# %% use\nprint(sum(data))\n")])
+
+    def test_code_without_markers_is_one_cell(self):
+        self.assertEqual(split_cells("x = 1\nprint(x)\n"), [(1, "x = 1\nprint(x)\n")])
+
+
+class KernelTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = KernelManager(max_kernels=2, min_available_mb=0)
+        self.addCleanup(self.manager.shutdown)
+
+    def run_code(self, code, session="s", **kwargs):
+        return self.manager.run(session, code, "main.py", timeout=10, **kwargs)
+
+    def test_unchanged_cells_are_reused_and_replayed(self):
+        self.run_code(CODE)
+        chunks = []
+        result = self.run_code(CODE.replace("sum(data)", "max(data)"),
+                               on_output=lambda out, err: chunks.append(out))
+        self.assertEqual(result.stdout, "loaded\n3\n")
+        self.assertEqual(chunks[0], "loaded\n")
+        info = result.stats["kernel"]
+        self.assertEqual((info["reused"], info["executed"], info["fresh"]), (1, 1, False))
+
+    def test_namespace_is_kept_between_runs(self):
+        self.run_code("counter = 41\n")
+        self.assertEqual(self.run_code("counter += 1\nprint(counter)\n").stdout, "42\n")
+
+    def test_changed_stdin_runs_every_cell(self):
+        code = "# %%\nname = input()\n# %%\nprint(name)\n"
+        self.assertEqual(self.run_code(code, stdin="ada\n").stdout, "ada\n")
+        result = self.run_code(code, stdin="bob\n")
+        self.assertEqual(result.stdout, "bob\n")
+        self.assertEqual(result.stats["kernel"]["reused"], 0)
+
+    def test_failing_cell_stops_the_run_and_reruns_once_fixed(self):
+        broken = CODE + "# %% boom\nratio = 1 / 0\n# %% after\nprint('after')\n"
+        result = self.run_code(broken)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("ZeroDivisionError", result.stderr)
+        self.assertNotIn("after", result.stdout)
+        result = self.run_code(broken.replace("1 / 0", "1 / 1"))
+        self.assertEqual(result.stdout, "loaded\n6\nafter\n")
+        self.assertEqual(result.stats["kernel"]["reused"], 2)
+
+    def test_sessions_have_their_own_kernels(self):
+        self.run_code("secret = 1\n", session="a")
+        result = self.run_code("print(secret)\n", session="b")
+        self.assertIn("NameError", result.stderr)
+
+    def test_restart_starts_from_an_empty_namespace(self):
+        self.run_code("kept = 1\n")
+        self.manager.restart("s")
+        result = self.run_code("print(kept)\n")
+        self.assertIn("NameError", result.stderr)
+        self.assertTrue(result.stats["kernel"]["fresh"])
+
+    def test_timeout_reclaims_the_kernel(self):
+        self.run_code("kept = 1\n")
+        with self.assertRaises(subprocess.TimeoutExpired) as raised:
+            self.manager.run("s", "while True: pass\n", "main.py", timeout=1)
+        self.assertEqual(raised.exception.stats["kernel"]["reclaimed"], "timeout")
+        self.assertIn("NameError", self.run_code("print(kept)\n").stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
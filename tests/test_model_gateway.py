@@ -0,0 +1,172 @@
+# Tests of the model gateway with stand-in models.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_gateway import DeadlineExceeded, ModelGateway, RateLimited, TokenBucket, register_backend  # noqa: E402
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+# Never answers; like the real client it gives up after its request timeout
+class HangingModel:
+    def __init__(self):
+        self.released = threading.Event()
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        timeout = (request_options or {}).get("timeout")
+        self.released.wait(timeout)
+        raise TimeoutError("request timed out")
+
+
+class EchoModel:
+    def generate_content(self, prompt, stream=False, request_options=None):
+        return [_Chunk(prompt)]
+
+
+# Streams its answer only once release is set; counts the calls it gets
+class GatedModel:
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        self.release.wait(5)
+        return [_Chunk("an"), _Chunk("swer")]
+
+
+# Fails with the given errors first, then echoes; chunks_before_error are
+# streamed before each failure
+class FlakyModel:
+    def __init__(self, errors, chunks_before_error=()):
+        self.errors = list(errors)
+        self.chunks_before_error = list(chunks_before_error)
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        if not self.errors:
+            return [_Chunk(prompt)]
+        error = self.errors.pop(0)
+
+        def chunks():
+            for text in self.chunks_before_error:
+                yield _Chunk(text)
+            raise error
+        return chunks()
+
+
+class CoalescingTest(unittest.TestCase):
+    def test_identical_prompts_in_flight_share_one_call(self):
+        model = GatedModel()
+        self.addCleanup(model.release.set)
+        register_backend("test-gated", lambda: model)
+        gateway = ModelGateway(backend="test-gated", rate=0, retries=0)
+        results = []
+        followers = [threading.Thread(target=lambda: results.append(gateway.generate("same", timeout=5)[0]))
+                     for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while model.calls == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Let the other callers reach the gateway while the first call hangs
+        time.sleep(0.1)
+        model.release.set()
+        for thread in followers:
+            thread.join(5)
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(results, ["answer"] * 3)
+
+    def test_finished_prompt_is_sent_again(self):
+        model = GatedModel()
+        model.release.set()
+        register_backend("test-gated-done", lambda: model)
+        gateway = ModelGateway(backend="test-gated-done", rate=0, retries=0)
+        gateway.generate("same", timeout=5)
+        gateway.generate("same", timeout=5)
+        self.assertEqual(model.calls, 2)
+        self.assertEqual(gateway.status()["in_flight"], 0)
+
+
+class RetryTest(unittest.TestCase):
+    def _gateway(self, model, retries=3):
+        name = f"test-flaky-{id(model)}"
+        register_backend(name, lambda: model)
+        return ModelGateway(backend=name, rate=0, retries=retries, backoff=0.01, backoff_max=0.02)
+
+    def test_transient_errors_are_retried(self):
+        model = FlakyModel([ConnectionError("reset"), ConnectionError("reset")])
+        self.assertEqual(self._gateway(model).generate("hi", timeout=5)[0], "hi")
+        self.assertEqual(model.calls, 3)
+
+    def test_retries_are_bounded(self):
+        model = FlakyModel([ConnectionError("reset")] * 3)
+        with self.assertRaises(ConnectionError):
+            self._gateway(model, retries=2).generate("hi", timeout=5)
+        self.assertEqual(model.calls, 3)
+
+    def test_other_errors_are_not_retried(self):
+        model = FlakyModel([ValueError("bad prompt")])
+        with self.assertRaises(ValueError):
+            self._gateway(model).generate("hi", timeout=5)
+        self.assertEqual(model.calls, 1)
+
+    def test_call_that_streamed_is_not_retried(self):
+        model = FlakyModel([ConnectionError("reset")], chunks_before_error=["par"])
+        seen = []
+        with self.assertRaises(ConnectionError):
+            self._gateway(model).generate("hi", on_text=seen.append, timeout=5)
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(seen, ["par"])
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=20, burst=2)
+        now = time.monotonic()
+        self.assertTrue(bucket.acquire(now))
+        self.assertTrue(bucket.acquire(now))
+        # Empty: the next token is 50 ms away
+        self.assertFalse(bucket.acquire(time.monotonic() + 0.01))
+        self.assertTrue(bucket.acquire(time.monotonic() + 1))
+
+    def test_zero_rate_never_waits(self):
+        bucket = TokenBucket(rate=0, burst=1)
+        self.assertTrue(all(bucket.acquire(0) for _ in range(100)))
+
+    def test_gateway_rejects_calls_over_the_rate(self):
+        register_backend("test-echo-rate", EchoModel)
+        gateway = ModelGateway(backend="test-echo-rate", rate=0.01, burst=1, retries=0)
+        self.assertEqual(gateway.generate("one", timeout=1)[0], "one")
+        with self.assertRaises(RateLimited):
+            gateway.generate("two", timeout=0.2)
+
+
+class RequestTimeoutTest(unittest.TestCase):
+    def test_hung_call_releases_its_gateway_thread(self):
+        hanging = HangingModel()
+        self.addCleanup(hanging.released.set)
+        register_backend("test-hanging", lambda: hanging)
+        register_backend("test-echo", EchoModel)
+        gateway = ModelGateway(backend="test-hanging", rate=0, retries=0, concurrency=1)
+
+        with self.assertRaises(DeadlineExceeded):
+            gateway.generate("hello", timeout=0.2)
+        # The only gateway thread must be free again for the next request
+        gateway.use_backend("test-echo")
+        self.assertEqual(gateway.generate("next", timeout=2)[0], "next")
+
+
+if __name__ == "__main__":
+    unittest.main()
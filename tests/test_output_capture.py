@@ -0,0 +1,59 @@
+# Tests of the memory-bounded output capture.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import output_capture  # noqa: E402
+
+
+class CaptureTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+
+    def write(self, data):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_short_output_is_kept_whole(self):
+        self.assertEqual(output_capture.clip("hello", limit=10), "hello")
+
+    def test_long_output_keeps_head_and_tail(self):
+        clipped = output_capture.clip(b"a" * 10 + b"b" * 10, limit=8)
+        self.assertTrue(clipped.startswith("aaaa\n... 12 bytes omitted"))
+        self.assertTrue(clipped.endswith("bbbb"))
+
+    def test_large_capture_is_spilled_whole(self):
+        data = b"".join(b"line %d\n" % i for i in range(1000))
+        self.write(data)
+        text, size, log = output_capture.read_capped(self.path, limit=100)
+        self.addCleanup(os.unlink, log)
+        self.assertEqual(size, len(data))
+        self.assertLess(len(text), 200)
+        self.assertEqual(output_capture.read_log(log), data)
+
+    def test_small_capture_is_not_spilled(self):
+        self.write(b"ok\n")
+        self.assertEqual(output_capture.read_capped(self.path, limit=100), ("ok\n", 3, None))
+
+    def test_read_range(self):
+        self.write(b"first\nsecond\n")
+        self.assertEqual(output_capture.read_range(self.path, 6, 13), "second\n")
+
+
+class PagingTest(unittest.TestCase):
+    def test_pages(self):
+        text = "".join(f"{i}\n" for i in range(1, 6))
+        self.assertEqual(output_capture.page_count(text, lines=2), 3)
+        self.assertEqual(output_capture.page(text, 3, lines=2), ("5\n", 5, 5, 5))
+        self.assertEqual(output_capture.page_count(""), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# Tests of the compile/run pipeline: what it caches and when it asks the AI.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pipeline  # noqa: E402
+from result_cache import execution_cache  # noqa: E402
+
+
+class RunCacheTest(unittest.TestCase):
+    def setUp(self):
+        execution_cache.clear()
+
+    def cached(self, code, filename="main.py", stdin=""):
+        return execution_cache.get("run", "Python", f"{code}\0{stdin}\0{filename}")
+
+    def test_completed_runs_are_cached_per_file_name(self):
+        pipeline.run_code("Python", "print('hi')", "a.py")
+        self.assertEqual(self.cached("print('hi')", "a.py")[0], "hi\n")
+        self.assertIsNone(self.cached("print('hi')", "b.py"))
+
+    def test_killed_runs_are_not_cached(self):
+        code = "import os, signal\nprint('partial', flush=True)\nos.kill(os.getpid(), signal.SIGKILL)"
+        stats = []
+        pipeline.run_code("Python", code, "main.py", on_stats=stats.append)
+        self.assertEqual(stats[0]["exit_reason"], "killed")
+        self.assertIsNone(self.cached(code))
+
+
+class AiFallbackTest(unittest.TestCase):
+    def test_missing_jdk_is_an_error_unless_asked(self):
+        with mock.patch.object(pipeline, "java_available", return_value=False), \
+                mock.patch.object(pipeline, "ai_pretend_compiler", return_value="simulated") as simulate:
+            code = "public class Main { public static void main(String[] a) {} }"
+            self.assertEqual(pipeline.run_code("Java", code, "Main.java"), ("", "Java is not installed on this host."))
+            simulate.assert_not_called()
+            self.assertEqual(pipeline.run_code("Java", code, "Main.java", ai_fallback=True), ("simulated", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# Regression tests for the code compaction of simulator prompts.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import contextlib
+import io
+import os
+import sys
+import traceback
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_budget import compact_code, simulate_prompt  # noqa: E402
+
+
+def _run(code):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        exec(compile(code, "<test>", "exec"), {})
+    return output.getvalue()
+
+
+class CompactCodeTest(unittest.TestCase):
+    PYTHON = (
+        "# header comment   \n"
+        "text = '''a   \n"
+        "# not a comment\n"
+        "\n"
+        "\n"
+        "b'''   \n"
+        "\n"
+        "\n"
+        "print(repr(text))  # trailing comment\n"
+        "raise ValueError('line 10')\n"
+    )
+
+    def test_python_output_and_line_numbers_are_kept(self):
+        compact = compact_code(self.PYTHON, "Python")
+        self.assertNotIn("header comment", compact)
+        self.assertEqual(compact.count("\n"), self.PYTHON.count("\n"))
+        body = self.PYTHON.rsplit("raise", 1)[0]
+        self.assertEqual(_run(compact_code(body, "Python")), _run(body))
+
+        for code in (self.PYTHON, compact):
+            try:
+                _run(code)
+            except ValueError as e:
+                self.assertEqual(traceback.extract_tb(e.__traceback__)[-1].lineno, 10)
+            else:
+                self.fail("ValueError not raised")
+
+    def test_java_text_blocks_are_kept(self):
+        code = 'class Main {   \n  // note\n  String s = """\n    a   \n    // b\n    """;\n}\n'
+        self.assertEqual(compact_code(code, "Java"),
+                         'class Main {\n\n  String s = """\n    a   \n    // b\n    """;\n}\n')
+
+    def test_code_within_budget_is_sent_unchanged(self):
+        self.assertIn(self.PYTHON, simulate_prompt("Python", self.PYTHON))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# Regression tests for the cache keys of program runs.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_cache import ResultCache, _DiskStore, cache_key  # noqa: E402
+
+
+class CacheKeyTest(unittest.TestCase):
+    def test_trailing_spaces_in_literals_do_not_collide(self):
+        padded = 'print("""a   \nb""".split("\\n")[0] + "|")\n'
+        plain = 'print("""a\nb""".split("\\n")[0] + "|")\n'
+        self.assertNotEqual(cache_key("run", "Python", padded), cache_key("run", "Python", plain))
+
+        cache = ResultCache("test", None, ttl=60, memory_entries=8, disk_bytes=0)
+        cache.put("run", "Python", padded, ["a   |\n", ""])
+        self.assertIsNone(cache.get("run", "Python", plain))
+
+    def test_line_endings_share_an_entry(self):
+        self.assertEqual(cache_key("run", "Python", "print(1)\r\nprint(2)\r\n"),
+                         cache_key("run", "Python", "print(1)\nprint(2)\n"))
+
+
+class DiskTierTest(unittest.TestCase):
+    def test_rows_written_by_others_are_ignored(self):
+        path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+        writer = ResultCache("test", _DiskStore(path), ttl=60, memory_entries=8, disk_bytes=1 << 20)
+        writer.put("run", "Python", "print(1)", ["1\n", ""])
+        # What a program sharing the server's user could do to the file
+        with sqlite3.connect(path) as conn:
+            conn.execute("UPDATE entries SET value = ?", ('["forged\\n", ""]',))
+            conn.execute("INSERT INTO entries VALUES ('test', ?, '[\"evil\", \"\"]', 12, 1e12, 1e12)",
+                         (cache_key("run", "Python", "print(2)"),))
+
+        reader = ResultCache("test", _DiskStore(path), ttl=60, memory_entries=8, disk_bytes=1 << 20)
+        self.assertIsNone(reader.get("run", "Python", "print(1)"))
+        self.assertIsNone(reader.get("run", "Python", "print(2)"))
+
+    def test_signed_rows_are_served(self):
+        path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+        ResultCache("test", _DiskStore(path), ttl=60, memory_entries=8, disk_bytes=1 << 20).put(
+            "run", "Python", "print(1)", ["1\n", ""])
+        reader = ResultCache("test", _DiskStore(path), ttl=60, memory_entries=8, disk_bytes=1 << 20)
+        self.assertEqual(reader.get("run", "Python", "print(1)"), ["1\n", ""])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# Tests of the per-run limits and exit reasons.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import resource
+import signal
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_limits  # noqa: E402
+
+
+class ProcessLimitTest(unittest.TestCase):
+    def test_default_leaves_room_above_what_the_user_runs(self):
+        # The user's task count moves as other tests start threads, so pin it
+        self.addCleanup(run_limits.process_limit.cache_clear)
+        run_limits.process_limit.cache_clear()
+        with mock.patch.object(run_limits, "LIMIT_PROCESSES", None), \
+                mock.patch.object(run_limits, "_user_tasks", return_value=300):
+            self.assertEqual(run_limits.process_limit(),
+                             300 + run_limits.LIMIT_PROCESSES_PER_RUN * run_limits.EXEC_SLOTS)
+        self.assertGreater(run_limits._user_tasks(), 0)
+
+    def test_worker_gets_the_user_wide_limit(self):
+        proc = subprocess.Popen(["sleep", "5"])
+        self.addCleanup(proc.wait)
+        self.addCleanup(proc.kill)
+        run_limits.apply_worker_limits(proc.pid)
+        self.assertEqual(resource.prlimit(proc.pid, resource.RLIMIT_NPROC)[0], run_limits.process_limit())
+
+
+class ExitReasonTest(unittest.TestCase):
+    def test_reasons(self):
+        self.assertEqual(run_limits.exit_reason(0), "ok")
+        self.assertEqual(run_limits.exit_reason(1, "Traceback ..."), "error")
+        self.assertEqual(run_limits.exit_reason(None, timed_out=True), "timeout")
+        self.assertEqual(run_limits.exit_reason(-signal.SIGXCPU), "cpu_limit")
+        self.assertEqual(run_limits.exit_reason(1, "MemoryError\n"), "memory_limit")
+        self.assertEqual(run_limits.exit_reason(-signal.SIGKILL), "killed")
+
+    def test_limit_messages(self):
+        self.assertIn("CPU time", run_limits.limit_message({"exit_reason": "cpu_limit"}))
+        self.assertEqual(run_limits.limit_message({"exit_reason": "ok"}), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# Tests of the fair execution scheduler.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import Cancelled, ExecutionScheduler, SchedulerBusy  # noqa: E402
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ExecutionScheduler(slots=1, max_queue=8, max_per_session=4)
+        self.granted = []
+        self.cancelled = []
+        self.threads = []
+        # Hold the only slot until release() so every later run has to queue
+        self.hold = threading.Event()
+        self.submit("holder", wait=self.hold)
+        self.wait_for(lambda status: status["running"] == 1)
+
+    def tearDown(self):
+        self.hold.set()
+        for thread in self.threads:
+            thread.join(5)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition(self.scheduler.status()):
+            self.assertLess(time.monotonic(), deadline, self.scheduler.status())
+            time.sleep(0.01)
+
+    def submit(self, session, name=None, replace=True, wait=None):
+        def run():
+            try:
+                with self.scheduler.slot(session, replace=replace):
+                    self.granted.append(name or session)
+                    if wait is not None:
+                        wait.wait(5)
+            except Cancelled:
+                self.cancelled.append(name or session)
+
+        queued = self.scheduler.status()["queued"]
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.threads.append(thread)
+        if wait is None:
+            # Keep the order of submission in the queues
+            self.wait_for(lambda status: status["queued"] > queued or self.cancelled)
+        return thread
+
+    def finish(self):
+        self.hold.set()
+        for thread in self.threads:
+            thread.join(5)
+
+    def test_sessions_are_served_round_robin(self):
+        for i in range(3):
+            self.submit("a", f"a{i}", replace=False)
+        self.submit("b", "b0")
+        self.finish()
+        self.assertEqual(self.granted, ["holder", "a0", "b0", "a1", "a2"])
+
+    def test_new_run_replaces_the_waiting_run_of_its_session(self):
+        self.submit("a", "first")
+        self.submit("a", "second")
+        self.finish()
+        self.assertEqual(self.cancelled, ["first"])
+        self.assertEqual(self.granted, ["holder", "second"])
+
+    def test_callers_without_a_session_do_not_replace_each_other(self):
+        self.submit(None, "one")
+        self.submit(None, "two")
+        self.finish()
+        self.assertEqual(self.cancelled, [])
+        self.assertEqual(self.granted, ["holder", "one", "two"])
+
+    def test_full_queue_rejects_new_runs(self):
+        for i in range(4):
+            self.submit("a", f"a{i}", replace=False)
+        with self.assertRaises(SchedulerBusy):
+            with self.scheduler.slot("a", replace=False):
+                pass
+        self.finish()
+        self.assertEqual(self.scheduler.status()["rejected"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
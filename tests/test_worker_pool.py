@@ -0,0 +1,87 @@
+# Regression tests for the isolation of runs on the shared warm workers.
+#
+#   python -m pytest tests    (or: python -m unittest discover tests)
+import errno
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import python_worker  # noqa: E402
+from worker_pool import WorkerPool, WorkerUnavailable  # noqa: E402
+
+
+class WorkerIsolationTest(unittest.TestCase):
+    def setUp(self):
+        # One worker, so every run of a test lands on the same process
+        self.pool = WorkerPool(size=1)
+        self.addCleanup(self.pool.shutdown)
+
+    def run_code(self, code):
+        result = self.pool.run(code, "main.py", timeout=10)
+        self.assertEqual(result.stats["exit_reason"], "ok", result.stderr)
+        return result.stdout
+
+    def test_patched_module_does_not_leak(self):
+        self.run_code("import math\nmath.sqrt = lambda x: 42\nprint(math.sqrt(4))")
+        self.assertEqual(self.run_code("import math\nprint(math.sqrt(4))"), "2.0\n")
+
+    def test_worker_globals_are_out_of_reach(self):
+        log = os.path.join(tempfile.mkdtemp(), "stolen.txt")
+        self.run_code(
+            "import sys\n"
+            "frame = sys._getframe()\n"
+            "while frame is not None and '_execute' not in frame.f_globals:\n"
+            "    frame = frame.f_back\n"
+            "def spy(code, filename):\n"
+            f"    open({log!r}, 'a').write(code)\n"
+            "    return 0\n"
+            "frame.f_globals['_execute'] = spy\n"
+        )
+        self.assertEqual(self.run_code("password = 'hunter2'\nprint('ran')"), "ran\n")
+        self.assertFalse(os.path.exists(log))
+
+    def test_server_environment_is_withheld(self):
+        with mock.patch.dict(os.environ, {"GOOGLE_API_KEY": "secret"}):
+            pool = WorkerPool(size=1)
+        self.addCleanup(pool.shutdown)
+        result = pool.run("import os\nprint(os.environ.get('GOOGLE_API_KEY'))", "main.py", timeout=10)
+        self.assertEqual(result.stdout, "None\n")
+
+    def test_background_processes_do_not_outlive_the_run(self):
+        self.run_code("import subprocess\nsubprocess.Popen(['sh', '-c', 'sleep 0.5; echo LEAKED'])")
+        self.assertEqual(self.run_code("import time\ntime.sleep(1)\nprint('ok')"), "ok\n")
+
+
+class ForkFailureTest(unittest.TestCase):
+    def test_failed_fork_is_reported_and_retires_the_worker(self):
+        base = tempfile.mkdtemp()
+        request = {name: os.path.join(base, name) for name in ("stdin_path", "stdout_path", "stderr_path")}
+        request.update(code="print(1)", filename="main.py")
+        with mock.patch.object(python_worker.os, "fork", side_effect=BlockingIOError(errno.EAGAIN, "busy")):
+            reply = python_worker._run_forked(request, ())
+        self.assertEqual((reply["returncode"], reply["clean"], reply["reason"]), (1, False, "no_process"))
+        with open(request["stderr_path"]) as f:
+            self.assertIn("Could not start the program", f.read())
+
+
+class WorkerRespawnTest(unittest.TestCase):
+    def test_failed_respawn_is_retried_instead_of_hanging(self):
+        pool = WorkerPool(size=1)
+        self.addCleanup(pool.shutdown)
+        start = pool._new_worker
+        # The worker dies with the run, and no replacement can be started
+        with mock.patch.object(pool, "_new_worker", side_effect=OSError("fork failed")):
+            pool.run("import os\nos._exit(1)", "main.py", timeout=10, disposable=True)
+            with self.assertRaises(WorkerUnavailable):
+                pool.run("print(1)", "main.py", timeout=10)
+        # Once workers can be started again the slot is filled on the next run
+        pool._new_worker = start
+        self.assertEqual(pool.run("print(1)", "main.py", timeout=10).stdout, "1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
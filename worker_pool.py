@@ -0,0 +1,456 @@
+# Pool of pre-started Python workers used by run_code.
+#
+# Starting ``python3`` for every click pays interpreter startup and site
+# import before any user code runs. The pool keeps a few warm workers
+# (see python_worker.py) that receive code over a pipe, execute it in a child
+# forked from the warm interpreter and report the exit status, so nothing one
+# program changes is seen by the next; stdin is fed from a file and
+# stdout/stderr are collected from per-worker capture files. Each worker runs
+# in a scratch directory that is wiped after every run, so programs that
+# create or read files never see another run's leftovers. Workers are recycled after a number of runs, when
+# they grow past a memory ceiling, or when user code leaves them dirty.
+# Every run is bounded and measured by run_limits (memory, CPU, open files,
+# processes, output size); results carry the measurements as ``.stats``.
+# Output is read back through output_capture, so the server holds at most a
+# bounded head and tail of each stream however much a program prints.
+#
+# Workers start with a minimal environment (WORKER_ENV) instead of the
+# server's, which holds API keys and other secrets, and in a session of their
+# own, so killing a worker also kills the program it forked.
+#
+# The pool lives at module level so it survives Streamlit reruns and is shared
+# by every session of the server process.
+import atexit
+import codecs
+import os
+import queue
+import select
+import shutil
+import signal
+import struct
+import json
+import subprocess
+import tempfile
+import threading
+import time
+
+import metrics
+import output_capture
+import run_limits
+from scheduler import EXEC_SLOTS
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+# Configuration, overridable through the environment
+# One warm worker per scheduler slot; more could never run at the same time
+POOL_SIZE = int(os.environ.get("ABCDE_POOL_SIZE", EXEC_SLOTS))
+POOL_MAX_RUNS = int(os.environ.get("ABCDE_POOL_MAX_RUNS", "50"))
+POOL_MAX_RSS_MB = float(os.environ.get("ABCDE_POOL_MAX_RSS_MB", "256"))
+POOL_PYTHON = os.environ.get("ABCDE_POOL_PYTHON", "python3")
+POOL_PRELOAD = os.environ.get(
+    "ABCDE_POOL_PRELOAD",
+    "math,random,collections,itertools,functools,json,re,string,datetime",
+).split(",")
+# How often the capture files are polled when output is streamed
+STREAM_INTERVAL = float(os.environ.get("ABCDE_STREAM_INTERVAL", "0.1"))
+# Server environment variables workers may see; everything else is withheld
+WORKER_ENV = os.environ.get(
+    "ABCDE_WORKER_ENV",
+    "PATH,HOME,LANG,LC_ALL,LC_CTYPE,TZ,TMPDIR,JAVA_HOME,PYENV_ROOT,PYENV_VERSION",
+).split(",")
+
+_HEADER = struct.Struct(">I")
+
+
+class WorkerDied(Exception):
+    pass
+
+
+# No worker could be started, or none became free in time
+class WorkerUnavailable(Exception):
+    pass
+
+
+# Function to build the environment of a worker from the allowed variables
+def worker_environment():
+    env = {name: os.environ[name] for name in (name.strip() for name in WORKER_ENV) if name in os.environ}
+    env.setdefault("PATH", os.defpath)
+    env["PYTHONIOENCODING"] = "utf-8"
+    return env
+
+
+# A single warm interpreter and its scratch directory
+class _Worker:
+    limit_address_space = True
+
+    def __init__(self, command):
+        self.base_dir = tempfile.mkdtemp(prefix="abcde-worker-")
+        self.sandbox_dir = os.path.join(self.base_dir, "sandbox")
+        os.mkdir(self.sandbox_dir)
+        self.stdout_path = os.path.join(self.base_dir, "stdout")
+        self.stderr_path = os.path.join(self.base_dir, "stderr")
+        self.stdin_path = os.path.join(self.base_dir, "stdin")
+        self.runs = 0
+        self._offsets = [0, 0]
+        self._decoders = []
+        self._clipped = [False, False]
+        # Sizes and spilled logs of the last output read by read_output()
+        self.capture = {}
+        try:
+            self.proc = self._start(command)
+        except BaseException:
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+            raise
+        run_limits.apply_worker_limits(self.proc.pid, address_space=self.limit_address_space)
+
+    # Function to start the worker process; the protocol runs over its stdin
+    # and stdout pipes unless a subclass passes other streams
+    def _start(self, command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, pass_fds=()):
+        return subprocess.Popen(
+            command,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=subprocess.DEVNULL,
+            pass_fds=pass_fds,
+            cwd=self.sandbox_dir,
+            env=worker_environment(),
+            start_new_session=True,
+        )
+
+    def send(self, message):
+        payload = json.dumps(message).encode("utf-8")
+        try:
+            self.proc.stdin.write(_HEADER.pack(len(payload)) + payload)
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise WorkerDied()
+
+    def _read_exact(self, size, deadline):
+        fd = self.proc.stdout.fileno()
+        data = b""
+        while len(data) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.proc.args, 0)
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                raise WorkerDied()
+            data += chunk
+        return data
+
+    def wait_readable(self, timeout):
+        ready, _, _ = select.select([self.proc.stdout.fileno()], [], [], max(0, timeout))
+        return bool(ready)
+
+    def recv(self, deadline):
+        header = self._read_exact(_HEADER.size, deadline)
+        payload = self._read_exact(_HEADER.unpack(header)[0], deadline)
+        return json.loads(payload.decode("utf-8"))
+
+    def reset_stream(self):
+        self._offsets = [0, 0]
+        self._decoders = [codecs.getincrementaldecoder("utf-8")(errors="replace") for _ in range(2)]
+        self._clipped = [False, False]
+        self.capture = {}
+
+    # Return the stdout/stderr text written since the previous call; after
+    # output_capture.STREAM_BYTES of a stream the rest is skipped, not read
+    def read_new_output(self, final=False):
+        chunks = []
+        for i, path in enumerate((self.stdout_path, self.stderr_path)):
+            if self._clipped[i]:
+                chunks.append("")
+                continue
+            budget = output_capture.STREAM_BYTES - self._offsets[i]
+            data = b""
+            try:
+                with open(path, "rb") as f:
+                    f.seek(self._offsets[i])
+                    data = f.read(budget + 1)
+            except OSError:
+                pass
+            marker = ""
+            if len(data) > budget:
+                data = data[:budget]
+                marker = output_capture.STREAM_MARKER
+                self._clipped[i] = True
+            self._offsets[i] += len(data)
+            chunks.append(self._decoders[i].decode(data, final or self._clipped[i]) + marker)
+        return chunks
+
+    def write_stdin(self, text):
+        with open(self.stdin_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    # Remove everything the last program left in the scratch directory;
+    # returns False if something could not be removed
+    def clear_sandbox(self):
+        clean = True
+        for entry in os.scandir(self.sandbox_dir):
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                clean = False
+        return clean
+
+    def output_bytes(self):
+        total = 0
+        for path in (self.stdout_path, self.stderr_path):
+            try:
+                total = max(total, os.path.getsize(path))
+            except OSError:
+                pass
+        return total
+
+    def read_output(self):
+        outputs = []
+        for name, path in (("stdout", self.stdout_path), ("stderr", self.stderr_path)):
+            text, size, log = output_capture.read_capped(path)
+            self.capture[f"{name}_bytes"] = size
+            if log:
+                self.capture[f"{name}_log"] = log
+            outputs.append(text)
+        return outputs
+
+    # Function to wait until the process has exited without reaping it, so its
+    # /proc entry can still be measured; returns the exit status like Popen
+    def wait_exited(self, timeout=1):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                info = os.waitid(os.P_PID, self.proc.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+            except (AttributeError, ChildProcessError, OSError):
+                break
+            if info is not None:
+                if info.si_code == os.CLD_EXITED:
+                    return info.si_status
+                return -info.si_status
+            time.sleep(0.01)
+        if self.proc.poll() is None:
+            self.proc.kill()
+        return self.proc.wait()
+
+    def kill(self):
+        # The whole session: the group of the program the worker is running
+        # and everything it started, then the worker's own group
+        for group in run_limits.child_pids(self.proc.pid) + [self.proc.pid]:
+            try:
+                os.killpg(group, signal.SIGKILL)
+            except OSError:
+                pass
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+# Function to measure a finished run of a worker or kernel, keep its stats and
+# count it; must be called before the worker is reaped
+def record_run(language, worker, usage, returncode, stderr, timed_out=False, reason=None, peak_rss_mb=None):
+    stats = run_limits.finish_run(usage, returncode, stderr, worker.output_bytes(), timed_out, reason,
+                                  peak_rss_mb)
+    stats.update(worker.capture)
+    run_limits.record(language, stats)
+    labels = {"language": language, "exit_reason": stats["exit_reason"]}
+    metrics.observe("abcde_program_seconds", stats["wall_seconds"], **labels)
+    if stats["cpu_seconds"] is not None:
+        metrics.observe("abcde_program_cpu_seconds", stats["cpu_seconds"], **labels)
+    return stats
+
+
+# Function to hand the output written since the last call to on_output
+def stream_output(worker, on_output, final=False):
+    if on_output is None:
+        return
+    stdout, stderr = worker.read_new_output(final)
+    if stdout or stderr:
+        on_output(stdout, stderr)
+
+
+class WorkerPool:
+    # Language the runs are recorded under in run_limits
+    language = "Python"
+    # Whether a program exiting takes its runner with it; programs run in
+    # forked children here, so a dead worker is never their own doing
+    exit_ends_runner = False
+
+    def __init__(self, size=POOL_SIZE, max_runs=POOL_MAX_RUNS, max_rss_mb=POOL_MAX_RSS_MB,
+                 python=POOL_PYTHON, preload=POOL_PRELOAD):
+        self.size = max(1, size)
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.python = python
+        self.preload = [name.strip() for name in preload if name.strip()]
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._closed = False
+        # Slots whose worker could not be started, retried on the next run
+        self._missing = 0
+        self._spawn_error = None
+        for _ in range(self.size):
+            self._replace()
+
+    def _new_worker(self):
+        return _Worker([self.python, "-I", "-u", WORKER_SCRIPT, *self.preload])
+
+    def _spawn(self):
+        with metrics.timer("abcde_worker_spawn_seconds", language=self.language):
+            worker = self._new_worker()
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    # Function to start a worker for an empty slot; a slot whose worker fails
+    # to start (process or file limits, a missing interpreter) is remembered
+    # and retried by _acquire instead of being lost
+    def _replace(self):
+        try:
+            worker = self._spawn()
+        except (OSError, subprocess.SubprocessError) as e:
+            metrics.inc("abcde_worker_spawn_errors_total", language=self.language, error=type(e).__name__)
+            with self._lock:
+                self._missing += 1
+                self._spawn_error = e
+            return
+        self._idle.put(worker)
+
+    def _retire(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+        if not self._closed:
+            self._replace()
+
+    # Function to take an idle worker, first retrying the slots whose worker
+    # failed to start; waits until the deadline at most
+    def _acquire(self, deadline):
+        with self._lock:
+            missing, self._missing = self._missing, 0
+        for _ in range(missing):
+            self._replace()
+        with self._lock:
+            if self._missing >= self.size:
+                raise WorkerUnavailable(f"could not start a {self.language} worker: {self._spawn_error}")
+        try:
+            return self._idle.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            raise WorkerUnavailable(f"no {self.language} worker became free in time")
+
+    # Function to run code on a warm worker; mirrors subprocess.run so callers
+    # get a CompletedProcess back and a TimeoutExpired on timeout. When
+    # on_output is given it is called with (stdout, stderr) chunks while the
+    # code is still running; stdin is the text the program reads as input.
+    # disposable=True retires the worker afterwards, for code that may leave
+    # processes, connections or other state behind. The result (or the
+    # TimeoutExpired) carries the run's resource usage as ``.stats``. Raises
+    # WorkerUnavailable when no worker can be had within the timeout.
+    def run(self, code, filename, timeout=20, on_output=None, stdin="", disposable=False):
+        if self._closed:
+            raise RuntimeError("worker pool is shut down")
+        acquire_deadline = time.monotonic() + timeout
+        while True:
+            with metrics.timer("abcde_worker_acquire_seconds", language=self.language):
+                worker = self._acquire(acquire_deadline)
+            try:
+                usage = run_limits.start_run(worker.proc.pid)
+                worker.write_stdin(stdin)
+                worker.send({
+                    "code": code,
+                    "filename": filename,
+                    "stdin_path": worker.stdin_path,
+                    "stdout_path": worker.stdout_path,
+                    "stderr_path": worker.stderr_path,
+                })
+                break
+            except WorkerDied:
+                # The worker died while idle; replace it and try the next one
+                self._retire(worker)
+
+        args = [worker.proc.args[0], filename]
+        deadline = time.monotonic() + timeout
+        worker.reset_stream()
+        try:
+            if on_output is not None:
+                remaining = timeout
+                while remaining > 0 and not worker.wait_readable(min(STREAM_INTERVAL, remaining)):
+                    stream_output(worker, on_output)
+                    remaining = deadline - time.monotonic()
+            reply = worker.recv(deadline)
+        except subprocess.TimeoutExpired:
+            stream_output(worker, on_output, final=True)
+            stdout, stderr = worker.read_output()
+            stats = record_run(self.language, worker, usage, None, stderr, timed_out=True)
+            self._retire(worker)
+            error = subprocess.TimeoutExpired(args, timeout, output=stdout, stderr=stderr)
+            error.stats = stats
+            raise error
+        except WorkerDied:
+            # User code took the interpreter down (os._exit, crash, a limit);
+            # measure before reaping, /proc disappears with the process
+            returncode = worker.wait_exited()
+            stream_output(worker, on_output, final=True)
+            stdout, stderr = worker.read_output()
+            # Unless a limit or the program's own exit explains it, the run
+            # ended with its runner
+            reason = run_limits.exit_reason(returncode, stderr, worker.output_bytes())
+            died = not self.exit_ends_runner and reason in ("ok", "error")
+            stats = record_run(self.language, worker, usage, returncode, stderr,
+                               reason="worker_died" if died else None)
+            self._retire(worker)
+            result = subprocess.CompletedProcess(args, returncode, stdout, stderr)
+            result.stats = stats
+            return result
+        except BaseException:
+            # The caller gave up while the program was running (a Streamlit
+            # rerun or disconnect raised from on_output); stop the program
+            record_run(self.language, worker, usage, None, "", reason="cancelled")
+            self._retire(worker)
+            raise
+
+        stream_output(worker, on_output, final=True)
+        stdout, stderr = worker.read_output()
+        stats = record_run(self.language, worker, usage, reply["returncode"], stderr, reason=reply.get("reason"),
+                           peak_rss_mb=reply.get("peak_rss_mb"))
+        worker.runs += 1
+        if (disposable or not reply["clean"] or not worker.clear_sandbox() or worker.runs >= self.max_runs
+                or reply["rss_mb"] > self.max_rss_mb):
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+        result = subprocess.CompletedProcess(args, reply["returncode"], stdout, stderr)
+        result.stats = stats
+        return result
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the process-wide pool, starting it on first use
+def get_worker_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+            atexit.register(_pool.shutdown)
+        return _pool